@@ -5,6 +5,7 @@ from pathlib import Path
 
 load_dotenv()
 SCOPUS_API_KEY = os.getenv('SCOPUS_API_KEY')
+NCBI_API_KEY = os.getenv('NCBI_API_KEY')
 
 EMAIL = os.getenv('EMAIL')
 IMAP_SERVER = os.getenv('IMAP_SERVER')
@@ -14,6 +15,8 @@ PASSWORD = os.getenv('PASSWORD')
 DATA = os.getenv('DATA')
 RESULTS = os.getenv('RESULTS')
 REPORTS = os.getenv('REPORTS')
+CACHE = os.getenv('CACHE')
+SPACY_MODEL = os.getenv('SPACY_MODEL')
 
 logger = logging.getLogger('matchpub logger')
 logger.setLevel(logging.INFO)
@@ -0,0 +1,240 @@
+import asyncio
+from typing import Dict, List, Tuple, FrozenSet, AsyncIterator
+
+import aiohttp
+import requests
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+from .models import PubMedArticle, EuropePMCArticle
+from .net import Service, EuropePMCService, PubMedService, BioRxivService, ScopusService
+from .config import config
+
+"""Asyncio variants of the web services, to keep many requests in flight from a single thread."""
+
+
+class AsyncService(Service):
+    """Base class for the asyncio variants of the web services. The requests are sent with an aiohttp session
+    whose connector keeps connections alive and opens at most MAX_CONCURRENT connections per host.
+    The requests go through the same gates as the synchronous services: the response cache, the rate limiter
+    of the service (shared with the synchronous service, see TokenBucket.acquire_async), the cap on the number
+    of requests in flight and the retries of throttled requests. Requests failing with a connection error, and requests
+    with a method in ALLOWED_METHODS failing with a status in STATUS_FORCELIST, are retried RETRIES times with the
+    exponential backoff of requests_retry_session(); as with urllib3.Retry, POST requests are not retried on a status.
+    The last response is returned when the retries are exhausted, so that the parsers report the failure.
+
+    The session is opened on the first request, in the running event loop, and has to be closed with close(),
+    or by using the service as an async context manager:
+
+        async with AsyncEuropePMCService() as service:
+            articles = await asyncio.gather(*[service.search(q) for q in queries])
+
+    Attributes:
+        RETRIES (int): the number of retries of failed requests.
+        BACKOFF_FACTOR (float): the factor of the exponential delay between retries.
+        STATUS_FORCELIST (Tuple[int]): the status codes of failed requests that are retried.
+        ALLOWED_METHODS (FrozenSet[str]): the methods of the requests retried on a status in STATUS_FORCELIST.
+        KEEPALIVE_TIMEOUT (float): how long in seconds idle connections are kept open.
+    """
+
+    RETRIES: int = 4
+    BACKOFF_FACTOR: float = 0.3
+    STATUS_FORCELIST: Tuple[int] = (500, 502, 504)
+    ALLOWED_METHODS: FrozenSet[str] = Retry.DEFAULT_ALLOWED_METHODS  # the idempotent methods, as for the synchronous sessions
+    KEEPALIVE_TIMEOUT: float = 30
+
+    def __init__(self):
+        self._session: aiohttp.ClientSession = None
+        self._slots: asyncio.Semaphore = None
+
+    def _open(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.MAX_CONCURRENT, keepalive_timeout=self.KEEPALIVE_TIMEOUT)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={**self.HEADERS, 'Accept-Encoding': 'gzip, deflate'},
+            )
+            self._slots = asyncio.Semaphore(self.MAX_CONCURRENT)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _backoff(self, retry: int) -> float:
+        # same delays as urllib3.Retry: the first retry is immediate, then backoff_factor * 2 ** (retry - 1)
+        return 0.0 if retry <= 1 else self.BACKOFF_FACTOR * 2 ** (retry - 1)
+
+    async def _send(self, method: str, url: str, timeout: float = None, **kwargs) -> requests.Response:
+        session = self._open()
+        # an explicit timeout bounds the whole request, otherwise the default timeouts of the synchronous sessions apply
+        timeout = aiohttp.ClientTimeout(total=timeout, connect=config.connect_timeout, sock_read=config.read_timeout)
+        for name in ('params', 'data'):
+            if isinstance(kwargs.get(name), dict):  # like requests, parameters set to None are not sent
+                kwargs[name] = {k: str(v) for k, v in kwargs[name].items() if v is not None}
+        for retry in range(self.RETRIES + 1):
+            if retry > 0:
+                await asyncio.sleep(self._backoff(retry))
+            try:
+                async with self._slots:
+                    async with session.request(method, url, timeout=timeout, **kwargs) as r:
+                        content = await r.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if retry == self.RETRIES:
+                    raise requests.ConnectionError(f"{method} {url} failed after {self.RETRIES} retries: {e!r}") from e
+                continue
+            if r.status not in self.STATUS_FORCELIST or method.upper() not in self.ALLOWED_METHODS or retry == self.RETRIES:
+                break
+        return self._response(r, content)
+
+    @staticmethod
+    def _response(r: aiohttp.ClientResponse, content: bytes) -> requests.Response:
+        # responses are converted to requests.Response so that the cache and the parsers of the synchronous services apply
+        response = requests.Response()
+        response.url = str(r.url)
+        response.status_code = r.status
+        response.reason = r.reason
+        response.headers = CaseInsensitiveDict(r.headers)
+        response._content = content
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    async def _request(self, method: str, url: str, use_cache: bool = True, **kwargs) -> requests.Response:
+        # same steps as Service._request(), the cache being read and written in a thread not to block the event loop
+        key = self._cache_key(method, url, use_cache, kwargs)
+        if key is not None:
+            response = await asyncio.to_thread(self.cache.get, key, self.CACHE_TTL)
+            if response is not None:
+                return response
+        for attempt in range(self.MAX_THROTTLED_ATTEMPTS):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            response = await self._send(method, url, **kwargs)
+            if not self._throttled(response, attempt):
+                break
+        if key is not None:
+            await asyncio.to_thread(self._cache_response, key, response)
+        return response
+
+
+class AsyncEuropePMCService(AsyncService, EuropePMCService):
+
+    async def search(self, query: str, limit: int = 5, result_type: str = 'core') -> List[EuropePMCArticle]:
+        article_list, _, _ = await self._search_page(query, limit, result_type)
+        return article_list
+
+    async def search_pages(self, query: str, page_size: int = 1000, max_pages: int = 1, result_type: str = 'core') -> Tuple[List[EuropePMCArticle], bool]:
+        article_list = []
+        complete = False
+        async for page, last in self.iter_pages(query, [page_size] * max_pages, result_type):
+            article_list += page
+            complete = last
+        return article_list, complete
+
+    async def iter_pages(self, query: str, page_sizes: List[int], result_type: str = 'core') -> AsyncIterator[Tuple[List[EuropePMCArticle], bool]]:
+        cursor_mark = '*'
+        retrieved = 0
+        for page_size in page_sizes:
+            page, hit_count, next_cursor_mark = await self._search_page(query, page_size, result_type, cursor_mark)
+            if hit_count is None:
+                return  # failed request
+            retrieved += len(page)
+            last = self._last_page(page, retrieved, hit_count, cursor_mark, next_cursor_mark)
+            yield page, last
+            if last:
+                return
+            cursor_mark = next_cursor_mark
+
+    async def _search_page(self, query: str, page_size: int, result_type: str, cursor_mark: str = None) -> Tuple[List[EuropePMCArticle], int, str]:
+        params = self._page_params(query, page_size, result_type, cursor_mark)
+        response = await self._request('POST', self.REST_URL, data=params, timeout=30)
+        return self._parse_page(response, params)
+
+    async def fetch(self, source: str, epmc_id: str) -> EuropePMCArticle:
+        articles = await self.search(f'EXT_ID:"{epmc_id}" AND SRC:"{source}"', limit=1, result_type='core')
+        return articles[0] if articles else None
+
+
+class AsyncPubMedService(AsyncService, PubMedService):
+
+    async def search(self, query: str, limit: int = 5) -> List[PubMedArticle]:
+        pmids, _ = await self.esearch(query, limit)
+        articles = await self.efetch(pmids)
+        return [articles[pmid] for pmid in pmids if pmid in articles]
+
+    async def esearch(self, query: str, limit: int) -> Tuple[List[str], int]:
+        params = self._esearch_params(query, limit)
+        response = await self._request('POST', self.REST_URL_ESEARCH, data=params)
+        return self._parse_esearch(response, params)
+
+    async def efetch(self, pmids: List[str], fetch_size: int = config.pubmed_fetch_size) -> Dict[str, PubMedArticle]:
+        pmids = sorted(set(pmids))
+        articles = {}
+        for article_list in await asyncio.gather(*[self._efetch_batch(pmids[i:i + fetch_size]) for i in range(0, len(pmids), fetch_size)]):
+            articles.update({a.pmid: a for a in article_list})
+        return articles
+
+    async def _efetch_batch(self, pmids: List[str]) -> List[PubMedArticle]:
+        params = self._efetch_params(pmids)
+        response = await self._request('POST', self.REST_URL_EFETCH, data=params)
+        return self._parse_efetch(response, params)
+
+
+class AsyncBioRxivService(AsyncService, BioRxivService):
+
+    async def preprint_publication_status(self, doi: str) -> str:
+        for server in ['biorxiv', 'medrxiv']:
+            response = await self._request('GET', f"{self.REST_URL}/{server}/{doi}")
+            journal_doi = self._parse_publication_status(response, doi)
+            if journal_doi is not None:
+                return journal_doi
+        return None
+
+    async def published_preprints(self, server: str, start: str, end: str) -> AsyncIterator[Tuple[str, str]]:
+        cursor = 0
+        while True:
+            url = f"{self.PUBS_URL}/{server}/{start}/{end}/{cursor}"
+            response = await self._request('GET', url, use_cache=False, timeout=60)
+            published, count, last = self._parse_published_page(response, url, cursor)
+            for dois in published:
+                yield dois
+            cursor += count
+            if last:
+                return
+
+
+class AsyncScopusService(AsyncService, ScopusService):
+
+    async def citedby_count(self, pmid) -> int:
+        citation_count = None
+        if pmid:
+            citation_count = (await self.citedby_counts([pmid])).get(str(pmid))
+        return citation_count
+
+    async def citedby_counts(self, pmids: List[str], batch_size: int = 25) -> Dict[str, int]:
+        pmids = sorted({str(pmid) for pmid in pmids if pmid})
+        batches = [pmids[i:i + batch_size] for i in range(0, len(pmids), batch_size)]
+        citation_counts = {}
+        for counts in await asyncio.gather(*[self._citedby_batch(batch, batch_size) for batch in batches]):
+            citation_counts.update(counts)
+        return citation_counts
+
+    async def _citedby_batch(self, pmids: List[str], page_size: int) -> Dict[str, int]:
+        query = " OR ".join([f"PMID({pmid})" for pmid in pmids])
+        records = {pmid: [] for pmid in pmids}
+        start = 0
+        while True:
+            params = {"apiKey": self.API_KEY, "query": query, "field": "citedby-count,pubmed-id", "count": page_size, "start": start}
+            response = await self._request('POST', self.REST_URL, data=params)
+            count, last = self._parse_citedby_page(response, pmids, records, start)
+            start += count
+            if last:
+                break
+        return self._citation_counts(records)
@@ -0,0 +1,137 @@
+import json
+import sqlite3
+import hashlib
+from time import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Union
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from . import logger
+
+"""Persistent cache for the responses of the web services."""
+
+
+class ResponseCache:
+    """An on-disk cache of HTTP responses backed by a SQLite database.
+    Responses are keyed by a hash of the method, the url and the parameters of the request.
+    Each entry is time-stamped so that services can apply their own time-to-live.
+    When the total size of the cached content exceeds max_size, the least recently used entries are evicted.
+    The cache can be shared by several threads.
+
+    Args:
+        cache_dir (str): the directory where the database is stored.
+        max_size (int): the maximum size in bytes of the cached content.
+    """
+
+    FILENAME = 'responses.sqlite'
+    # credentials do not change the response and should not invalidate the cache
+    IGNORED_PARAMS = ('apiKey', 'api_key')
+
+    def __init__(self, cache_dir: str, max_size: int = 2 * 1024 ** 3):
+        self.path = Path(cache_dir) / self.FILENAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, service TEXT, url TEXT, status INTEGER, headers TEXT, content BLOB, "
+            "size INTEGER, created REAL, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        logger.debug(f"response cache {self.path} opened with {self.size} bytes.")
+
+    @classmethod
+    def key(cls, method: str, url: str, params: Union[Dict, str, None] = None) -> str:
+        """Computes the key of a request.
+
+        Args:
+            method (str): the HTTP method.
+            url (str): the url of the request.
+            params (Union[Dict, str, None]): the query parameters or the form data sent with the request.
+
+        Returns:
+            (str): the hex digest identifying the request.
+        """
+        if isinstance(params, dict):
+            params = {k: v for k, v in params.items() if k not in cls.IGNORED_PARAMS}
+        fingerprint = json.dumps([method.upper(), url, params], sort_keys=True, default=str)
+        return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, ttl: float) -> requests.Response:
+        """Retrieves a cached response if it is younger than ttl.
+
+        Args:
+            key (str): the key of the request.
+            ttl (float): the time-to-live in seconds.
+
+        Returns:
+            (requests.Response): the cached response or None if absent or expired.
+        """
+        now = time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, status, headers, content FROM responses WHERE key = ? AND created > ?",
+                (key, now - ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        url, status, headers, content = row
+        response = requests.Response()
+        response.url = url
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response._content = content
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def set(self, key: str, service: str, response: requests.Response):
+        """Stores a response and evicts the least recently used entries if the cache is full.
+
+        Args:
+            key (str): the key of the request.
+            service (str): the name of the service, for bookkeeping.
+            response (requests.Response): the response to store.
+        """
+        content = response.content
+        size = len(content)
+        now = time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, service, response.url, response.status_code, json.dumps(dict(response.headers)), content, size, now, now)
+            )
+            self.size += size - (previous[0] if previous else 0)
+            if self.size > self.max_size:
+                self._evict(target=int(0.9 * self.max_size))
+
+    def _evict(self, target: int):
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self.size <= target:
+                break
+            evicted.append((key,))
+            self.size -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        logger.debug(f"evicted {len(evicted)} responses from cache.")
+
+    def clear(self):
+        """Removes all the cached responses."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self.size = 0
+
+    def __str__(self):
+        return f"{self.path}: {self.hits} hits, {self.misses} misses, {self.size / 1024 ** 2:.1f} MB"
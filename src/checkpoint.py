@@ -0,0 +1,83 @@
+import json
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Tuple
+
+from .models import Result
+from . import logger
+
+"""Checkpoint of the search results of a scan in progress."""
+
+
+class Checkpoint:
+    """An append-only JSONL file where the outcome of each search is written as soon as it completes.
+    Each line holds the serialized Result (see Result.to_dict()) and whether a match was found.
+    When resuming, the outcomes already in the file are loaded and the corresponding submissions are not searched again.
+    Otherwise, the file is started anew. A truncated last line, left by an interrupted write, is ignored.
+    The checkpoint can be written by several threads.
+
+    Args:
+        path (str): the path to the JSONL file.
+        resume (bool): whether to load the outcomes saved by a previous, interrupted, scan.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.completed: Dict[str, Tuple[Result, bool]] = self.read(self.path) if resume else {}
+        if resume:
+            logger.info(f"resuming from {len(self.completed)} search outcomes saved in {self.path}.")
+        self._lock = Lock()
+        self._file = self.path.open('a' if resume else 'w', encoding='utf-8')
+        if resume and self._file.tell() > 0 and not self.path.read_bytes().endswith(b'\n'):
+            self._file.write('\n')  # terminates the incomplete line so that the next outcome starts on its own line
+
+    @staticmethod
+    def read(path: Path) -> Dict[str, Tuple[Result, bool]]:
+        """Reads the outcomes saved in a checkpoint or in the results of a shard (see Scanner.save_shard()).
+
+        Args:
+            path (Path): the path to the JSONL file.
+
+        Returns:
+            (Dict[str, Tuple[Result, bool]]): the result of each manuscript and whether a matching article was found.
+        """
+        completed = {}
+        path = Path(path)
+        if not path.exists():
+            return completed
+        with path.open(encoding='utf-8') as f:
+            for i, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"ignoring incomplete line {i + 1} of {path}.")
+                    continue
+                result = Result.from_dict(record['result'])
+                completed[result.submission.manuscript_nm] = (result, record['found'])
+        return completed
+
+    def write(self, result: Result, found: bool):
+        """Appends the outcome of the search of a submission to the checkpoint.
+
+        Args:
+            result (Result): the result of the search.
+            found (bool): whether a matching article was found.
+        """
+        line = json.dumps({'result': result.to_dict(), 'found': found}, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self, remove: bool = False):
+        """Closes the checkpoint.
+
+        Args:
+            remove (bool): whether to delete the file, once the scan has completed and the results have been exported.
+        """
+        self._file.close()
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+    def __len__(self):
+        return len(self.completed)
@@ -4,6 +4,7 @@ from typing import Dict
 # from .models import PreprintInclusion, Config
 
 import src.descriptions as descriptions
+from . import CACHE, SPACY_MODEL
 
 """Application-wide preferences"""
 
@@ -31,16 +32,76 @@ class Config:
         include_citations (bool): whether to include citation data.
         input_description (Dict): description of rows and columns of the input file.
         dayfirst (bool): whether to interpret the first value in an ambiguous 3-integer date (e.g. 01/05/09) as the day (True) or month (False)
+        workers (int): the number of submissions searched concurrently.
+        match_processes (int): the number of processes matching candidates with submissions, each with its own copy of the spaCy model; 0 to match in the searching threads.
+        cache_dir (str): the directory where responses of the web services are cached; no caching if None.
+        spacy_model (str): name or path of the spaCy model providing the word vectors used to compare titles.
+        precompute_title_vectors (bool): whether to embed all the submitted titles before a scan and save them next to the report for later runs.
+        lexical_hit_threshold (float): word overlap (Jaccard index) above which titles are deemed the best matches, the other candidates being skipped without comparing vectors (an approximation, see match.title_similarities()); above 1.0 to disable.
+        two_phase_search (bool): whether EuropePMC candidates are screened with lite records, the full record being fetched for the best candidate only.
+        author_max_pages (int): maximum number of pages of results retrieved for an author search, stopping at the first page with a successful match.
+        author_page_size (int): number of results per page after the first page of an author search, which has 5 results.
+        title_batch_size (int): number of submissions whose titles are searched together in a single query (see SearchEngine.batch_search_by_title); 0 to search titles one by one.
+        batch_page_size (int): number of results per page of a batch query.
+        batch_max_pages (int): maximum number of pages retrieved for a batch query; titles without a good candidate in an incomplete batch are searched one by one.
+        batch_min_overlap (float): word overlap (Jaccard index) with a title of a batch query above which a retrieved article is a candidate for this title.
+        pubmed_fetch_size (int): maximum number of PubMed records fetched with a single efetch request when searches are batched.
+        preprint_index (bool): whether the publication status of preprints is looked up in a local index downloaded in bulk from bioRxiv (see preprints.PreprintIndex) rather than requested preprint by preprint.
+        pool_maxsize (int): number of connections kept alive per host and shared by all the services (see net.ConnectionPools); should not be lower than the number of requests in flight to a service.
+        connect_timeout (float): timeout in seconds to connect to a web service, for requests without an explicit timeout; None to wait indefinitely.
+        read_timeout (float): timeout in seconds between two bytes received from a web service, for requests without an explicit timeout; None to wait indefinitely.
+        local_index (str): path to the local index of PubMed baseline files searched by offline scans (see offline.LocalEngine); None to search online.
+        retry_not_found_after (float): in incremental scans, number of days after which submissions that were not found are searched again.
     """
     preprint_inclusion: PreprintInclusion = field(default=PreprintInclusion.NO_PREPRINT)
     include_citations: bool = field(default=False)
     input_description: Dict = field(default_factory=dict)
     dayfirst: bool = field(default=False)
+    workers: int = field(default=1)
+    match_processes: int = field(default=0)
+    cache_dir: str = field(default=None)
+    spacy_model: str = field(default='en_core_web_lg')
+    precompute_title_vectors: bool = field(default=True)
+    lexical_hit_threshold: float = field(default=0.9)
+    two_phase_search: bool = field(default=False)
+    author_max_pages: int = field(default=1)
+    author_page_size: int = field(default=100)
+    title_batch_size: int = field(default=0)
+    batch_page_size: int = field(default=1000)
+    batch_max_pages: int = field(default=3)
+    batch_min_overlap: float = field(default=0.1)
+    pubmed_fetch_size: int = field(default=200)
+    preprint_index: bool = field(default=False)
+    pool_maxsize: int = field(default=10)
+    connect_timeout: float = field(default=None)
+    read_timeout: float = field(default=None)
+    local_index: str = field(default=None)
+    retry_not_found_after: float = field(default=30)
 
 
 config = Config(
     preprint_inclusion=PreprintInclusion.NO_PREPRINT,  # PreprintInclusion.NO_PREPRINT,
     include_citations=True,
     input_description=descriptions.ejp_query_tool_matchpub_report,  # descriptions.ejp_editor_track_report,  # 
-    dayfirst=False
+    dayfirst=False,
+    workers=8,
+    match_processes=0,
+    cache_dir=CACHE,
+    spacy_model=SPACY_MODEL or 'en_core_web_lg',  # a smaller model with vectors, e.g. en_core_web_md, loads faster
+    precompute_title_vectors=True,
+    lexical_hit_threshold=0.9,
+    two_phase_search=True,
+    author_max_pages=3,
+    author_page_size=100,
+    title_batch_size=0,
+    batch_page_size=1000,
+    batch_max_pages=3,
+    batch_min_overlap=0.1,
+    pubmed_fetch_size=200,
+    preprint_index=True,
+    pool_maxsize=16,
+    connect_timeout=10,
+    read_timeout=60,
+    local_index=None,
+    retry_not_found_after=30
 )
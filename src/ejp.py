@@ -1,13 +1,24 @@
+import os
 import re
+import json
+import hashlib
+from pathlib import Path
 import pandas as pd
 from typing import List, Dict
 from collections import UserDict
 
 from .models import Submission
+from .decision import normalize_decision, decision_matching_regex
+from .utils import normalize, normalize_date, last_name, process_authors, author_ids
 from .config import config
 from . import logger
 
 
+# to be incremented whenever a change of the parsing or of the normalization of the reports (EJPReport._normalize(),
+# utils.normalize(), utils.normalize_date(), utils.last_name(), utils.process_authors()) changes the normalized table, to invalidate the snapshots
+NORMALIZATION_VERSION = 1
+
+
 class Metadata(UserDict):
 
     def __init__(self, keys: List[str]):
@@ -28,22 +39,32 @@ class EJPReport:
         metadata_keys (List[str]): the ordered list of metadata fields to be captured from the initial rows in the table.
         header_signature (List[str]): a list of regex that will be used to identify the header row.
         feature_index (Dict[str, int]): map the required feature ('manuscript_nm', 'editor', 'journal_decision', 'title', 'authors') to column index (zero indexed) in the table.
+        refresh (bool): whether to parse the excel file again even if a snapshot of the parsed report exists.
+
+    The parsed and normalized report is saved as a Parquet snapshot next to the excel file, with its metadata in a json file.
+    The name of the snapshot includes a hash of the content of the file, of the description of its format, of the regex of
+    decision.py and of NORMALIZATION_VERSION, so that later runs load the snapshot instead of parsing the excel file again
+    as long as none of them has changed.
     """
     def __init__(
         self,
         filepath: str,
         metadata_keys: List[str] = config.input_description['metadata_keys'],
         header_signature: List[str] = config.input_description['header_signature'],
-        feature_index: Dict[str, int] = config.input_description['feature_index']
+        feature_index: Dict[str, int] = config.input_description['feature_index'],
+        refresh: bool = False
     ):
         self.filepath = filepath
         self.metadata: Metadata = Metadata(metadata_keys)  # metadata about the report
         self.header_signature = header_signature  # signature to find the begning of the table
         self.actual_header = []  # the actual header found in the file
         self.feature_index = feature_index  # the index of the features that need to be extracted
-        self.data: pd.DataFrame = None  # the table with the list of manuscripts
+        self.data: pd.DataFrame = None  # the table with the list of manuscripts, with the columns normalized into the fields of Submission
         self.articles: List[Submission] = []  # the list of articles to retrieve
-        self._read_excel(filepath)
+        self.snapshot_path: Path = self._snapshot_path()
+        if refresh or not self._read_snapshot():
+            self._read_excel(filepath)
+            self._save_snapshot()
 
     def _read_excel(self, filepath):
         # sheet = xlrd.open_workbook(filepath).sheet_by_index(0)
@@ -55,6 +76,71 @@ class EJPReport:
         logger.debug("loading ejp articles")
         self._load_articles()
 
+    def _snapshot_path(self) -> Path:
+        filepath = Path(self.filepath)
+        fingerprint = hashlib.sha256()
+        with filepath.open('rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                fingerprint.update(chunk)
+        description = [
+            list(self.metadata), self.header_signature, self.feature_index,
+            config.input_description['decisions_considered'], config.dayfirst,
+            {decision: [regex.pattern, regex.flags] for decision, regex in decision_matching_regex.items()},
+            NORMALIZATION_VERSION
+        ]
+        fingerprint.update(json.dumps(description, sort_keys=True).encode('utf-8'))
+        return filepath.parent / f"{filepath.stem}-{fingerprint.hexdigest()[:16]}.parquet"
+
+    @staticmethod
+    def _metadata_path(snapshot_path: Path) -> Path:
+        return snapshot_path.with_suffix('.json')
+
+    def _save_snapshot(self):
+        snapshot = self.data.drop(columns=['author_ids'])  # ids are specific to the process, see utils.NameVocabulary
+        metadata = {'metadata': dict(self.metadata), 'actual_header': [str(h) for h in self.actual_header], 'rows': len(snapshot)}
+        try:
+            # written to temporary files first and renamed, so that shards parsing the same report never read a partial snapshot;
+            # the metadata is renamed first and a snapshot is only read when both agree on the number of rows
+            tmp_path = self.snapshot_path.with_name(f"{self.snapshot_path.stem}.{os.getpid()}.tmp")
+            tmp_metadata_path = tmp_path.with_suffix('.json.tmp')
+            with tmp_metadata_path.open('w') as f:
+                json.dump(metadata, f)
+            snapshot.to_parquet(tmp_path)
+            os.replace(tmp_metadata_path, self._metadata_path(self.snapshot_path))
+            os.replace(tmp_path, self.snapshot_path)
+            logger.debug(f"saved snapshot of the report to {self.snapshot_path}")
+        except Exception as e:
+            logger.warning(f"could not save snapshot of the report to {self.snapshot_path} ({e})")
+
+    def _read_snapshot(self) -> bool:
+        """Loads the report from its snapshot, if any.
+
+        Returns:
+            (bool): whether a valid snapshot was loaded.
+        """
+        metadata_path = self._metadata_path(self.snapshot_path)
+        if not (self.snapshot_path.exists() and metadata_path.exists()):
+            return False
+        logger.info(f"loading parsed report from snapshot {self.snapshot_path}")
+        try:
+            with metadata_path.open() as f:
+                metadata = json.load(f)
+            data = pd.read_parquet(self.snapshot_path)
+        except Exception as e:
+            logger.warning(f"could not read snapshot {self.snapshot_path} ({e}); parsing the report again.")
+            return False
+        if len(data) != metadata.get('rows'):
+            logger.warning(f"snapshot {self.snapshot_path} does not match its metadata; parsing the report again.")
+            return False
+        self.metadata.update(metadata['metadata'])
+        self.actual_header = metadata['actual_header']
+        data['author_list'] = data['author_list'].map(list)
+        data['expanded_author_list'] = data['expanded_author_list'].map(lambda authors: [list(alternatives) for alternatives in authors])
+        data['author_ids'] = data['expanded_author_list'].map(author_ids)
+        self.data = data
+        self._load_articles()
+        return True
+
     def _load_metadata(self, sheet):
         for i, k in enumerate(self.metadata):
             row = sheet[0][i]
@@ -65,44 +151,104 @@ class EJPReport:
                 logger.error(f"The row #{i} supposed to include info on '{k}' is not a string. Ignored.")
 
     def _load_data(self, sheet: pd.DataFrame):
+        self.data = self._normalize(self._select(sheet))
+
+    def _select(self, sheet: pd.DataFrame) -> pd.DataFrame:
+        """Selects the rows of the submissions with a decision to be considered and the columns listed in feature_index.
+
+        Args:
+            sheet (pd.DataFrame): the whole sheet of the report.
+
+        Returns:
+            (pd.DataFrame): the table with one column per feature, as found in the report.
+        """
         start = self._guess_start(sheet)  # where does the actual table start?
         data = sheet[start:].copy()  # select the relevant rows of the data frame
-        self._cleanup(data)  # remove 'parasite' rows that repeat the header and replace NaN with empty string
+        data = self._cleanup(data)  # remove 'parasite' rows that repeat the header and replace NaN with empty string
         # remove anything that is not matching an accept/reject decision
-        reduced_data = pd.DataFrame()
-        for feature_name, idx in self.feature_index.items():
-            reduced_data[feature_name] = data[idx]  # pick only the columns we need
+        reduced_data = pd.DataFrame({feature_name: data[idx] for feature_name, idx in self.feature_index.items()})  # pick only the columns we need
         # TODO: fix the data type per column
-        mask = reduced_data['journal_decision'].apply(lambda x: re.search(config.input_description['decisions_considered'], x, re.IGNORECASE) is not None)
-        filtered_data = reduced_data[mask].copy()
-        self.data = filtered_data
+        mask = reduced_data['journal_decision'].str.count(config.input_description['decisions_considered'], flags=re.IGNORECASE) > 0
+        return reduced_data[mask].copy()
+
+    def _normalize(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Normalizes the columns of the table into the fields of Submission, one column at a time.
+        Functions that are not vectorized are applied only once per distinct value.
+
+        Args:
+            data (pd.DataFrame): the table with the columns listed in feature_index.
+
+        Returns:
+            (pd.DataFrame): the table with one column per field of Submission.
+        """
+        def map_unique(column: pd.Series, funct) -> pd.Series:
+            mapping = {value: funct(value) for value in column.unique()}
+            return column.map(mapping)
+
+        def column(name: str, default) -> pd.Series:
+            return data[name] if name in data else pd.Series(default, index=data.index, dtype=object)
+
+        normalized = pd.DataFrame(index=data.index)
+        normalized['manuscript_nm'] = data['manuscript_nm']
+        normalized['editor'] = column('editor', 'editor name not available')
+        normalized['journal_decision'] = data['journal_decision']
+        normalized['decision'] = map_unique(data['journal_decision'], normalize_decision)
+        normalized['sub_date'] = map_unique(data['sub_date'].astype(str), normalize_date)  # normalize date to ISO format with date only
+        normalized['min_time_to_secure_rev'] = pd.to_numeric(column('min_time_to_secure_rev', 0), errors='coerce')
+        normalized['avg_time_to_secure_rev'] = pd.to_numeric(column('avg_time_to_secure_rev', 0), errors='coerce')
+        normalized['referee_number'] = pd.to_numeric(column('referee_number', 0), errors='coerce')
+        normalized['title'] = data['title'].map(lambda title: normalize(title, do=['ctrl']))  # remove control characters that are invariably toxic
+        normalized['abstract'] = column('abstract', 'abstract not available').map(normalize)  # rare illegal character can block pd.ExcelWriter
+        normalized['author_list'] = self._split_author_lists(data['authors'])
+        normalized['expanded_author_list'] = normalized['author_list'].map(process_authors)
+        normalized['author_ids'] = normalized['expanded_author_list'].map(author_ids)
+        return normalized
+
+    @staticmethod
+    def _split_author_lists(authors: pd.Series) -> pd.Series:
+        """Column-wise equivalent of Submission.split_author_list(), except that the order of the names is preserved.
+
+        Args:
+            authors (pd.Series): the column of comma-separated author lists.
+
+        Returns:
+            (pd.Series): the column with the lists of unique last names.
+        """
+        names = authors.astype(str).str.split(",").explode().str.strip()  # ejp has a bug which duplicates names with an added space
+        names = names[~names.reset_index().duplicated().to_numpy()]  # unique names per submission
+        names = names.str.replace(r"-corr$", "", regex=True).str.strip()
+        names = names[names != ""]  # remove empty names
+        names = names.str.replace(r"\s+", " ", regex=True)  # some names have apparently several spaces or non-breaking spaces between first and last name
+        last_names = names.map({name: last_name(name) for name in names.unique()})  # extract last names including particle
+        author_lists = last_names.groupby(level=0, sort=False).agg(list)
+        return author_lists.reindex(authors.index).map(lambda x: x if isinstance(x, list) else [])
 
     def _load_articles(self):
-        self.articles = [Submission(row=row) for i, row in self.data.iterrows()]
+        self.articles = [Submission(**record) for record in self.data.to_dict('records')]
 
     def _guess_start(self, sheet: pd.DataFrame, max_rows: int = 100) -> int:
-        start = None
         num_rows, num_cols = sheet.shape
-        for i, row in sheet.iterrows():
-            logger.debug(f"scanning row {row.to_list()}")
-            if i > max_rows:
-                raise ValueError(f"Error parsing {self.filepath} - Could not find the begining of the table with headers {self.header_signature}")
-            putative_header = row.to_list()
-            if len(putative_header) == len(self.header_signature) and all([isinstance(e, str) for e in putative_header]):
-                if all([re.match(expected, putative, re.IGNORECASE) for expected, putative in zip(self.header_signature, putative_header)]):
-                    self.actual_header = putative_header
-                    start = i + 1  # success!
-                    logger.debug(f"Found start of the table at position {start}")
-                    return start
+        if num_cols == len(self.header_signature):
+            head = sheet.iloc[:max_rows + 1]
+            is_header = pd.Series(True, index=head.index)
+            for j, expected in enumerate(self.header_signature):
+                cells = head.iloc[:, j]
+                is_str = cells.map(lambda e: isinstance(e, str)).astype(bool)
+                is_header &= is_str & cells.where(is_str, '').str.match(expected, case=False)
+            candidates = is_header[is_header].index
+            if len(candidates) > 0:
+                i = candidates[0]
+                self.actual_header = sheet.loc[i].to_list()
+                start = i + 1  # success!
+                logger.debug(f"Found start of the table at position {start}")
+                return start
         raise ValueError(f"Error parsing {self.filepath} - Could not find the begining of the table with headers {self.header_signature}")
 
-    def _cleanup(self, data: pd.DataFrame):
-        for i, row in data.iterrows():
-            elements = row.to_list()
-            if elements == self.actual_header:
-                data.drop(index=i, inplace=True)
-        data.reset_index(drop=True, inplace=True)
-        data.fillna("", inplace=True)  # replace NaN by empty string to avoid exception with re.search()
+    def _cleanup(self, data: pd.DataFrame) -> pd.DataFrame:
+        is_header = data.eq(pd.Series(self.actual_header, index=data.columns)).all(axis=1)
+        data = data[~is_header].reset_index(drop=True)
+        data = data.fillna("")  # replace NaN by empty string to avoid exception with re.search()
+        return data
 
     def __str__(self):
         return str(self.data)
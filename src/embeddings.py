@@ -0,0 +1,144 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from .match import embed_titles
+from .utils import normalize
+from .config import config
+from . import logger
+
+"""Precomputed title vectors of the submissions of a report."""
+
+
+class TitleEmbeddingStore:
+    """The vectors of the titles of all the submissions of a report, computed once and saved next to the report.
+    The vectors are kept in a float32 matrix saved as a .npy file which is memory-mapped when loaded, so that the matching
+    processes share the pages of a single copy. A json index maps the hash of each normalized title to its row in the matrix,
+    keeps the token ids needed to detect identical titles and names the .npy file of the matrix. The store is tied to the
+    spaCy model used to compute the vectors.
+    Each version of the matrix is saved under its own name, derived from the titles and the model, before the index is replaced:
+    the index, replaced in a single rename, always refers to a complete matrix of matching rows.
+
+    Args:
+        path (Path): the path to the json index.
+        keys (List[str]): the hash of the normalized title of each row.
+        tokens (List[Tuple[int]]): the token ids of the normalized title of each row.
+        matrix (np.ndarray): the title vectors, one row per title.
+        matrix_path (Path): the path to the .npy file the matrix was loaded from, None if not saved yet.
+    """
+
+    def __init__(self, path: Path, keys: List[str], tokens: List[Tuple[int]], matrix: np.ndarray, matrix_path: Path = None):
+        self.path = Path(path)
+        self.keys = keys
+        self.tokens = tokens
+        self.matrix = matrix
+        self.matrix_path = matrix_path
+        self.index: Dict[str, int] = {k: i for i, k in enumerate(keys)}
+
+    @staticmethod
+    def key(title: str) -> str:
+        return hashlib.sha1(normalize(title).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def for_report(cls, report_path: str, titles: List[str]) -> 'TitleEmbeddingStore':
+        """Loads the store saved next to the report and embeds only the titles that are not yet in it.
+
+        Args:
+            report_path (str): the path to the report; the store is saved as <report>-title-vectors.json and its matrix
+                as <report>-title-vectors-<digest>.npy
+            titles (List[str]): the titles of the submissions.
+
+        Returns:
+            (TitleEmbeddingStore): the store including all the titles.
+        """
+        report_path = Path(report_path)
+        path = report_path.parent / f"{report_path.stem}-title-vectors.json"
+        store = cls.load(path)
+        if store is None:
+            store = cls(path, [], [], np.zeros((0, 0), dtype=np.float32))
+        missing = list({cls.key(t): t for t in titles if cls.key(t) not in store.index}.items())
+        if missing:
+            logger.info(f"embedding {len(missing)} titles into {path}.")
+            store.add([k for k, _ in missing], [t for _, t in missing])
+            store.save()
+        return store
+
+    @classmethod
+    def load(cls, path: Path) -> 'TitleEmbeddingStore':
+        """Loads a saved store, memory-mapping the matrix of vectors.
+
+        Args:
+            path (Path): the path to the json index.
+
+        Returns:
+            (TitleEmbeddingStore): the store or None if missing, inconsistent or computed with another model.
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+        with path.open() as f:
+            index = json.load(f)
+        if index['model'] != config.spacy_model:
+            logger.info(f"title vectors in {path} were computed with {index['model']}, not {config.spacy_model}; ignored.")
+            return None
+        matrix_path = path.parent / index['matrix']
+        if not matrix_path.exists():
+            logger.warning(f"the title vectors {matrix_path} indexed in {path} are missing; ignored.")
+            return None
+        matrix = np.load(matrix_path, mmap_mode='r')
+        if not (len(index['keys']) == len(index['tokens']) == matrix.shape[0]):
+            logger.warning(f"the title vectors {matrix_path} do not match their index {path}; ignored.")
+            return None
+        tokens = [tuple(t) for t in index['tokens']]
+        logger.debug(f"loaded {len(tokens)} title vectors from {matrix_path}.")
+        return cls(path, index['keys'], tokens, matrix, matrix_path)
+
+    def add(self, keys: List[str], titles: List[str]):
+        tokens, matrix = embed_titles(titles)
+        if len(self.keys) > 0:
+            matrix = np.concatenate([np.asarray(self.matrix), matrix])
+        self.index.update({k: len(self.keys) + i for i, k in enumerate(keys)})
+        self.keys = self.keys + keys
+        self.tokens = self.tokens + tokens
+        self.matrix = matrix
+
+    def save(self):
+        # the matrix and the index are written to temporary files first and renamed, so that shards scanned concurrently never read
+        # a partial file; a crash before the index is renamed leaves the previous index, which still refers to the previous matrix
+        digest = hashlib.sha1(''.join([config.spacy_model] + self.keys).encode('utf-8')).hexdigest()[:12]
+        matrix_path = self.path.with_name(f"{self.path.stem}-{digest}.npy")
+        tmp_matrix_path = self.path.with_name(f"{matrix_path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp_matrix_path, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        os.replace(tmp_matrix_path, matrix_path)
+        tmp_path = self.path.with_name(f"{self.path.stem}.{os.getpid()}.tmp.json")
+        with tmp_path.open('w') as f:
+            json.dump({'model': config.spacy_model, 'matrix': matrix_path.name, 'keys': self.keys, 'tokens': self.tokens}, f)
+        os.replace(tmp_path, self.path)
+        if self.matrix_path is not None and self.matrix_path != matrix_path:
+            self.matrix_path.unlink(missing_ok=True)  # no longer indexed; processes that mapped it keep their mapping
+        self.matrix_path = matrix_path
+        self.matrix = np.load(matrix_path, mmap_mode='r')
+        logger.debug(f"saved {len(self.keys)} title vectors to {matrix_path}.")
+
+    def lookup(self, title: str) -> Tuple[Tuple[int], np.ndarray]:
+        """Looks up a title in the store.
+
+        Args:
+            title (str): the title, not yet normalized.
+
+        Returns:
+            (Tuple[int]): the token ids of the normalized title.
+            (np.ndarray): the title vector.
+            or None if the title is not in the store.
+        """
+        i = self.index.get(self.key(title))
+        if i is None:
+            return None
+        return self.tokens[i], self.matrix[i]
+
+    def __len__(self):
+        return len(self.keys)
@@ -1,18 +1,45 @@
-from typing import List, Tuple, Set, Callable, Union
+from typing import List, Tuple, Set, Callable, Union, FrozenSet
+from threading import Lock
+from functools import lru_cache
+from collections import Counter
 
 import numpy as np
 from lxml.etree import Element
-import spacy
 
-from .utils import process_authors, flat_unique_set, normalize
+from .utils import process_authors, author_ids, normalize
 from .models import Paper
+from .config import config, Config
 from . import logger
 
-# do this before in Dockerfile: python -m spacy download en_core_web_lg
-nlp = spacy.load('en_core_web_lg')
+# only word vectors are needed to compute similarity; the other components are not loaded
+UNUSED_COMPONENTS = ['tok2vec', 'tagger', 'morphologizer', 'parser', 'attribute_ruler', 'lemmatizer', 'ner', 'senter']
+_nlp = None
+_nlp_lock = Lock()
+_title_store = None  # precomputed submission title vectors, see embeddings.TitleEmbeddingStore
+# number of candidate titles resolved by each tier of title_similarities()
+tier_counts = Counter()
+_tier_lock = Lock()
 
 
-def match_by_title(candidates: List[Paper], submitting_authors: List[List[str]], submitted_title: str, auth_threshold: float = 0.50, title_threshold: float = 0.85) -> Tuple[Paper, bool]:
+def get_nlp():
+    """Loads the spaCy model specified in config.spacy_model on first use and returns it.
+    The model is loaded only once, even when called concurrently from several threads.
+
+    Returns:
+        (spacy.language.Language): the loaded pipeline, reduced to the tokenizer and the vectors.
+    """
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                import spacy  # deferred to avoid the cost of importing spacy when no matching is done
+                # do this before in Dockerfile: python -m spacy download en_core_web_lg
+                logger.info(f"loading spaCy model {config.spacy_model}")
+                _nlp = spacy.load(config.spacy_model, exclude=UNUSED_COMPONENTS)
+    return _nlp
+
+
+def match_by_title(candidates: List[Paper], submitting_authors: List[List[str]], submitted_title: str, auth_threshold: float = 0.50, title_threshold: float = 0.85, submitting_ids: FrozenSet[int] = None) -> Tuple[Paper, bool]:
     """Given a list of candidate articles, find the one that has the highest similartiy score for the title.
     Validates the match to satisfy sufficient author overlap as well.
 
@@ -20,20 +47,23 @@ def match_by_title(candidates: List[Paper], submitting_authors: List[List[str]],
         candidates (List[Paper]): the list of candidate submissions.
         submitted_title (str): the title of the submitted paper we are trying to match.
         threshold (float): the threshold above which the similartiy score between titles should be.
+        submitting_ids (FrozenSet[int]): the interned submitting author names, if already known (Submission.author_ids).
 
     Returns:
         (Article): the best retrieved article.
         (bool): whether the similarity score is above threshold and the match successful
     """
     match, success = _match(candidates, submitted_title, max_title_similarity, title_threshold)
-    author_overlap_score = overlap_score(flat_unique_set(submitting_authors), len(submitting_authors), flat_unique_set(match.expanded_author_list))
+    if submitting_ids is None:
+        submitting_ids = author_ids(submitting_authors)
+    author_overlap_score = overlap_score(submitting_ids, len(submitting_authors), match.author_ids)
     match.author_overlap_score = author_overlap_score
     validation = author_overlap_score >= auth_threshold
     success = success and validation
     return match, success
 
 
-def match_by_author(candidates: List[Paper], submitting_authors: List[List[str]], submitted_title: str, auth_threshold: float = 0.50, title_threshold: float = 0.85) -> Tuple[Paper, bool]:
+def match_by_author(candidates: List[Paper], submitting_authors: List[List[str]], submitted_title: str, auth_threshold: float = 0.50, title_threshold: float = 0.85, submitting_ids: FrozenSet[int] = None) -> Tuple[Paper, bool]:
     """Given a list of candidate articles, find the one that has the maximal overlap of author names.
     Validates the match to satisty sufficient title simlilarity.
 
@@ -41,12 +71,13 @@ def match_by_author(candidates: List[Paper], submitting_authors: List[List[str]]
         candidates (List[Paper]): the list of candidate Articles.
         submitting_authors (List[List[str]]): the set of unique author last names.
         threshold (float): the threshold above which the similartiy score between titles should be.
+        submitting_ids (FrozenSet[int]): the interned submitting author names, if already known (Submission.author_ids).
 
     Returns:
         (Article): the best retrieved article.
         (bool): whether a match could be found
     """
-    match, success = _match(candidates, submitting_authors, max_author_overlap, auth_threshold)
+    match, success = _match(candidates, submitting_authors, max_author_overlap, auth_threshold, submitting_ids=submitting_ids)
     title_similarity_score = similarity(submitted_title, match.title)
     match.title_similarity_score = title_similarity_score
     validation = title_similarity_score >= title_threshold
@@ -58,7 +89,8 @@ def _match(
     candidates: List[Paper],
     submitted_feature: Union[str, List[List[str]]],
     similarity_funct: Callable,
-    threshold: float
+    threshold: float,
+    **kwargs
 ) -> Tuple[Paper, bool]:
     """Given a list of candidate articles, finds the one with the best similartiy score.
 
@@ -67,12 +99,13 @@ def _match(
         submitted_feature (Union[str, List[List[str]]]): eith the title or the authors of the submission we are trying to match.
         best_similarity_funct (Callable): a function taking the candidates and the submitted feature as args and returning the best matching paper and its score.
         threshold (float): the threshold above which the similartiy score between titles should be.
+        kwargs: additional keyword arguments passed to similarity_funct.
 
     Returns:
         (Article): the best retrieved article.
         (bool): whether the similarity score is above threshold and the match successful
     """
-    match, score = similarity_funct(candidates, submitted_feature)
+    match, score = similarity_funct(candidates, submitted_feature, **kwargs)
     logger.debug(f"best match : '{match.title}' {match.author_list}.  Score {score:.2f} ({similarity_funct.__name__})")
     success = (score >= threshold)
     if not success:
@@ -81,26 +114,144 @@ def _match(
 
 
 def max_title_similarity(candidates: List[Paper], title: str = '') -> Tuple[Paper, float]:
-    score_list = [similarity(title, Article.title) for Article in candidates]
-    idx = np.array(score_list).argmax()
+    scores = title_similarities(title, [Article.title for Article in candidates])
+    idx = np.nanargmax(scores)
     match = candidates[idx]
-    score = score_list[idx]
+    score = float(scores[idx])
     match.title_similarity_score = score
     return match, score
 
 
 def similarity(s1: str, s2: str) -> float:
-    n1 = nlp(normalize(s1))
-    n2 = nlp(normalize(s2))
-    score = n1.similarity(n2)
+    score = float(title_similarities(s1, [s2])[0])
     return score
 
 
-def max_author_overlap(candidates: List[Paper], authors: List[List[str]] = [[]]) -> Tuple[Paper, float]:
+def title_similarities(title: str, candidate_titles: List[str]) -> np.ndarray:
+    """Scores candidate titles with word vectors (see vector_similarities), skipping the comparisons that cannot change the best match:
+    - 'exact': titles with the same sequence of normalized words score 1.0, as with vectors, without being embedded.
+    - 'lexical_hit': titles sharing nearly all their words, with a Jaccard index of the sets of normalized words
+    above config.lexical_hit_threshold, are deemed the best matches and are scored with vectors.
+    - 'skipped': when there are exact or lexical hits, the other candidates are not compared and score NaN.
+    - 'vector': otherwise, all the candidates are compared with word vectors.
+    Skipping after an exact hit cannot change the best match, as no vector similarity exceeds 1.0. Skipping after a lexical hit is
+    an approximation: a skipped candidate sharing fewer words could have scored higher with vectors, and the best match and its score
+    may then differ from a comparison of all the candidates with vectors. Set config.lexical_hit_threshold above 1.0 to disable it.
+    The number of candidates resolved by each tier is accumulated in tier_counts.
+
+    Args:
+        title (str): the reference title, usually the submitted title.
+        candidate_titles (List[str]): the titles to compare with.
+
+    Returns:
+        (np.ndarray): the similarity score for each candidate title, NaN for skipped candidates.
+    """
+    title_words = normalize(title).split()
+    words = set(title_words)
+    scores = np.full(len(candidate_titles), np.nan, dtype=np.float32)
+    tiers = [None] * len(candidate_titles)
+    for i, candidate_title in enumerate(candidate_titles):
+        candidate_title_words = normalize(candidate_title).split()
+        if candidate_title_words == title_words:
+            scores[i] = 1.0
+            tiers[i] = 'exact'
+            continue
+        candidate_words = set(candidate_title_words)
+        union = words | candidate_words
+        if union and len(words & candidate_words) / len(union) >= config.lexical_hit_threshold:
+            tiers[i] = 'lexical_hit'
+    hits = [i for i, tier in enumerate(tiers) if tier == 'lexical_hit']
+    if 'exact' in tiers or hits:
+        compared, others = hits, 'skipped'
+    else:
+        compared, others = list(range(len(candidate_titles))), 'vector'
+    if compared:
+        scores[compared] = vector_similarities(title, [candidate_titles[i] for i in compared])
+    tiers = [tier or others for tier in tiers]
+    with _tier_lock:
+        tier_counts.update(tiers)
+    return scores
+
+
+def vector_similarities(title: str, candidate_titles: List[str]) -> np.ndarray:
+    """Computes the similarity of a title with each of the candidate titles in one matrix operation.
+    Scores are the same as spaCy's Doc.similarity: the cosine of the averaged word vectors,
+    1.0 for identical token sequences and 0.0 when a title has no vector.
+
+    Args:
+        title (str): the reference title, usually the submitted title, which is embedded only once and cached.
+        candidate_titles (List[str]): the titles to compare with, embedded in a single batch.
+
+    Returns:
+        (np.ndarray): the similarity score for each candidate title.
+    """
+    tokens, vector = embed_title(title)
+    candidate_tokens, matrix = embed_titles(candidate_titles)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+    scores = np.divide(matrix @ vector, norms, out=np.zeros(len(candidate_titles), dtype=matrix.dtype), where=norms > 0)
+    identical = np.array([t == tokens for t in candidate_tokens], dtype=bool)
+    scores[identical] = 1.0
+    return scores
+
+
+def use_title_store(store):
+    """Sets the store of precomputed title vectors looked up before running the spaCy pipeline on a title.
+
+    Args:
+        store (TitleEmbeddingStore): the store, None to stop using it.
+    """
+    global _title_store
+    _title_store = store
+    embed_title.cache_clear()
+
+
+@lru_cache(maxsize=4096)
+def embed_title(title: str) -> Tuple[Tuple[int], np.ndarray]:
+    """Embeds a single title. Cached since the same submitted title is compared with all its candidates.
+    Titles found in the title store set with use_title_store() are not embedded again.
+
+    Args:
+        title (str): the title, not yet normalized.
+
+    Returns:
+        (Tuple[int]): the ids of the tokens of the normalized title.
+        (np.ndarray): the title vector (read-only).
+    """
+    if _title_store is not None:
+        stored = _title_store.lookup(title)
+        if stored is not None:
+            return stored
+    doc = get_nlp()(normalize(title))
+    vector = doc.vector.copy()
+    vector.setflags(write=False)
+    return tuple([t.orth for t in doc]), vector
+
+
+def embed_titles(titles: List[str]) -> Tuple[List[Tuple[int]], np.ndarray]:
+    """Embeds a list of titles in a single nlp.pipe batch.
+
+    Args:
+        titles (List[str]): the titles, not yet normalized.
+
+    Returns:
+        (List[Tuple[int]]): the ids of the tokens of each normalized title.
+        (np.ndarray): the matrix of title vectors, one row per title.
+    """
+    nlp = get_nlp()
+    docs = list(nlp.pipe([normalize(t) for t in titles]))
+    tokens = [tuple([t.orth for t in doc]) for doc in docs]
+    matrix = np.zeros((len(docs), nlp.vocab.vectors_length), dtype=np.float32)
+    for i, doc in enumerate(docs):
+        if doc.has_vector:
+            matrix[i] = doc.vector
+    return tokens, matrix
+
+
+def max_author_overlap(candidates: List[Paper], authors: List[List[str]] = [[]], submitting_ids: FrozenSet[int] = None) -> Tuple[Paper, float]:
     num_submitting_authors = len(authors)  # the actual number of submitting authors, not the expanded list
-    flattened_unique_submitting_names = flat_unique_set(authors)
-    flattened_unique_candidate_names = [flat_unique_set(a.expanded_author_list) for a in candidates]
-    overlap_scores = [overlap_score(flattened_unique_submitting_names, num_submitting_authors, names) for names in flattened_unique_candidate_names]
+    if submitting_ids is None:
+        submitting_ids = author_ids(authors)
+    overlap_scores = [overlap_score(submitting_ids, num_submitting_authors, a.author_ids) for a in candidates]
     idx = np.array(overlap_scores).argmax()
     match = candidates[idx]
     score = overlap_scores[idx]
@@ -108,20 +259,68 @@ def max_author_overlap(candidates: List[Paper], authors: List[List[str]] = [[]])
     return match, score
 
 
-def overlap_score(s1: Set[str], N: int, s2: Set[str]) -> float:
+def overlap_score(s1: Set[int], N: int, s2: Set[int]) -> float:
     # N is the length of the non-expanded list of author
     score = len(s1 & s2) / N
     return score
 
 
+# matching in a pool of processes, see scan.Scanner
+
+MATCHERS = {'title': match_by_title, 'author': match_by_author}
+
+
+def init_matcher(settings: Config, title_store_path: str = None):
+    """Initializes a matching process: applies the configuration of the parent process, loads the spaCy model once
+    and the precomputed title vectors, if any.
+
+    Args:
+        settings (Config): the configuration of the parent process, including the overrides set at run time.
+        title_store_path (str): the path to the saved title store (see embeddings.TitleEmbeddingStore), None if not used.
+    """
+    from .embeddings import TitleEmbeddingStore  # embeddings depends on this module
+    vars(config).update(vars(settings))  # in place, as the other modules hold a reference to config
+    get_nlp()
+    if title_store_path is not None:
+        use_title_store(TitleEmbeddingStore.load(title_store_path))
+
+
+def match_in_process(strategy: str, candidates: List[Paper], submitting_authors: List[List[str]], submitted_title: str, submitting_ids: FrozenSet[int]) -> Tuple[Paper, bool, Counter]:
+    """Runs match_by_title or match_by_author in a matching process.
+    The author ids of the submission and of the candidates were interned by the parent process and are compared as is.
+
+    Args:
+        strategy (str): 'title' for match_by_title, 'author' for match_by_author.
+        candidates (List[Paper]): the candidate articles.
+        submitting_authors (List[List[str]]): the expanded author list of the submission.
+        submitted_title (str): the title of the submission.
+        submitting_ids (FrozenSet[int]): the interned submitting author names.
+
+    Returns:
+        (Paper): the best candidate.
+        (bool): whether the match is successful.
+        (Counter): the number of candidate titles resolved by each tier, to be added to tier_counts of the parent process.
+    """
+    tier_counts.clear()
+    match, success = MATCHERS[strategy](candidates, submitting_authors, submitted_title, submitting_ids=submitting_ids)
+    return match, success, Counter(tier_counts)
+
+
+def add_tier_counts(counts: Counter):
+    with _tier_lock:
+        tier_counts.update(counts)
+
+
 def self_test():
     Article_1 = Paper(Element('nothing'))
     Article_1.author_list = ['Roguet', 'Nielsen', 'van der Parasite']
     Article_1.expanded_author_list = process_authors(Article_1.author_list)
+    Article_1.author_ids = author_ids(Article_1.expanded_author_list)
     Article_1.title = "This is a different title or what!"
     Article_2 = Paper(Element('nothing'))
     Article_2.author_list = ['Nobody', 'Somebody', 'Roguet-Simson']
     Article_2.expanded_author_list = process_authors(Article_1.author_list)
+    Article_2.author_ids = author_ids(Article_2.expanded_author_list)
     Article_2.title = "This is my title: or what?"
 
     by_title = match_by_title([Article_1, Article_2], "This is my title: or what?", [["roguet"], ["jens-nielsen", "jens", "nielsen", "nielsen-jens"]])
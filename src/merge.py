@@ -0,0 +1,104 @@
+import re
+import json
+import logging
+from pathlib import Path
+from typing import List, Tuple, Dict
+from argparse import ArgumentParser
+
+from .config import PreprintInclusion, config
+from .models import Result
+from .search import EuropePMCEngine
+from .net import ScopusService
+from .checkpoint import Checkpoint
+from .scan import Scanner
+from . import logger, RESULTS
+
+"""Combines the results of a scan split in shards (see src.scan --shard) into the usual result files and reports."""
+
+
+def find_shards(dest_basename: str, results_dir: str = RESULTS, partial: bool = False) -> List[Path]:
+    """Finds the results saved by the shards of a scan as <results_dir>/<dest>-shard-<i>-of-<N>.jsonl.
+
+    Args:
+        dest_basename (str): the basename given to the scan of each shard.
+        results_dir (str): the directory where the shards saved their results.
+        partial (bool): whether to accept that some shards are missing.
+
+    Returns:
+        (List[Path]): the paths to the results of the shards, in the order of the shards.
+    """
+    pattern = re.compile(rf"^{re.escape(dest_basename)}-shard-(\d+)-of-(\d+)\.jsonl$")
+    shards = {}
+    for path in Path(results_dir).iterdir():
+        m = pattern.match(path.name)
+        if m:
+            shards[(int(m.group(2)), int(m.group(1)))] = path
+    counts = {count for count, _ in shards}
+    if len(counts) != 1:
+        raise ValueError(f"expected the results of the shards of a single scan in {results_dir}, found {len(counts)} partitions: {sorted(counts)}")
+    count = counts.pop()
+    missing = [i for i in range(1, count + 1) if (count, i) not in shards]
+    if missing:
+        message = f"missing results of shards {missing} out of {count}"
+        if not partial:
+            raise ValueError(message)
+        logger.warning(message)
+    return [shards[key] for key in sorted(shards)]
+
+
+def merge_shards(paths: List[Path]) -> Tuple[List[Result], List[Result], Dict]:
+    """Loads and combines the results of the shards, in the order of the submissions in the report.
+
+    Args:
+        paths (List[Path]): the paths to the results of the shards.
+
+    Returns:
+        (List[Result]): the results for articles that were found.
+        (List[Result]): the results for articles that were NOT found.
+        (Dict): the settings of the scan of the shards (see Scanner.save_shard()), None if they were not saved.
+    """
+    outcomes = []
+    settings = None
+    for path in paths:
+        settings_path = path.with_suffix('.json')
+        shard_settings = {}
+        if settings_path.exists():
+            with settings_path.open() as f:
+                shard_settings = json.load(f)
+            positions = shard_settings.pop('positions')
+            if settings is not None and shard_settings != settings:
+                raise ValueError(f"the shards were scanned with different settings: {settings} and {shard_settings} in {settings_path}")
+            settings = shard_settings
+        else:
+            logger.warning(f"settings of the shard {path} not found.")
+            positions = {}
+        for manuscript_nm, (result, success) in Checkpoint.read(path).items():
+            position = positions.get(manuscript_nm)
+            outcomes.append((position if position is not None else float('inf'), result, success))
+    outcomes.sort(key=lambda outcome: outcome[0])
+    found = [result for _, result, success in outcomes if success]
+    not_found = [result for _, result, success in outcomes if not success]
+    logger.info(f"merged {len(paths)} shards: found {len(found)} / {len(found) + len(not_found)} results.")
+    return found, not_found, settings
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Merges the results of the shards of a MatchPub scan.")
+    parser.add_argument("dest", nargs="?", default="results", help="Basename of the result files given to the scan of each shard.")
+    parser.add_argument("-D", "--debug", action="store_true", help="Debug mode.")
+    parser.add_argument("--partial", action="store_true", help="Flag to merge the shards available even if some are missing.")
+    parser.add_argument("--no_citations", action="store_true", help="Flag to report without citation data, for shards whose settings were not saved.")
+    args = parser.parse_args()
+    logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
+    paths = find_shards(args.dest, partial=args.partial)
+    found, not_found, settings = merge_shards(paths)
+    if settings is not None:
+        preprint_inclusion = PreprintInclusion(settings['preprint_inclusion'])
+        include_citations = settings['include_citations']
+    else:
+        preprint_inclusion = config.preprint_inclusion
+        include_citations = config.include_citations and not args.no_citations
+    logger.info(f"merging with settings: include_citations: {include_citations}, preprint_inclusion: {preprint_inclusion}.")
+    # searches, citations and preprint status were completed by the shards; only filtering, export and reporting remain
+    scanner = Scanner(None, args.dest, EuropePMCEngine, ScopusService, preprint_inclusion, include_citations)
+    scanner.finalize(found, not_found)
@@ -1,14 +1,14 @@
 from dataclasses import dataclass, field, InitVar
 import dataclasses
 from collections import OrderedDict, UserDict, UserList
-from typing import List, Tuple, Union
+from typing import List, Tuple, Union, FrozenSet, Dict
 import re
 
 from lxml.etree import Element
 import pandas as pd
 
 from .decision import normalize_decision
-from .utils import process_authors, last_name, normalize, normalize_date
+from .utils import process_authors, author_ids, last_name, normalize, normalize_date
 
 
 @dataclass
@@ -20,11 +20,13 @@ class Paper:
         abstract (str): abstract.
         author_list (List[str]): the list of authors' *last names*
         expanded_author_list (List[List[str]]): the list of authors last name, each names being expanded to alternatives when necessary (eg composed names)
+        author_ids (FrozenSet[int]): the ids of all the names in expanded_author_list in the global author vocabulary (see utils.author_ids)
     """
     title: str = field(default='')
     abstract: str = field(default='')
     author_list: List[str] = field(default_factory=list)
     expanded_author_list: List[List[str]] = field(default_factory=list)
+    author_ids: FrozenSet[int] = field(default_factory=frozenset, repr=False)
 
 
 # TODO: some class to centralize key_index in description, rows extracted from Excel and attributes of Paper
@@ -35,7 +37,7 @@ class Submission(Paper):
     Includes editorial information in addition to fields inherited from Paper.
 
     Args:
-        row (pd.Series): the pandas row parsed from the eJP report row.
+        row (pd.Series): the pandas row parsed from the eJP report row. If None, the fields are taken as provided, already normalized.
 
     Fields:
         title (str): the title.
@@ -62,6 +64,8 @@ class Submission(Paper):
     row: InitVar[pd.Series] = None
 
     def __post_init__(self, row: pd.Series):
+        if row is None:
+            return  # fields already normalized, see EJPReport._normalize()
         self.manuscript_nm: str = row['manuscript_nm']
         self.editor: str = row.get('editor', 'editor name not available')
         self.journal_decision: str = row['journal_decision']
@@ -74,6 +78,7 @@ class Submission(Paper):
         self.abstract: str = normalize(row.get('abstract', 'abstract not available'))  # rare illegal character can block pd.ExcelWriter
         self.author_list: List[str] = self.split_author_list(row['authors'])
         self.expanded_author_list: List[List[str]] = process_authors(self.author_list)
+        self.author_ids = author_ids(self.expanded_author_list)
 
     @staticmethod
     def split_author_list(content: str) -> List[str]:
@@ -108,6 +113,8 @@ class Submission(Paper):
 class EuropePMCArticle(Paper):
     """A published article retrieved from EuropePMC. Might become a specialize class later if we re-introduce PubMed as search engine.
     It assumes that EuropePMC results are returned in XML format using ResultType=Core
+    Records returned with ResultType=Lite are also accepted: authors are then taken from the author string,
+    and the abstract and the full journal title are left empty.
     In addition to the fields inherited from Paper, it contains publishing information such as doi, journal names etc...
 
     Args:
@@ -129,6 +136,9 @@ class EuropePMCArticle(Paper):
         author_overlap_score (float): the degree of overalp of authors with the matching submission.
         title_similarty_score (float): the similarity of the title with the title of the matching submission.
         preprint_published_doi (str): for preprint only; the doi of the journal paper if already published.
+        source (str): the EuropePMC source of the record, for ex MED or PPR.
+        epmc_id (str): the id of the record in its EuropePMC source.
+        result_type (str): 'core' or 'lite', the EuropePMC result type the record was retrieved with.
     """
     doi: str = field(default='')
     pmid: str = field(default='')
@@ -142,12 +152,21 @@ class EuropePMCArticle(Paper):
     strategy: str = field(default='')
     author_overlap_score: float = field(default=None)
     title_similarity_score: float = field(default=None)
+    source: str = field(default='')
+    epmc_id: str = field(default='')
+    result_type: str = field(default='core')
 
     xml: InitVar[Element] = None
 
     def __post_init__(self, xml: Element):
+        if xml is None:
+            return  # fields provided directly, see Result.from_dict()
+        self.source = xml.findtext('./source', '')
+        self.epmc_id = xml.findtext('./id', '')
         self.pmid = xml.findtext('./pmid', '')
         self.pub_type = [t.text.lower() for t in xml.findall('.//pubTypeList/pubType', [])]
+        if not self.pub_type and xml.findtext('./pubType'):  # lite records
+            self.pub_type = [t.strip().lower() for t in xml.findtext('./pubType').split(';')]
         # might be better to use  <source>PPR</source
         # if 'preprint' in self.pub_type:
         if xml.findtext('./source') == "PPR":
@@ -156,15 +175,39 @@ class EuropePMCArticle(Paper):
             self.is_preprint = True
         else:
             self.journal_name = xml.findtext('./journalInfo/journal/title', '')
-            self.journal_abbr = xml.findtext('./journalInfo/journal/medlineAbbreviation', '')
+            self.journal_abbr = xml.findtext('./journalInfo/journal/medlineAbbreviation', '') or xml.findtext('./journalTitle', '')
             self.is_preprint = False
         self.pub_date = normalize_date(xml.findtext('./firstPublicationDate'))  # normalize date format to ISO date only
         self.doi = xml.findtext('./doi', '')
         self.abstract = xml.findtext('./abstractText', '')
 
         self.title = xml.findtext('./title', '')
-        self.author_list = [au.text for au in xml.findall('./authorList/author/lastName')]
+        if xml.find('./authorList') is not None:
+            self.author_list = [au.text for au in xml.findall('./authorList/author/lastName')]
+        else:
+            self.author_list = self.split_author_string(xml.findtext('./authorString', ''))
         self.expanded_author_list = process_authors(self.author_list)
+        self.author_ids = author_ids(self.expanded_author_list)
+
+    @staticmethod
+    def split_author_string(content: str) -> List[str]:
+        """Extracts the last names from the author string of lite records, for ex 'van der Berg AB, Smith J.'.
+        The initials ending each name are removed; collective names are kept whole.
+
+        Args:
+            content (str): the author string.
+
+        Returns:
+            (List[str]): the last names.
+        """
+        last_names = []
+        for name in content.rstrip('.').split(','):
+            parts = name.split()
+            if len(parts) > 1 and parts[-1].isupper() and parts[-1].isalpha():
+                parts = parts[:-1]
+            if parts:
+                last_names.append(' '.join(parts))
+        return last_names
 
     def __str__(self):
         authors = ", ".join(self.author_list)
@@ -214,6 +257,8 @@ class PubMedArticle(Paper):
     xml: InitVar[Element] = None
 
     def __post_init__(self, xml: Element):
+        if xml is None:
+            return  # fields provided directly, see Result.from_dict()
         medline_citation = xml.find('MedlineCitation')
         article = medline_citation.find('Article')
         self.pmid = medline_citation.findtext('PMID', '')
@@ -224,17 +269,16 @@ class PubMedArticle(Paper):
         date = medline_citation.xpath('ArticleDate | DateRevised')
         if date:
             date = date[0]
-        else:
-            import pdb; pdb.set_trace()
-        year = date.findtext('Year', '')
-        month = date.findtext('Month', '')
-        day = date.findtext('Day', '')
-        self.pub_date = '-'.join([year, month, day])   # iso format
+            year = date.findtext('Year', '')
+            month = date.findtext('Month', '')
+            day = date.findtext('Day', '')
+            self.pub_date = '-'.join([year, month, day])   # iso format
         self.doi = article.findtext('ELocationID[@EIdType="doi"]', '')
         self.abstract = article.findtext('Abstract', '')
         self.title = article.findtext('ArticleTitle', '')
         self.author_list = [au.text for au in article.findall('AuthorList/Author/LastName')]
         self.expanded_author_list = process_authors(self.author_list)
+        self.author_ids = author_ids(self.expanded_author_list)
 
     def __str__(self):
         authors = ", ".join(self.author_list)
@@ -253,6 +297,44 @@ class Result:
     submission: Submission = field(default=None)
     article: Union[PubMedArticle, EuropePMCArticle] = field(default=None)
 
+    def to_dict(self) -> Dict:
+        """Serializes the result into a json-compatible dictionary.
+        The author ids are left out since they are only valid within the current process.
+
+        Returns:
+            (Dict): the fields of the submission and of the article, with the type of the article.
+        """
+        def fields(paper: Paper) -> Dict:
+            d = dataclasses.asdict(paper)
+            d.pop('author_ids')
+            return d
+
+        return {
+            'submission': fields(self.submission) if self.submission is not None else None,
+            'article': fields(self.article) if self.article is not None else None,
+            'article_type': type(self.article).__name__ if self.article is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> 'Result':
+        """Rebuilds a result serialized with to_dict().
+
+        Args:
+            d (Dict): the serialized result.
+
+        Returns:
+            (Result): the result, with author ids interned in the current process.
+        """
+        submission = Submission(**d['submission']) if d['submission'] is not None else None
+        article = None
+        if d['article'] is not None:
+            Article = {'EuropePMCArticle': EuropePMCArticle, 'PubMedArticle': PubMedArticle}[d['article_type']]
+            article = Article(**d['article'])
+        for paper in [submission, article]:
+            if paper is not None:
+                paper.author_ids = author_ids(paper.expanded_author_list)
+        return cls(submission, article)
+
 
 class ResultDict(UserDict):
     """Maps the fields of matching Article and Submission to the ordered sequence of headers or columns
@@ -1,15 +1,104 @@
 
-from typing import Dict, List
-from time import sleep
+from io import BytesIO
+from copy import copy
+from typing import Dict, List, Iterator, Tuple, Union, BinaryIO, Callable
+from threading import BoundedSemaphore, Lock
 import pandas as pd
 
 import requests
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
-from lxml.etree import fromstring, ParseError
+from lxml.etree import fromstring, iterparse, ParseError, Element
 
 from .models import PubMedArticle, EuropePMCArticle
-from . import logger, SCOPUS_API_KEY
+from .cache import ResponseCache
+from .ratelimit import TokenBucket
+from .config import config
+from . import logger, SCOPUS_API_KEY, NCBI_API_KEY
+
+
+class PooledAdapter(HTTPAdapter):
+    """A transport adapter keeping alive up to pool_maxsize connections per host and applying
+    a default (connect, read) timeout to the requests sent without an explicit one.
+
+    Args:
+        timeout (Tuple[float, float]): the default connect and read timeouts in seconds.
+        **kwargs: passed to HTTPAdapter, e.g. pool_maxsize and max_retries.
+    """
+
+    def __init__(self, timeout: Tuple[float, float] = None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request: requests.PreparedRequest, timeout=None, **kwargs) -> requests.Response:
+        return super().send(request, timeout=timeout if timeout is not None else self.timeout, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """The number of connections opened, of requests sent and of idle connections, for each host."""
+        stats = {}
+        for key in list(self.poolmanager.pools.keys()):
+            pool = self.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            host = stats.setdefault(f"{pool.scheme}://{pool.host}", {'connections': 0, 'requests': 0, 'idle': 0})
+            host['connections'] += pool.num_connections
+            host['requests'] += pool.num_requests
+            host['idle'] += sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0
+        return stats
+
+
+class ConnectionPools:
+    """The connection pools shared by all the sessions created with requests_retry_session().
+    Sessions with the same retry policy share the same adapter, so that all the services talking to a host
+    reuse the same keep-alive connections instead of opening their own.
+
+    Args:
+        pool_maxsize (int): the number of connections kept alive per host.
+        connect_timeout (float): the default timeout in seconds to establish a connection.
+        read_timeout (float): the default timeout in seconds between two bytes received.
+    """
+
+    def __init__(self, pool_maxsize: int = config.pool_maxsize, connect_timeout: float = config.connect_timeout, read_timeout: float = config.read_timeout):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = (connect_timeout, read_timeout)
+        self._adapters: Dict[Tuple, PooledAdapter] = {}
+        self._lock = Lock()
+
+    def adapter(self, retry: Retry) -> PooledAdapter:
+        """The shared adapter for a retry policy.
+
+        Args:
+            retry (Retry): the retry policy.
+
+        Returns:
+            (PooledAdapter): the adapter, created on first use.
+        """
+        key = (retry.total, retry.backoff_factor, tuple(retry.status_forcelist or ()))
+        with self._lock:
+            if key not in self._adapters:
+                self._adapters[key] = PooledAdapter(timeout=self.timeout, pool_maxsize=self.pool_maxsize, max_retries=retry)
+            return self._adapters[key]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """The number of connections opened, of requests sent and of idle connections, for each host."""
+        stats = {}
+        with self._lock:
+            adapters = list(self._adapters.values())
+        for adapter in adapters:
+            for host, counts in adapter.stats().items():
+                total = stats.setdefault(host, {'connections': 0, 'requests': 0, 'idle': 0})
+                for k, v in counts.items():
+                    total[k] += v
+        return stats
+
+    def __str__(self):
+        return "; ".join(
+            f"{host}: {s['requests']} requests over {s['connections']} connections ({s['idle']} idle)"
+            for host, s in self.stats().items()
+        ) or "no connection"
+
+
+connection_pools = ConnectionPools()
 
 
 def requests_retry_session(
@@ -17,9 +106,12 @@ def requests_retry_session(
     backoff_factor=0.3,
     status_forcelist=(500, 502, 504),
     session=None,
+    pools=None,
 ):
     """Creates a resilient session that will retry several times when a query fails.
     from  https://www.peterbe.com/plog/best-practice-with-retries-with-requests
+    The session sends its requests over the keep-alive connections shared by all sessions (pools, connection_pools by default),
+    accepts compressed responses and applies the default timeouts config.connect_timeout and config.read_timeout.
 
     Usage:
         session_retry = self.requests_retry_session()
@@ -37,20 +129,133 @@ def requests_retry_session(
         backoff_factor=backoff_factor,
         status_forcelist=status_forcelist,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = (pools or connection_pools).adapter(retry)
     session.mount('http://', adapter)
     session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
     return session
 
 
+class LazyService:
+    """A class attribute holding a service that is created on first use and then shared by all the instances of the class,
+    so that no session is opened when the module is imported. Assigning the attribute on an instance overrides it.
+
+    Args:
+        factory (Callable): the service class.
+    """
+
+    def __init__(self, factory: Callable):
+        self.factory = factory
+        self.service = None
+        self._lock = Lock()
+
+    def __get__(self, instance, owner):
+        if self.service is None:
+            with self._lock:
+                if self.service is None:
+                    self.service = self.factory()
+        return self.service
+
+
+def iter_records(content: Union[bytes, BinaryIO], tag: Union[str, Tuple[str, ...]], parent: str, metadata: Dict[str, str] = None) -> Iterator[Element]:
+    """Parses an XML response incrementally and yields the record elements one by one.
+    Each record is freed, with the records before it, as soon as the consumer moves on to the next one,
+    so that only one record is held in memory instead of the whole tree.
+
+    Args:
+        content (Union[bytes, BinaryIO]): the XML content of the response, or a file opened in binary mode.
+        tag (Union[str, Tuple[str, ...]]): the tag of the record elements, or the tags of several kinds of records.
+        parent (str): the tag of the parent of the records, to skip elements with the same tag nested in a record.
+        metadata (Dict[str, str]): the tags of elements outside of the records whose text is to be captured, for ex hitCount;
+            updated in place with the text of these elements as they are parsed.
+
+    Returns:
+        (Iterator[Element]): the record elements, only valid until the next one is requested.
+    """
+    record_tags = (tag,) if isinstance(tag, str) else tuple(tag)
+    tags = record_tags + tuple(metadata or ())
+    source = BytesIO(content) if isinstance(content, bytes) else content
+    for _, element in iterparse(source, events=('end',), tag=tags):
+        if element.tag not in record_tags:
+            metadata[element.tag] = element.text
+            continue
+        if element.getparent() is None or element.getparent().tag != parent:
+            continue
+        yield element
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
 class Service:
+    """Base class for the web services. All the requests go through _request() which caps
+    the number of requests simultaneously in flight, whatever the number of threads using the service,
+    and paces them with the token bucket rate_limiter shared by all instances of the service.
+    Requests rejected with status 429 are sent again once the rate limiter allows it.
+    When a response cache is set on the class (see ResponseCache), successful responses are served from it
+    as long as they are younger than CACHE_TTL.
+
+    Attributes:
+        REST_URL (str): the endpoint of the service.
+        HEADERS (Dict[str, str]): headers sent with every request.
+        MAX_CONCURRENT (int): the maximum number of requests in flight at any time for this service.
+        MAX_THROTTLED_ATTEMPTS (int): the number of times a request rejected with status 429 is sent.
+        rate_limiter (TokenBucket): the limiter of the rate of requests for this service, None for no limit.
+        CACHE_TTL (float): time-to-live of cached responses in seconds.
+        cache (ResponseCache): the response cache shared by all services, None to disable caching.
+    """
 
     REST_URL: str = ''
     HEADERS: Dict[str, str] = {}
+    MAX_CONCURRENT: int = 4
+    MAX_THROTTLED_ATTEMPTS: int = 3
+    CACHE_TTL: float = 30 * 24 * 3600
+    cache: ResponseCache = None
+    rate_limiter: TokenBucket = None
 
     def __init__(self):
         self.retry_request = requests_retry_session()
         self.retry_request.headers.update(self.HEADERS)
+        self._slots = BoundedSemaphore(self.MAX_CONCURRENT)
+
+    def _request(self, method: str, url: str, use_cache: bool = True, **kwargs) -> requests.Response:
+        key = self._cache_key(method, url, use_cache, kwargs)
+        if key is not None:
+            response = self.cache.get(key, self.CACHE_TTL)
+            if response is not None:
+                return response
+        for attempt in range(self.MAX_THROTTLED_ATTEMPTS):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            with self._slots:
+                response = self.retry_request.request(method, url, **kwargs)
+            if not self._throttled(response, attempt):
+                break
+        if key is not None:
+            self._cache_response(key, response)
+        return response
+
+    # the steps of _request() shared with the asyncio variants of the services, see aionet.AsyncService
+
+    def _cache_key(self, method: str, url: str, use_cache: bool, kwargs: Dict) -> str:
+        """The key of the request in the response cache, None if the response is not to be cached."""
+        if not use_cache or self.cache is None:
+            return None
+        return ResponseCache.key(method, url, kwargs.get('params', kwargs.get('data')))
+
+    def _throttled(self, response: requests.Response, attempt: int) -> bool:
+        """Updates the rate limiter with the response and tells whether the request was throttled and is to be sent again."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(response.status_code, response.headers)
+        if response.status_code != 429:
+            return False
+        logger.warning(f"{self.__class__.__name__} request throttled (attempt {attempt + 1}/{self.MAX_THROTTLED_ATTEMPTS}).")
+        return True
+
+    def _cache_response(self, key: str, response: requests.Response):
+        """Caches the response if successful."""
+        if response.status_code == 200:
+            self.cache.set(key, self.__class__.__name__, response)
 
 
 class EuropePMCService(Service):
@@ -60,27 +265,118 @@ class EuropePMCService(Service):
         "From": "thomas.lemberger@embo.org",
         "Content-type": "application/x-www-form-urlencoded"
     }
+    MAX_CONCURRENT = 8
+    rate_limiter = TokenBucket(10)
+
+    def search(self, query: str, limit: int = 5, result_type: str = 'core') -> List[EuropePMCArticle]:
+        """Searches EuropePMC.
+
+        Args:
+            query (str): the query in the EuropePMC syntax.
+            limit (int): the maximum number of results.
+            result_type (str): 'core' for the full records, 'lite' for the smaller records sufficient to match titles and authors,
+                without abstract nor full journal title.
+
+        Returns:
+            (List[EuropePMCArticle]): the articles found.
+        """
+        article_list, _, _ = self._search_page(query, limit, result_type)
+        return article_list
 
-    def search(self, query: str, limit: int = 5) -> List[EuropePMCArticle]:
+    def search_pages(self, query: str, page_size: int = 1000, max_pages: int = 1, result_type: str = 'core') -> Tuple[List[EuropePMCArticle], bool]:
+        """Searches EuropePMC and retrieves several pages of results with cursorMark paging.
+
+        Args:
+            query (str): the query in the EuropePMC syntax.
+            page_size (int): the number of results per page, at most 1000.
+            max_pages (int): the maximum number of pages retrieved.
+            result_type (str): 'core' or 'lite', see search().
+
+        Returns:
+            (List[EuropePMCArticle]): the articles found, in the order of relevance.
+            (bool): whether all the results of the query were retrieved.
+        """
         article_list = []
+        complete = False
+        for page, last in self.iter_pages(query, [page_size] * max_pages, result_type):
+            article_list += page
+            complete = last
+        return article_list, complete
+
+    def iter_pages(self, query: str, page_sizes: List[int], result_type: str = 'core') -> Iterator[Tuple[List[EuropePMCArticle], bool]]:
+        """Retrieves the pages of results of a query one by one with cursorMark paging, so that the caller can stop at any page.
+
+        Args:
+            query (str): the query in the EuropePMC syntax.
+            page_sizes (List[int]): the size of each page to retrieve, at most 1000; the number of pages is at most the length of the list.
+            result_type (str): 'core' or 'lite', see search().
+
+        Returns:
+            (Iterator[Tuple[List[EuropePMCArticle], bool]]): the articles of each page and whether it is the last page of results.
+        """
+        cursor_mark = '*'
+        retrieved = 0
+        for page_size in page_sizes:
+            page, hit_count, next_cursor_mark = self._search_page(query, page_size, result_type, cursor_mark)
+            if hit_count is None:
+                return  # failed request
+            retrieved += len(page)
+            last = self._last_page(page, retrieved, hit_count, cursor_mark, next_cursor_mark)
+            yield page, last
+            if last:
+                return
+            cursor_mark = next_cursor_mark
+
+    def _search_page(self, query: str, page_size: int, result_type: str, cursor_mark: str = None) -> Tuple[List[EuropePMCArticle], int, str]:
+        params = self._page_params(query, page_size, result_type, cursor_mark)
+        response = self._request('POST', self.REST_URL, data=params, headers=self.HEADERS, timeout=30)  # EuropePMC accepts only POST
+        return self._parse_page(response, params)
+
+    @staticmethod
+    def _page_params(query: str, page_size: int, result_type: str, cursor_mark: str = None) -> Dict:
         params = {
             'query': query,
-            'resultType': 'core',
+            'resultType': result_type,
             'format': 'xml',
-            'pageSize': limit,
+            'pageSize': page_size,
         }
-        response = self.retry_request.post(self.REST_URL, data=params, headers=self.HEADERS, timeout=30)  # EuropePMC accepts only POST
+        if cursor_mark is not None:
+            params['cursorMark'] = cursor_mark
+        return params
+
+    @staticmethod
+    def _parse_page(response: requests.Response, params: Dict) -> Tuple[List[EuropePMCArticle], int, str]:
+        """Parses a page of results; the hit count is None when the request failed."""
+        article_list = []
+        metadata = {'hitCount': None, 'nextCursorMark': None}
         if response.status_code == 200:
             try:
-                xml = fromstring(response.content)
-                articles_xml = xml.xpath('.//result')
-                article_list = [EuropePMCArticle(xml=x) for x in articles_xml]
+                article_list = [EuropePMCArticle(xml=x, result_type=params['resultType']) for x in iter_records(response.content, 'result', 'resultList', metadata)]
                 logger.debug(f"{len(article_list)} results found.")
             except ParseError:
                 logger.error(f"XML parse error with: {params}")
+                metadata['hitCount'] = None
         else:
             logger.error(f"failed query ({response.status_code}) with: {params}")
-        return article_list
+        hit_count = int(metadata['hitCount']) if metadata['hitCount'] is not None else None
+        return article_list, hit_count, metadata['nextCursorMark']
+
+    @staticmethod
+    def _last_page(page: List[EuropePMCArticle], retrieved: int, hit_count: int, cursor_mark: str, next_cursor_mark: str) -> bool:
+        return not page or retrieved >= hit_count or next_cursor_mark in (None, cursor_mark)
+
+    def fetch(self, source: str, epmc_id: str) -> EuropePMCArticle:
+        """Retrieves the core record of an article.
+
+        Args:
+            source (str): the EuropePMC source of the article, for ex MED or PPR.
+            epmc_id (str): the id of the article in its source.
+
+        Returns:
+            (EuropePMCArticle): the article, None if not found.
+        """
+        articles = self.search(f'EXT_ID:"{epmc_id}" AND SRC:"{source}"', limit=1, result_type='core')
+        return articles[0] if articles else None
 
 
 class PubMedService(Service):
@@ -92,88 +388,260 @@ class PubMedService(Service):
         "From": "thomas.lemberger@embo.org",
         "Content-type": "application/x-www-form-urlencoded"
     }
+    API_KEY = NCBI_API_KEY
+    rate_limiter = TokenBucket(10 if NCBI_API_KEY else 3)  # NCBI allows 3 requests / sec, 10 with an API key
 
     def search(self, query: str, limit: int = 5) -> List[PubMedArticle]:
-        article_list = []
-        params_esearch = {
+        """Searches PubMed with an esearch request and fetches the articles found with efetch (see esearch() and efetch()).
+
+        Args:
+            query (str): the query in the PubMed syntax.
+            limit (int): the maximum number of results.
+
+        Returns:
+            (List[PubMedArticle]): the articles found, in the order of relevance.
+        """
+        pmids, _ = self.esearch(query, limit)
+        articles = self.efetch(pmids)
+        return [articles[pmid] for pmid in pmids if pmid in articles]
+
+    def search_many(self, queries: List[str], limit: int = 5, fetch_size: int = config.pubmed_fetch_size) -> List[List[PubMedArticle]]:
+        """Searches several queries with one esearch request each and fetches the union of the articles found
+        with as few efetch requests as possible, fetch_size articles at a time.
+
+        Args:
+            queries (List[str]): the queries in the PubMed syntax.
+            limit (int): the maximum number of results per query.
+            fetch_size (int): the maximum number of articles per efetch request.
+
+        Returns:
+            (List[List[PubMedArticle]]): the articles found for each query, in the order of relevance;
+                an article found by several queries is copied for each of them.
+        """
+        pmid_lists = [self.esearch(query, limit)[0] for query in queries]
+        articles = self.efetch([pmid for pmids in pmid_lists for pmid in pmids], fetch_size)
+        return [[copy(articles[pmid]) for pmid in pmids if pmid in articles] for pmids in pmid_lists]
+
+    def esearch(self, query: str, limit: int) -> Tuple[List[str], int]:
+        """Searches PubMed for the PMIDs of the articles matching a query.
+        The query is POSTed since batched queries can be longer than urls allow.
+
+        Args:
+            query (str): the query in the PubMed syntax.
+            limit (int): the maximum number of PMIDs, at most 10000.
+
+        Returns:
+            (List[str]): the PMIDs, in the order of relevance.
+            (int): the total number of articles matching the query, None if the request failed.
+        """
+        params = self._esearch_params(query, limit)
+        response = self._request('POST', self.REST_URL_ESEARCH, data=params, headers=self.HEADERS)
+        return self._parse_esearch(response, params)
+
+    def efetch(self, pmids: List[str], fetch_size: int = config.pubmed_fetch_size) -> Dict[str, PubMedArticle]:
+        """Fetches the records of articles, POSTing the PMIDs fetch_size at a time.
+        The PMIDs are deduplicated and sorted so that the requests are reproducible and cached across scans.
+
+        Args:
+            pmids (List[str]): the PMIDs of the articles.
+            fetch_size (int): the maximum number of articles per request.
+
+        Returns:
+            (Dict[str, PubMedArticle]): the articles found, by PMID.
+        """
+        pmids = sorted(set(pmids))
+        articles = {}
+        for i in range(0, len(pmids), fetch_size):
+            params = self._efetch_params(pmids[i:i + fetch_size])
+            response = self._request('POST', self.REST_URL_EFETCH, data=params, headers=self.HEADERS)
+            articles.update({a.pmid: a for a in self._parse_efetch(response, params)})
+        return articles
+
+    def _esearch_params(self, query: str, limit: int) -> Dict:
+        params = {
             'term': query,
             'db': 'pubmed',
-            'usehistory': 'y',
+            'retmax': limit,
         }
-        response_esearch = self.retry_request.get(self.REST_URL_ESEARCH, params=params_esearch, headers=self.HEADERS)
-        if response_esearch.status_code == 200:
+        if self.API_KEY:
+            params['api_key'] = self.API_KEY
+        return params
+
+    def _efetch_params(self, pmids: List[str]) -> Dict:
+        params = {
+            'db': 'pubmed',
+            'id': ','.join(pmids),
+            'retmode': 'xml',
+        }
+        if self.API_KEY:
+            params['api_key'] = self.API_KEY
+        return params
+
+    @staticmethod
+    def _parse_esearch(response: requests.Response, params: Dict) -> Tuple[List[str], int]:
+        """Parses the PMIDs found by esearch and the total number of hits, None if the request failed."""
+        if response.status_code != 200:
+            logger.error(f"failed esearch query ({response.status_code}, {response.text}) with: {params}")
+            return [], None
+        try:
+            xml = fromstring(response.content)
+        except ParseError:
+            logger.error(f"XML parse error in esearch with: {params}")
+            return [], None
+        pmids = [pmid.text for pmid in xml.findall('IdList/Id')]
+        return pmids, int(xml.findtext('Count', len(pmids)))
+
+    @staticmethod
+    def _parse_efetch(response: requests.Response, params: Dict) -> List[PubMedArticle]:
+        article_list = []
+        if response.status_code == 200:
             try:
-                xml = fromstring(response_esearch.content)
+                article_list = [PubMedArticle(xml=x) for x in iter_records(response.content, 'PubmedArticle', 'PubmedArticleSet')]
+                logger.debug(f"{len(article_list)} results found.")
             except ParseError:
-                logger.error(f"XML parse error in esearch with: {params_esearch}")
-            query_key = xml.findtext('QueryKey')
-            web_env = xml.findtext('WebEnv')
-            params_efetch = {
-                'db': 'pubmed',
-                'query_key': query_key,
-                'WebEnv': web_env,
-                'retmode': 'xml',
-                'retmax': limit
-            }
-            response_efetch = self.retry_request.get(self.REST_URL_EFETCH, params=params_efetch, headers=self.HEADERS)
-            if response_efetch.status_code == 200:
-                try:
-                    xml = fromstring(response_efetch.content)
-                    articles_xml = xml.xpath('PubmedArticle')
-                    article_list = [PubMedArticle(xml=x) for x in articles_xml]
-                    logger.debug(f"{len(article_list)} results found.")
-                except ParseError:
-                    logger.error(f"XML parse error in efetch with: {params_efetch}")
-            else:
-                logger.error(f"failed efetch query ({response_efetch.status_code}, {response_efetch.text}) with: {params_efetch}")
+                logger.error(f"XML parse error in efetch with: {params}")
         else:
-            logger.error(f"failed esearch query ({response_esearch.status_code}, {response_esearch.text}) with: {params_esearch}")
+            logger.error(f"failed efetch query ({response.status_code}, {response.text}) with: {params}")
         return article_list
 
 
 class BioRxivService(Service):
 
     REST_URL = "https://api.biorxiv.org/details"
+    PUBS_URL = "https://api.biorxiv.org/pubs"
     HEADERS = {
         "From": "thomas.lemberger@embo.org",
         "Accept": "application/json",
     }
+    CACHE_TTL = 7 * 24 * 3600  # publication status of preprints changes over time
+    rate_limiter = TokenBucket(5)
 
     def preprint_publication_status(self, doi: str) -> str:
         for server in ['biorxiv', 'medrxiv']:
             url = f"{self.REST_URL}/{server}/{doi}"
-            response = self.retry_request.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('messages', [{}])[0].get('status', '') == 'ok':
-                    journal_doi = data.get('collection', [{}])[0].get('published', '')
-                    if journal_doi != "NA":  # need to return None when no doi so that DataFrame cell is null
-                        return journal_doi
-            else:
-                logger.debug(f"problem with biorxiv api ({response.status_code}) with doi {doi}")
+            response = self._request('GET', url)
+            journal_doi = self._parse_publication_status(response, doi)
+            if journal_doi is not None:
+                return journal_doi
+        return None
+
+    @staticmethod
+    def _parse_publication_status(response: requests.Response, doi: str) -> str:
+        if response.status_code == 200:
+            data = response.json()
+            if data.get('messages', [{}])[0].get('status', '') == 'ok':
+                journal_doi = data.get('collection', [{}])[0].get('published', '')
+                if journal_doi != "NA":  # need to return None when no doi so that DataFrame cell is null
+                    return journal_doi
+        else:
+            logger.debug(f"problem with biorxiv api ({response.status_code}) with doi {doi}")
         return None
 
+    def published_preprints(self, server: str, start: str, end: str) -> Iterator[Tuple[str, str]]:
+        """Lists the preprints of a server published in a journal, for the interval between two dates,
+        with the pubs/ endpoint paged 100 records at a time.
+        The pages are not cached since they are meant to be kept in a PreprintIndex.
+
+        Args:
+            server (str): 'biorxiv' or 'medrxiv'.
+            start (str): the first day of the interval, YYYY-MM-DD.
+            end (str): the last day of the interval, YYYY-MM-DD.
+
+        Returns:
+            (Iterator[Tuple[str, str]]): the doi of each preprint and the doi of the journal article.
+        """
+        cursor = 0
+        while True:
+            url = f"{self.PUBS_URL}/{server}/{start}/{end}/{cursor}"
+            response = self._request('GET', url, use_cache=False, timeout=60)
+            published, count, last = self._parse_published_page(response, url, cursor)
+            yield from published
+            cursor += count
+            if last:
+                return
+
+    @staticmethod
+    def _parse_published_page(response: requests.Response, url: str, cursor: int) -> Tuple[List[Tuple[str, str]], int, bool]:
+        """Parses a page of the pubs/ endpoint into the pairs of dois, the number of records and whether it is the last page."""
+        if response.status_code != 200:
+            raise requests.HTTPError(f"problem with biorxiv api ({response.status_code}) with {url}", response=response)
+        data = response.json()
+        message = data.get('messages', [{}])[0]
+        collection = data.get('collection', [])
+        published = [
+            (record['preprint_doi'], record['published_doi'])
+            for record in collection
+            if record.get('preprint_doi') and record.get('published_doi')
+        ]
+        last = message.get('status', '') != 'ok' or not collection or cursor + len(collection) >= int(message.get('total', 0))
+        return published, len(collection), last
+
 
 class ScopusService(Service):
 
     REST_URL = 'https://api.elsevier.com/content/search/scopus'
     API_KEY = SCOPUS_API_KEY
+    CACHE_TTL = 7 * 24 * 3600  # citations accumulate over time
+    rate_limiter = TokenBucket(9)  # Scopus Search API allows 9 requests / sec
 
-    def citedby_count(self, pmid):
-        sleep(0.33)  # 3 requests / sec max
+    def citedby_count(self, pmid) -> int:
         citation_count = None
         if pmid:
-            params = {"apiKey": self.API_KEY, "query": f"PMID({str(pmid)})", "field": "citedby-count"}
-            response = self.retry_request.post(self.REST_URL, data=params)
-            if response.status_code == 200:
-                remaining_queries = response.headers.get('X-RateLimit-Remaining')
-                if int(remaining_queries) < 10_000:
-                    logger.warning(f"more than half of queries consumed. Only {remaining_queries} left!")
-                    # raise RuntimeError(f"quota half consumed. Remaining: {remaining_queries}.")
-                data = response.json()
-                matches = int(data['search-results']['opensearch:totalResults'])
-                if matches == 1:
-                    citation_count = int(data['search-results']['entry'][0]['citedby-count'])
-            else:
-                logger.error(f"Something went wrong ({response.status_code}) with pmid:{pmid}:\n{str(response.content)}\n{response.headers}")
+            citation_count = self.citedby_counts([pmid]).get(str(pmid))
         return citation_count
+
+    def citedby_counts(self, pmids: List[str], batch_size: int = 25) -> Dict[str, int]:
+        """Retrieves the citation counts of many papers with a few queries of the form 'PMID(a) OR PMID(b) OR ...'.
+        A count is returned only for PMIDs that correspond to a single Scopus record.
+
+        Args:
+            pmids (List[str]): the PMIDs of the papers; empty values are ignored.
+            batch_size (int): the number of PMIDs per query, should not exceed the number of entries per page allowed by the API key.
+
+        Returns:
+            (Dict[str, int]): the citation count for each PMID found in Scopus.
+        """
+        pmids = sorted({str(pmid) for pmid in pmids if pmid})  # sorted to make queries reproducible and cacheable
+        citation_counts = {}
+        for i in range(0, len(pmids), batch_size):
+            batch = pmids[i:i + batch_size]
+            citation_counts.update(self._citedby_batch(batch, batch_size))
+        return citation_counts
+
+    def _citedby_batch(self, pmids: List[str], page_size: int) -> Dict[str, int]:
+        query = " OR ".join([f"PMID({pmid})" for pmid in pmids])
+        records = {pmid: [] for pmid in pmids}
+        start = 0
+        while True:
+            params = {"apiKey": self.API_KEY, "query": query, "field": "citedby-count,pubmed-id", "count": page_size, "start": start}
+            response = self._request('POST', self.REST_URL, data=params)
+            count, last = self._parse_citedby_page(response, pmids, records, start)
+            start += count
+            if last:
+                break
+        return self._citation_counts(records)
+
+    def _parse_citedby_page(self, response: requests.Response, pmids: List[str], records: Dict[str, List[int]], start: int) -> Tuple[int, bool]:
+        """Adds the citation counts of a page of results to records and returns the number of entries and whether it is the last page."""
+        if response.status_code != 200:
+            logger.error(f"Something went wrong ({response.status_code}) with pmids:{pmids}:\n{str(response.content)}\n{response.headers}")
+            return 0, True
+        self._check_quota(response)
+        data = response.json()['search-results']
+        total = int(data['opensearch:totalResults'])
+        entries = [e for e in data.get('entry', []) if 'error' not in e]  # an empty result set is returned as a single 'error' entry
+        for entry in entries:
+            pmid = entry.get('pubmed-id')
+            if pmid in records and entry.get('citedby-count') is not None:
+                records[pmid].append(int(entry['citedby-count']))
+        return len(entries), not entries or start + len(entries) >= total
+
+    @staticmethod
+    def _citation_counts(records: Dict[str, List[int]]) -> Dict[str, int]:
+        return {pmid: counts[0] for pmid, counts in records.items() if len(counts) == 1}
+
+    def _check_quota(self, response: requests.Response):
+        remaining_queries = response.headers.get('X-RateLimit-Remaining')
+        if remaining_queries is not None and int(remaining_queries) < 10_000:
+            logger.warning(f"more than half of queries consumed. Only {remaining_queries} left!")
+            # raise RuntimeError(f"quota half consumed. Remaining: {remaining_queries}.")
@@ -0,0 +1,263 @@
+import re
+import gzip
+import json
+import zlib
+import sqlite3
+import logging
+from pathlib import Path
+from threading import Lock
+from argparse import ArgumentParser
+from typing import List, Set, Iterable
+
+from lxml.etree import Element, tostring, fromstring
+
+from .models import PubMedArticle
+from .net import iter_records
+from .search import SearchEngine
+from .utils import normalize
+from .config import PreprintInclusion, config
+from . import logger
+
+"""Offline search of a local index built from a bulk snapshot of the literature."""
+
+# words too frequent in titles to help retrieving a paper; they are not indexed
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'by', 'for', 'from', 'in', 'into', 'is', 'of', 'on', 'or',
+    'the', 'to', 'via', 'with', 'without', 'its', 'their', 'during', 'between', 'through',
+])
+
+
+MONTHS = {m: f"{i:02d}" for i, m in enumerate(['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
+
+def title_tokens(title: str) -> Set[str]:
+    """The normalized words of a title that are indexed."""
+    return {t for t in normalize(title).split() if t not in STOPWORDS}
+
+
+def publication_date(xml: Element) -> str:
+    """The publication date of a PubMed record, as searched with PDAT: the earliest of the electronic publication date (ArticleDate)
+    and of the date of the issue (PubDate), or the date the record entered PubMed when it has neither.
+    Missing months and days are taken as the first of the year or of the month.
+
+    Args:
+        xml (Element): the PubmedArticle element.
+
+    Returns:
+        (str): the date, YYYY-MM-DD; None when the record has no date.
+    """
+    dates = [_iso_date(e) for e in xml.xpath('MedlineCitation/Article/ArticleDate | MedlineCitation/Article/Journal/JournalIssue/PubDate')]
+    dates = [d for d in dates if d is not None]
+    if not dates:
+        dates = [_iso_date(e) for e in xml.xpath('PubmedData/History/PubMedPubDate[@PubStatus="pubmed"]')]
+        dates = [d for d in dates if d is not None]
+    return min(dates) if dates else None
+
+
+def _iso_date(element: Element) -> str:
+    # months are numbers or abbreviated names; issues can be dated as free text, e.g. <MedlineDate>1998 Dec-1999 Jan</MedlineDate>
+    year, month, day = element.findtext('Year'), element.findtext('Month'), element.findtext('Day')
+    if not year:
+        m = re.match(r'(\d{4})(?:\s+([A-Za-z]{3}))?', element.findtext('MedlineDate', ''))
+        if m is None:
+            return None
+        year, month, day = m.group(1), m.group(2), None
+    month = MONTHS.get((month or '01')[:3].lower(), month or '01')
+    return f"{year}-{int(month):02d}-{int(day or 1):02d}"
+
+
+class LocalIndex:
+    """An index of articles built from PubMed baseline or update files, kept in a SQLite database.
+    Articles are stored as compressed XML records, rebuilt into PubMedArticle when retrieved,
+    with their publication date (see publication_date()) and an inverted index of the normalized last names of their authors (including the alternatives
+    of composed names, see utils.process_authors) and of the words of their title.
+
+    Args:
+        path (str): the path to the database file.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS articles (pmid TEXT PRIMARY KEY, pub_date TEXT, is_preprint INTEGER, xml BLOB)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS authors (name TEXT, pmid TEXT, PRIMARY KEY (name, pmid)) WITHOUT ROWID")
+        columns = self._columns('title_tokens')
+        if columns and 'pub_date' not in columns:  # an index built before the publication dates were kept with the title words
+            self._conn.execute("ALTER TABLE title_tokens RENAME TO title_tokens_without_dates")
+        # the postings of a word are ordered by publication date, so that a title search only reads those of the window searched
+        self._conn.execute("CREATE TABLE IF NOT EXISTS title_tokens (token TEXT, pub_date TEXT, pmid TEXT, PRIMARY KEY (token, pub_date, pmid)) WITHOUT ROWID")
+        if self._columns('title_tokens_without_dates'):
+            logger.info(f"adding publication dates to the title words of {self.path}.")
+            self._conn.execute(
+                "INSERT OR IGNORE INTO title_tokens SELECT token, pub_date, pmid FROM title_tokens_without_dates JOIN articles USING (pmid)"
+            )
+            self._conn.execute("DROP TABLE title_tokens_without_dates")
+        self._conn.commit()
+
+    def _columns(self, table: str) -> List[str]:
+        return [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+
+    def add_file(self, filepath: str, min_pub_date: str = '0000-00-00', max_pub_date: str = '9999-99-99') -> int:
+        """Adds the articles of a PubMed baseline or update file, streaming through it.
+        The articles deleted by an update file (DeleteCitation) are removed from the index.
+
+        Args:
+            filepath (str): the path to the file, gzipped or not.
+            min_pub_date (str): the earliest publication date of the articles to index (see publication_date()).
+            max_pub_date (str): the latest publication date of the articles to index.
+
+        Returns:
+            (int): the number of articles added.
+        """
+        articles, authors, tokens, deleted = [], [], [], []
+        undated = 0
+        opener = gzip.open if str(filepath).endswith('.gz') else open
+        with opener(filepath, 'rb') as f:
+            for xml in iter_records(f, ('PubmedArticle', 'DeleteCitation'), 'PubmedArticleSet'):
+                if xml.tag == 'DeleteCitation':
+                    deleted += [pmid.text for pmid in xml.findall('PMID')]
+                    continue
+                pub_date = publication_date(xml)
+                if pub_date is None:
+                    undated += 1
+                    continue
+                if not (min_pub_date <= pub_date <= max_pub_date):
+                    continue
+                article = PubMedArticle(xml=xml)
+                articles.append((article.pmid, pub_date, int(article.is_preprint), zlib.compress(tostring(xml))))
+                authors += [(name, article.pmid) for alternatives in article.expanded_author_list for name in alternatives]
+                tokens += [(token, pub_date, article.pmid) for token in title_tokens(article.title)]
+        with self._lock:
+            self._delete(a[0] for a in articles)
+            self._conn.executemany("INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?)", articles)
+            self._conn.executemany("INSERT OR IGNORE INTO authors VALUES (?, ?)", authors)
+            self._conn.executemany("INSERT OR IGNORE INTO title_tokens VALUES (?, ?, ?)", tokens)
+            self._delete(deleted, articles=True)
+            self._conn.commit()
+        logger.info(f"indexed {len(articles)} articles from {filepath}, skipped {undated} articles without date, deleted {len(deleted)} articles.")
+        return len(articles)
+
+    def _delete(self, pmids: Iterable[str], articles: bool = False):
+        # the authors and title words of re-indexed articles are deleted; deleted articles are removed altogether
+        pmids = _json_list(pmids)
+        tables = ['authors', 'title_tokens'] + (['articles'] if articles else [])
+        for table in tables:
+            self._conn.execute(f"DELETE FROM {table} WHERE pmid IN (SELECT value FROM json_each(?))", (pmids,))
+
+    def search_by_author(self, author_list: List[List[str]], min_pub_date: str, max_pub_date: str, preprints: str = None, limit: int = 5) -> List[PubMedArticle]:
+        """Retrieves the articles including all the authors, each matched by any of its alternative names.
+        The articles published soonest after min_pub_date come first.
+
+        Args:
+            author_list (List[List[str]]): the expanded list of authors with for each name alternatives.
+            min_pub_date (str): the earliest publication date.
+            max_pub_date (str): the latest publication date.
+            preprints (str): 'exclude' or 'only' to filter preprints, None to keep all articles.
+            limit (int): the maximum number of articles.
+
+        Returns:
+            (List[PubMedArticle]): the articles retrieved.
+        """
+        clauses = ["pmid IN (SELECT pmid FROM authors WHERE name IN (SELECT value FROM json_each(?)))" for _ in author_list]
+        sql = f"SELECT xml, pub_date FROM articles WHERE {' AND '.join(clauses)} AND pub_date BETWEEN ? AND ?{self._preprint_clause(preprints)} ORDER BY pub_date LIMIT ?"
+        params = [_json_list(alternatives) for alternatives in author_list] + [min_pub_date, max_pub_date, limit]
+        return self._articles(sql, params)
+
+    def search_by_title(self, title: str, min_pub_date: str, max_pub_date: str, preprints: str = None, limit: int = 5) -> List[PubMedArticle]:
+        """Retrieves the articles sharing the most words with the title.
+        Only the postings of the words of the title within the publication window are read and counted.
+
+        Args:
+            title (str): the title.
+            min_pub_date (str): the earliest publication date.
+            max_pub_date (str): the latest publication date.
+            preprints (str): 'exclude' or 'only' to filter preprints, None to keep all articles.
+            limit (int): the maximum number of articles.
+
+        Returns:
+            (List[PubMedArticle]): the articles retrieved, the ones sharing most words first.
+        """
+        tokens = title_tokens(title)
+        if not tokens:
+            return []
+        sql = (
+            "SELECT xml, pub_date FROM articles JOIN ("
+            "SELECT pmid, COUNT(*) AS shared FROM title_tokens WHERE token IN (SELECT value FROM json_each(?)) AND pub_date BETWEEN ? AND ? GROUP BY pmid"
+            f") USING (pmid){self._preprint_clause(preprints).replace(' AND ', ' WHERE ', 1)} ORDER BY shared DESC, pub_date LIMIT ?"
+        )
+        return self._articles(sql, [_json_list(tokens), min_pub_date, max_pub_date, limit])
+
+    @staticmethod
+    def _preprint_clause(preprints: str) -> str:
+        return {'exclude': ' AND NOT is_preprint', 'only': ' AND is_preprint'}.get(preprints, '')
+
+    def _articles(self, sql: str, params: List) -> List[PubMedArticle]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        articles = []
+        for xml, pub_date in rows:
+            article = PubMedArticle(xml=fromstring(zlib.decompress(xml)))
+            article.pub_date = pub_date  # the publication date the article was indexed and searched with
+            articles.append(article)
+        return articles
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+
+def _json_list(values: Iterable[str]) -> str:
+    # lists are passed to SQLite as json arrays, avoiding a placeholder per value
+    return json.dumps(list(values))
+
+
+class LocalEngine(SearchEngine):
+    """A search engine answering author and title searches from a LocalIndex, without any network request.
+    The queries have the same semantics as with the online engines: all the authors, each under any of its alternative names,
+    or the words of the title, within the publication date window and with the same inclusion of preprints.
+
+    Args:
+        preprint_inclusion (PreprintInclusion): level of inclusion of preprints.
+        index_path (str): the path to the index built with `python -m src.offline`; defaults to config.local_index.
+        limit (int): the maximum number of articles per search.
+    """
+
+    def __init__(self, preprint_inclusion: PreprintInclusion = PreprintInclusion.NO_PREPRINT, index_path: str = None, limit: int = 5):
+        super().__init__(preprint_inclusion=preprint_inclusion)
+        index_path = index_path or config.local_index
+        if index_path is None:
+            raise ValueError("no local index given, see config.local_index.")
+        self.index = LocalIndex(index_path)
+        self.limit = limit
+        self.preprints = {PreprintInclusion.NO_PREPRINT: 'exclude', PreprintInclusion.ONLY_PREPRINT: 'only'}.get(preprint_inclusion)
+
+    def search_by_author(self, author_list: List[List[str]], min_pub_date: str = '1970-01-01', max_pub_date: str = '3000-01-01') -> List[PubMedArticle]:
+        if not author_list:
+            return []
+        return self.index.search_by_author(author_list, min_pub_date, max_pub_date, self.preprints, self.limit)
+
+    def search_by_title(self, title: str, min_pub_date: str = '1970-01-01', max_pub_date: str = '3000-01-01') -> List[PubMedArticle]:
+        if not title:
+            return []
+        return self.index.search_by_title(title, min_pub_date, max_pub_date, self.preprints, self.limit)
+
+    def batch_search_by_title(self, titles: List[str], min_pub_dates: List[str], max_pub_date: str = '3000-01-01', limit: int = 5, overlap_threshold: float = 0.85) -> List[List[PubMedArticle]]:
+        # local queries are cheap, batching them would only make the ranking of candidates coarser
+        return [self.search_by_title(title, min_pub_date, max_pub_date)[:limit] for title, min_pub_date in zip(titles, min_pub_dates)]
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Builds the local index used for offline scans from PubMed baseline or update files.")
+    parser.add_argument("index", help="Path to the index database.")
+    parser.add_argument("files", nargs="+", help="PubMed baseline or update files (pubmed*.xml.gz), in the order of their release.")
+    parser.add_argument("--min_date", default='0000-00-00', help="Earliest publication date of the articles to index (YYYY-MM-DD).")
+    parser.add_argument("--max_date", default='9999-99-99', help="Latest publication date of the articles to index (YYYY-MM-DD).")
+    parser.add_argument("-D", "--debug", action="store_true", help="Debug mode.")
+    args = parser.parse_args()
+    logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
+    index = LocalIndex(args.index)
+    for filepath in args.files:
+        index.add_file(filepath, args.min_date, args.max_date)
+    logger.info(f"{len(index)} articles in {args.index}.")
@@ -0,0 +1,104 @@
+import sqlite3
+from time import time
+from pathlib import Path
+from itertools import islice
+from datetime import date
+from threading import Lock
+
+from .net import BioRxivService
+from . import logger
+
+"""Local index of the publication status of bioRxiv and medRxiv preprints."""
+
+
+class PreprintIndex:
+    """Maps the doi of bioRxiv and medRxiv preprints to the doi of the journal article they were published as.
+    The index is filled in bulk from the pubs/ listings of the bioRxiv API for a window of dates
+    and kept in a SQLite database, so that the status of any preprint of the window is then a local lookup.
+    The window covered for each server is recorded with the time of the download. A window is downloaded again
+    when it does not cover the start of the requested one or when it is older than TTL, since preprints keep being published;
+    otherwise only the days after the end of the window are downloaded.
+
+    Args:
+        cache_dir (str): the directory where the database is stored; in memory if None.
+        service (BioRxivService): the service used to download the listings.
+    """
+
+    FILENAME = 'preprints.sqlite'
+    SERVERS = ('biorxiv', 'medrxiv')
+    TTL = 7 * 24 * 3600  # same as BioRxivService.CACHE_TTL
+    PAGE_SIZE = 100  # same as the pages of the pubs/ endpoint
+
+    def __init__(self, cache_dir: str = None, service: BioRxivService = None):
+        if cache_dir is not None:
+            self.path = Path(cache_dir) / self.FILENAME
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        else:
+            self.path = ':memory:'
+        self.service = service or BioRxivService()
+        self._lock = Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS published (preprint_doi TEXT PRIMARY KEY, published_doi TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS windows (server TEXT PRIMARY KEY, start TEXT, end TEXT, fetched REAL)")
+        self._conn.commit()
+
+    def update(self, start: str, end: str = None):
+        """Downloads the listings of the servers for the window between start and end unless a recent download covers it.
+        When a recent download covers the start of the window, only the days since its last day are downloaded.
+        Rows are saved page by page, so that an interrupted download keeps the pages already received.
+
+        Args:
+            start (str): the first day of the window, YYYY-MM-DD.
+            end (str): the last day of the window, YYYY-MM-DD; today by default.
+        """
+        end = end or date.today().isoformat()
+        for server in self.SERVERS:
+            with self._lock:
+                covered = self._conn.execute("SELECT start, end, fetched FROM windows WHERE server = ?", (server,)).fetchone()
+            if covered is not None and covered[0] <= start and time() - covered[2] < self.TTL:
+                covered_start, covered_end, fetched = covered
+                if end <= covered_end:
+                    continue
+                # the last day covered is listed again since it may have been downloaded before the end of the day
+                window_start = covered_start
+                start_download = covered_end
+            else:
+                window_start = start_download = start
+                fetched = time()
+            logger.info(f"indexing {server} preprints published from {start_download} to {end}.")
+            n = self._download(server, start_download, end)
+            with self._lock:
+                # the time of the download of the whole window is kept, so that the window is refreshed when it expires
+                self._conn.execute("INSERT OR REPLACE INTO windows VALUES (?, ?, ?, ?)", (server, window_start, end, fetched))
+                self._conn.commit()
+            logger.info(f"indexed {n} published {server} preprints.")
+
+    def _download(self, server: str, start: str, end: str) -> int:
+        """Saves the listing of a server for the window between start and end, PAGE_SIZE rows at a time, and returns the number of rows."""
+        listing = ((preprint_doi.lower(), published_doi) for preprint_doi, published_doi in self.service.published_preprints(server, start, end))
+        n = 0
+        while True:
+            rows = list(islice(listing, self.PAGE_SIZE))
+            if not rows:
+                return n
+            with self._lock:
+                self._conn.executemany("INSERT OR REPLACE INTO published VALUES (?, ?)", rows)
+                self._conn.commit()
+            n += len(rows)
+
+    def published_doi(self, doi: str) -> str:
+        """Looks up the doi of the journal article a preprint was published as.
+
+        Args:
+            doi (str): the doi of the preprint.
+
+        Returns:
+            (str): the doi of the journal article, None if the preprint is not known to be published.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT published_doi FROM published WHERE preprint_doi = ?", (doi.lower(),)).fetchone()
+        return row[0] if row else None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM published").fetchone()[0]
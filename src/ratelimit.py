@@ -0,0 +1,108 @@
+import asyncio
+from time import time, monotonic, sleep
+from threading import Lock
+from email.utils import parsedate_to_datetime
+from typing import Mapping
+
+from . import logger
+
+"""Rate limiting of the requests sent to the web services."""
+
+
+class RateLimitExhausted(Exception):
+    """Raised instead of waiting when a service asks to pause the requests for longer than TokenBucket.max_pause,
+    for example until the reset of a weekly quota."""
+
+
+class TokenBucket:
+    """A token bucket limiting the rate of requests to a service.
+    Tokens are refilled continuously at 'rate' tokens per second up to 'capacity'.
+    Each request takes one token and waits until the token is available.
+    Tokens are reserved under a lock and the waiting happens outside of it, so that the same bucket
+    can be shared by threads (acquire) and coroutines (acquire_async).
+    The bucket can be paused when a service signals that the limit was reached (see update()).
+    A pause longer than max_pause is not waited for: until its end, requests fail with RateLimitExhausted.
+
+    Args:
+        rate (float): the sustained number of requests per second.
+        capacity (float): the maximum burst size; defaults to one second worth of requests.
+        max_pause (float): the longest pause in seconds that requests wait for.
+    """
+
+    def __init__(self, rate: float, capacity: float = None, max_pause: float = 300):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.max_pause = max_pause
+        self.tokens = self.capacity
+        self.updated = monotonic()
+        self.paused_until = 0.0
+        self.exhausted_until = 0.0
+        self._lock = Lock()
+
+    def _reserve(self) -> float:
+        """Takes a token and returns the delay in seconds to wait before it can be used."""
+        with self._lock:
+            now = monotonic()
+            if now < self.exhausted_until:
+                raise RateLimitExhausted(f"no request allowed before {(self.exhausted_until - now) / 3600:.1f} h.")
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(delay, self.paused_until - now)
+
+    def acquire(self):
+        """Blocks the calling thread until a token is available."""
+        delay = self._reserve()
+        if delay > 0:
+            sleep(delay)
+
+    async def acquire_async(self):
+        """Suspends the calling coroutine until a token is available."""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Prevents any request from being sent during the next 'seconds'; requests fail instead of waiting if longer than max_pause."""
+        with self._lock:
+            if seconds > self.max_pause:
+                logger.error(f"rate limit exhausted for {seconds / 3600:.1f} h, longer than the maximum pause of {self.max_pause} s; requests will fail.")
+                self.exhausted_until = max(self.exhausted_until, monotonic() + seconds)
+            else:
+                self.paused_until = max(self.paused_until, monotonic() + seconds)
+
+    def update(self, status_code: int, headers: Mapping[str, str]):
+        """Adjusts the bucket to the feedback sent by the service with the response.
+        The Retry-After header (seconds or HTTP date) of a 429 or 503 response pauses the bucket accordingly.
+        An exhausted X-RateLimit-Remaining pauses the bucket until X-RateLimit-Reset (epoch seconds) or for one second.
+        Pauses longer than max_pause make the next requests fail (see pause()).
+
+        Args:
+            status_code (int): the status code of the response.
+            headers (Mapping[str, str]): the headers of the response.
+        """
+        retry_after = headers.get('Retry-After')
+        if status_code in (429, 503) and retry_after:
+            delay = self._parse_retry_after(retry_after)
+            logger.warning(f"rate limit hit ({status_code}), pausing requests for {delay:.1f} s.")
+            self.pause(delay)
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is not None and remaining.strip().isdigit() and int(remaining) <= 0:
+            reset = headers.get('X-RateLimit-Reset')
+            delay = float(reset) - time() if reset and reset.strip().isdigit() else 1.0
+            logger.warning(f"no request left in current rate limit window, pausing requests for {delay:.1f} s.")
+            self.pause(max(delay, 0.0))
+        elif status_code == 429 and not retry_after:
+            self.pause(1.0)
+
+    @staticmethod
+    def _parse_retry_after(retry_after: str) -> float:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time()
+            except (TypeError, ValueError):
+                delay = 1.0
+        return max(delay, 0.0)
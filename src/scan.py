@@ -1,19 +1,33 @@
 
+import re
+import json
 import logging
+import hashlib
+import multiprocessing
 from pathlib import Path
-from typing import List, Tuple, Callable
+from functools import partial
+from typing import List, Dict, Tuple, Callable, FrozenSet
 from datetime import datetime
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
+import requests
 from tqdm import tqdm
 import pandas as pd
 
 from .config import PreprintInclusion, config
-from .models import Submission, Result, Analysis
+from .models import Paper, Submission, Result, Analysis
 from .search import EuropePMCEngine, PubMedEngine
+from .offline import LocalEngine
 from .ejp import EJPReport
-from .match import match_by_author, match_by_title
-from .net import BioRxivService, ScopusService
+from .match import MATCHERS, use_title_store, tier_counts, init_matcher, match_in_process, add_tier_counts
+from .embeddings import TitleEmbeddingStore
+from .state import ScanState
+from .checkpoint import Checkpoint
+from .preprints import PreprintIndex
+from .net import Service, BioRxivService, ScopusService, connection_pools
+from .cache import ResponseCache
+from .ratelimit import RateLimitExhausted
 from .reports import (
     Overview, CitationDistributionViolin, CitationDistributionHisto,
     TimeToPublish,
@@ -24,6 +38,31 @@ from .reports import (
 from . import logger, RESULTS
 
 
+def shard_of(manuscript_nm: str, count: int) -> int:
+    """Deterministically assigns a manuscript to one of count shards, the same on every machine and in every run.
+
+    Args:
+        manuscript_nm (str): the manuscript number.
+        count (int): the number of shards.
+
+    Returns:
+        (int): the shard of the manuscript, from 1 to count.
+    """
+    digest = hashlib.sha1(manuscript_nm.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """Parses the --shard argument 'i/N' into the index i of the shard (from 1 to N) and the number of shards N."""
+    try:
+        index, count = (int(x) for x in shard.split('/'))
+    except ValueError:
+        raise ArgumentTypeError(f"shard must be given as i/N, not '{shard}'")
+    if not 1 <= index <= count:
+        raise ArgumentTypeError(f"shard index must be between 1 and {count}, not {index}")
+    return index, count
+
+
 class Scanner:
     """Scans a list of submissions and attempts to find best matching papers in PubMed Central.
     A dual search strategy is used:
@@ -34,6 +73,16 @@ class Scanner:
         ejp_report (EJPReport): the eJP report that includes the list of submissions.
         dest_path (str): the destination path to save the results.
         engine (PMCService): the search engine used to retrieve published papers.
+        workers (int): the number of submissions searched concurrently. The number of requests in flight is further capped by each service.
+        title_batch_size (int): the number of submissions whose titles are searched together in a single query; 0 to search titles one by one.
+        match_processes (int): the number of processes matching candidates with submissions, each loading its own copy of the spaCy model.
+            With 0, matching runs in the threads that search the submissions.
+        state (ScanState): for incremental scans, the record of previous scans; only new, modified or expired submissions are searched.
+        checkpoint (Checkpoint): where the outcome of each search is saved as soon as it completes; submissions already in the checkpoint are not searched again.
+        shard (Tuple[int, int]): the index i (from 1 to N) and the number N of shards when the scan is split across several machines.
+            Only the submissions of shard i are scanned and their results are saved to <RESULTS>/<dest>.jsonl, to be combined with src.merge.
+        cache_dir (str): the directory of the response cache, where the index of preprint publication status is also kept (see preprints.PreprintIndex).
+            Without it, the publication status of preprints is requested preprint by preprint.
     """
 
     def __init__(
@@ -43,7 +92,14 @@ class Scanner:
         SearchEngine: Callable,
         CitationEngine: Callable,
         preprint_inclusion: PreprintInclusion,
-        include_citations: bool
+        include_citations: bool,
+        workers: int = 1,
+        match_processes: int = 0,
+        title_batch_size: int = 0,
+        state: ScanState = None,
+        checkpoint: Checkpoint = None,
+        shard: Tuple[int, int] = None,
+        cache_dir: str = None
     ):
         self.ejp_report = ejp_report
         self.dest_basename = dest_basename
@@ -53,19 +109,63 @@ class Scanner:
         self.preprint_inclusion = preprint_inclusion
         self.include_preprints = self.preprint_inclusion in [PreprintInclusion.ONLY_PREPRINT, PreprintInclusion.WITH_PREPRINT]
         self.include_citations = include_citations
+        self.workers = workers
+        self.match_processes = match_processes
+        self.title_batch_size = title_batch_size
+        self.title_store = None
+        self._matchers = None
+        self.state = state
+        self.checkpoint = checkpoint
+        self.shard = shard
+        self.cache_dir = cache_dir
 
     def run(self) -> List[Path]:
         """Retrieves the best matching published papers corresponding to the submissions of interest, adds citation data,
         exports the results to time-stamped Excel files and generate summary visualization.
+        When scanning a shard, the results are saved for a later merge instead of being exported.
         """
-        N = len(self.ejp_report.articles)
-        logger.info(f"scanning {N} submissions from {self.ejp_report.filepath}.")
-        found, not_found = self.retrieve(self.ejp_report.articles)
+        submissions = self.ejp_report.articles
+        if self.shard is not None:
+            index, count = self.shard
+            submissions = [s for s in submissions if shard_of(s.manuscript_nm, count) == index]
+            logger.info(f"scanning shard {index}/{count}.")
+        logger.info(f"scanning {len(submissions)} submissions from {self.ejp_report.filepath}.")
+        if config.precompute_title_vectors:
+            titles = [submission.title for submission in self.ejp_report.articles]  # all shards compute the same store
+            self.title_store = TitleEmbeddingStore.for_report(self.ejp_report.filepath, titles)
+            use_title_store(self.title_store)
+        if self.state is not None:
+            to_search, reused = self.state.plan(submissions, config.retry_not_found_after)
+            found, not_found = self.retrieve(to_search)
+            self.state.update(found, not_found)
+            found, not_found = self.merge(submissions, found, not_found, reused)
+        else:
+            found, not_found = self.retrieve(submissions)
         if self.include_citations:
-            self.add_citations(found)
-            self.add_citations(not_found)
+            self.add_citations(found + not_found)
         if self.include_preprints:
             self.update_preprint_status(found)
+        if self.shard is not None:
+            paths = [self.save_shard(found, not_found)]
+        else:
+            paths = self.finalize(found, not_found)
+        if self.checkpoint is not None:
+            self.checkpoint.close(remove=True)  # the scan is complete and there is nothing to resume
+        if Service.cache is not None:
+            logger.info(f"response cache {Service.cache}")
+        logger.info(f"connection pools: {connection_pools}")
+        return paths
+
+    def finalize(self, found: List[Result], not_found: List[Result]) -> List[Path]:
+        """Filters preprints, exports the results to time-stamped Excel files and generates the reports.
+
+        Args:
+            found (List[Result]): the results for articles that were found.
+            not_found (List[Result]): the results for articles that were NOT found.
+
+        Returns:
+            (List[Path]): the paths to the saved results and reports.
+        """
         found = self.filter_preprints(found)
         timestamp = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
         logger.info(f"exporting results with timestamp {timestamp}")
@@ -74,9 +174,42 @@ class Scanner:
         report_paths = self.reporting(df_found, df_not_found)
         return [found_path, not_found_path] + report_paths
 
+    def save_shard(self, found: List[Result], not_found: List[Result]) -> Path:
+        """Saves the results of a shard, in the same JSONL format as the checkpoint, to be combined later with src.merge.
+        The settings of the scan and the position of each submission in the report are saved alongside, as <RESULTS>/<dest>.json,
+        so that the merged results are filtered and reported like those of a scan that was not split, and in the same order.
+
+        Args:
+            found (List[Result]): the results for articles that were found.
+            not_found (List[Result]): the results for articles that were NOT found.
+
+        Returns:
+            (Path): the path to the saved results.
+        """
+        output = Checkpoint(Path(RESULTS) / f"{self.dest_basename}.jsonl")
+        for result in found:
+            output.write(result, True)
+        for result in not_found:
+            output.write(result, False)
+        output.close()
+        positions = {s.manuscript_nm: i for i, s in enumerate(self.ejp_report.articles)}
+        settings = {
+            'preprint_inclusion': self.preprint_inclusion.value,
+            'include_citations': self.include_citations,
+            'positions': {r.submission.manuscript_nm: positions.get(r.submission.manuscript_nm) for r in found + not_found},
+        }
+        with output.path.with_suffix('.json').open('w') as f:
+            json.dump(settings, f)
+        logger.info(f"results of shard {self.shard[0]}/{self.shard[1]} saved to {output.path}")
+        return output.path
+
     def retrieve(self, submissions: List[Submission]) -> Tuple[List[Result], List[Result]]:
         """Loops through a list of submissions and accumulates articles found and not found in PubMed Central.
         For each Submission, a Result keeps record of both the Submission and its cognate Article if any.
+        With more than one worker, submissions are searched concurrently but results are kept in the order of the submissions.
+        With matching processes, the threads hand the candidates over to the processes and search other submissions in the meantime,
+        so that network requests and matching overlap; the number of matching jobs in flight is bounded by the number of workers.
+        With a checkpoint, the outcome of each search is saved as soon as it completes and the submissions already in the checkpoint are skipped.
 
         Args:
             submissions (List[Submission]): a submission as imported from the editorial system report.
@@ -87,17 +220,126 @@ class Scanner:
         """
         found = []
         not_found = []
-        for submission in tqdm(submissions):
-            result, success = self.search(submission)
+        resumed = []
+        pending = submissions
+        if self.checkpoint is not None:
+            pending = []
+            for submission in submissions:
+                if submission.manuscript_nm in self.checkpoint.completed:
+                    result, success = self.checkpoint.completed[submission.manuscript_nm]
+                    result.submission = submission
+                    resumed.append((result, success))
+                else:
+                    pending.append(submission)
+        if self.match_processes > 0:
+            self._matchers = ProcessPoolExecutor(
+                max_workers=self.match_processes,
+                mp_context=multiprocessing.get_context('spawn'),  # forking from the searching threads could inherit held locks
+                initializer=init_matcher,
+                initargs=(config, str(self.title_store.path) if self.title_store is not None else None)
+            )
+        try:
+            if self.title_batch_size > 0:
+                outcomes = self.retrieve_batched(pending)
+            else:
+                outcomes = self.map(self.search, pending)
+        finally:
+            if self._matchers is not None:
+                self._matchers.shutdown()
+                self._matchers = None
+        for result, success in outcomes:
             if success:
                 found.append(result)
             else:
                 not_found.append(result)
+        logger.info(f"candidate titles resolved per tier: {dict(tier_counts)}")
+        if resumed:
+            found, not_found = self.merge(submissions, found, not_found, resumed)
         logger.info(f"found {len(found)} / {len(submissions)} results.")
         return found, not_found
 
+    def map(self, func: Callable, items: List) -> List:
+        """Applies func to the items, concurrently with more than one worker, and returns the outputs in the order of the items."""
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                return list(tqdm(executor.map(func, items), total=len(items)))
+        return [func(item) for item in tqdm(items)]
+
+    def retrieve_batched(self, submissions: List[Submission]) -> List[Tuple[Result, bool]]:
+        """Searches the submissions with the dual search strategy, searching titles in batches.
+        All the submissions are first searched by author, title_batch_size at a time for engines that retrieve articles in bulk
+        (see SearchEngine.batch_search_by_author()), one by one otherwise. The titles of the submissions not matched are then searched
+        together, title_batch_size at a time (see SearchEngine.batch_search_by_title()), and matched with the articles assigned to them.
+        Titles that the batches could not settle are searched one by one, by the worker of their batch.
+        The outcome of a submission is saved to the checkpoint, if any, as soon as it is known: after the author search for the
+        submissions matched by author, after the search of their batch for the others.
+
+        Args:
+            submissions (List[Submission]): the submissions to search.
+
+        Returns:
+            (List[Tuple[Result, bool]]): the result of each submission and whether a good match was found.
+        """
+        outcomes: Dict[int, Tuple[Result, bool]] = {}
+        all_submissions = list(range(len(submissions)))
+        batches = [all_submissions[i:i + self.title_batch_size] for i in range(0, len(submissions), self.title_batch_size)]
+        batch_pages = self.map(
+            lambda batch: self.search_engine.batch_search_by_author(
+                [submissions[i].expanded_author_list for i in batch],
+                [submissions[i].sub_date for i in batch]
+            ),
+            batches
+        )
+        pages = {i: p for batch, ps in zip(batches, batch_pages) for i, p in zip(batch, ps)}
+
+        def search_by_author(i: int) -> Paper:
+            match, success = self.search_by_author(submissions[i], pages[i])
+            if success:
+                outcomes[i] = self.save(submissions[i], match, success)
+            return match
+
+        by_author = self.map(search_by_author, all_submissions)
+        unmatched = [i for i in all_submissions if i not in outcomes]
+        logger.info(f"searching the titles of {len(unmatched)} submissions in batches of {self.title_batch_size}.")
+        batches = [unmatched[i:i + self.title_batch_size] for i in range(0, len(unmatched), self.title_batch_size)]
+
+        def search_by_title(batch: List[int]):
+            batch_candidates = self.search_engine.batch_search_by_title(
+                [submissions[i].title for i in batch],
+                [submissions[i].sub_date for i in batch]
+            )
+            logger.debug(f"{sum(c is None for c in batch_candidates)} titles of the batch left to search one by one.")
+            for i, candidates in zip(batch, batch_candidates):
+                match, success = self.search_by_title(submissions[i], by_author[i], candidates)
+                outcomes[i] = self.save(submissions[i], match, success)
+
+        self.map(search_by_title, batches)
+        return [outcomes[i] for i in all_submissions]
+
+    @staticmethod
+    def merge(submissions: List[Submission], found: List[Result], not_found: List[Result], reused: List[Tuple[Result, bool]]) -> Tuple[List[Result], List[Result]]:
+        """Combines the results of the current search with results reused from previous scans, in the order of the submissions.
+
+        Args:
+            submissions (List[Submission]): the submissions of the report, giving the order of the results.
+            found (List[Result]): the results found in the current search.
+            not_found (List[Result]): the results not found in the current search.
+            reused (List[Tuple[Result, bool]]): the results of previous scans and whether they were found.
+
+        Returns:
+            (List[Result]): all the results for articles that were found.
+            (List[Result]): all the results for articles that were NOT found.
+        """
+        order = {s.manuscript_nm: i for i, s in enumerate(submissions)}
+        outcomes = [(r, True) for r in found] + [(r, False) for r in not_found] + reused
+        outcomes.sort(key=lambda outcome: order.get(outcome[0].submission.manuscript_nm, len(order)))
+        merged_found = [r for r, success in outcomes if success]
+        merged_not_found = [r for r, success in outcomes if not success]
+        logger.info(f"merged results: {len(merged_found)} found / {len(outcomes)}.")
+        return merged_found, merged_not_found
+
     def search(self, submission: Submission) -> Tuple[Result, bool]:
-        """Performs the dual seach to find a published article best matching the submission.
+        """Performs the dual seach to find a published article best matching the submission and saves the outcome to the checkpoint, if any.
 
         Args:
             submission (Submission): the submission used as query for the search.
@@ -106,27 +348,85 @@ class Scanner:
             (Result): the result of the search, keeping hold of the Submission and the found Article if any.
             (bool): whether a good match was successfully found.
         """
-        title = submission.title
-        authors = submission.expanded_author_list
-        sub_date = submission.sub_date
         logger.debug(f"Looking for {submission.title} by {submission.author_list}.")
-        search_res = self.search_engine.search_by_author(authors, min_pub_date=sub_date)
+        match, success = self.search_by_author(submission)
+        if not success:
+            match, success = self.search_by_title(submission, match)
+        return self.save(submission, match, success)
+
+    def search_by_author(self, submission: Submission, candidates: List[Paper] = None) -> Tuple[Paper, bool]:
+        """First step of the dual search: searches with the list of authors and matches the candidates by title.
+        The candidates are matched page by page as they are retrieved and the search stops at the first successful match.
+
+        Args:
+            submission (Submission): the submission.
+            candidates (List[Paper]): the candidates already retrieved by a batch search; if None, the authors are searched.
+
+        Returns:
+            (Paper): the best candidate, None if no candidate was found.
+            (bool): whether a good match was successfully found.
+        """
+        authors = submission.expanded_author_list
         match = None
-        if search_res:
-            match, success = match_by_title(search_res, authors, title)
-            match.strategy = 'search_by_author_match_by_title'
+        success = False
+        if candidates is None:
+            pages = self.search_engine.iter_search_by_author(authors, min_pub_date=submission.sub_date)
         else:
-            success = False
-        if not success:
-            search_res = self.search_engine.search_by_title(title, min_pub_date=sub_date)
-            if search_res:
-                match, success = match_by_author(search_res, authors, title)
-                match.strategy = 'search_by_title_match_by_author'
-            else:
-                success = False
-        result = Result(submission, match)
+            pages = [candidates] if candidates else []
+        for page in pages:
+            page_match, success = self.match('title', page, authors, submission.title, submission.author_ids)
+            if success or match is None or page_match.title_similarity_score > match.title_similarity_score:
+                match = page_match
+            if success:
+                break
+        if match is not None:
+            match.strategy = 'search_by_author_match_by_title'
+        return match, success
+
+    def search_by_title(self, submission: Submission, match: Paper = None, candidates: List[Paper] = None) -> Tuple[Paper, bool]:
+        """Second step of the dual search: searches with the title and matches the candidates by author.
+
+        Args:
+            submission (Submission): the submission.
+            match (Paper): the best candidate of the first step, kept if the title search retrieves nothing.
+            candidates (List[Paper]): the candidates already retrieved by a batch search; if None, the title is searched.
+
+        Returns:
+            (Paper): the best candidate, None if no candidate was found.
+            (bool): whether a good match was successfully found.
+        """
+        if candidates is None:
+            candidates = self.search_engine.search_by_title(submission.title, min_pub_date=submission.sub_date)
+        success = False
+        if candidates:
+            authors = submission.expanded_author_list
+            match, success = self.match('author', candidates, authors, submission.title, submission.author_ids)
+            match.strategy = 'search_by_title_match_by_author'
+        return match, success
+
+    def save(self, submission: Submission, match: Paper, success: bool) -> Tuple[Result, bool]:
+        """Completes the matching article of a successful match and saves the outcome to the checkpoint, if any.
+        The best candidate of an unsuccessful match is kept as retrieved, sparing a request for an article that is not exported as a match.
+        """
+        result = Result(submission, self.search_engine.complete(match) if success else match)
+        if self.checkpoint is not None:
+            self.checkpoint.write(result, success)
         return result, success
 
+    def match(self, strategy: str, candidates: List[Paper], authors: List[List[str]], title: str, submitting_ids: FrozenSet[int]) -> Tuple[Paper, bool]:
+        """Matches the candidates with the submission with match_by_title ('title') or match_by_author ('author'),
+        in a matching process if any, otherwise in the calling thread.
+
+        Returns:
+            (Paper): the best candidate.
+            (bool): whether the match is successful.
+        """
+        if self._matchers is None:
+            return MATCHERS[strategy](candidates, authors, title, submitting_ids=submitting_ids)
+        match, success, counts = self._matchers.submit(match_in_process, strategy, candidates, authors, title, submitting_ids).result()
+        add_tier_counts(counts)
+        return match, success
+
     def add_citations(self, results: List[Result]):
         """Retrieves citation data and updates in place result.article.
 
@@ -134,9 +434,15 @@ class Scanner:
             (List[Result]): the list of results to update with citation data.
         """
         logger.info(f"fetching {len(results)} scopus citations.")
-        for r in tqdm(results):
-            if r.article is not None:
-                r.article.citations = self.citation_engine.citedby_count(r.article.pmid)
+        articles = [r.article for r in results if r.article is not None]
+        try:
+            citation_counts = self.citation_engine.citedby_counts([a.pmid for a in articles])
+        except RateLimitExhausted as e:
+            logger.error(f"Scopus quota exhausted ({e}); results are exported and reported without citations.")
+            self.include_citations = False
+            return
+        for article in articles:
+            article.citations = citation_counts.get(article.pmid)
 
     def update_preprint_status(self, results: List[Result]):
         """If a preprint was retrieved, check its publication status and add in place the doi of the published paper.
@@ -145,11 +451,24 @@ class Scanner:
             results (List[Result]): list of results to update
         """
         logger.info("Updating publication status of preprints.")
-        for result in tqdm(results):
-            if result.article.is_preprint:
-                published_doi = self.biorxiv_service.preprint_publication_status(result.article.doi)
-                result.article.preprint_published_doi = published_doi
-                logger.debug(f"article '{result.article.doi}' is a preprint. Published doi: '{result.article.preprint_published_doi}'.")
+        preprints = [result.article for result in results if result.article.is_preprint]
+        lookup = self.biorxiv_service.preprint_publication_status
+        if config.preprint_index and self.cache_dir is not None and preprints:
+            # the preprints of the window are listed in bulk rather than looked up one by one
+            index = PreprintIndex(self.cache_dir, self.biorxiv_service)
+            pub_dates = [a.pub_date for a in preprints if re.fullmatch(r'\d{4}-\d{2}-\d{2}', a.pub_date or '')]
+            try:
+                index.update(min(pub_dates) if pub_dates else '2013-11-01')  # bioRxiv opened in November 2013
+                lookup = index.published_doi
+            except (requests.RequestException, RateLimitExhausted) as e:
+                logger.error(f"error ({e!r}) when indexing preprints in bulk, looking up preprints one by one instead.")
+        for article in tqdm(preprints):
+            try:
+                article.preprint_published_doi = lookup(article.doi)
+            except RateLimitExhausted as e:
+                logger.error(f"bioRxiv rate limit exhausted ({e}); the publication status of the remaining preprints is left unknown.")
+                break
+            logger.debug(f"article '{article.doi}' is a preprint. Published doi: '{article.preprint_published_doi}'.")
 
     def filter_preprints(self, results: List[Result]) -> List[Result]:
         """Loops through the results to keep preprints or not depending on the preprint_inclusion setting.
@@ -248,7 +567,18 @@ if __name__ == "__main__":
     parser.add_argument("dest", nargs="?", default="results", help="Basename of the result files, without extension.")
     parser.add_argument("-D", "--debug", action="store_true", help="Debug mode.")
     parser.add_argument("--use_pubmed", action="store_true", help="Use PubMed as search engine instead of EuropePMC, which is the default engine.")
+    parser.add_argument("--local_index", default=config.local_index, help="Path to a local index of PubMed baseline files (see src.offline) searched instead of the online engines.")
     parser.add_argument("--no_citations", action="store_true", help="Flag to prevent queries to citation data.")
+    parser.add_argument("--workers", type=int, default=config.workers, help="Number of submissions searched concurrently.")
+    parser.add_argument("--match_processes", type=int, default=config.match_processes, help="Number of processes matching candidates with submissions; 0 to match in the searching threads.")
+    parser.add_argument("--title_batch_size", type=int, default=config.title_batch_size, help="Number of submissions whose titles are searched together in a single query; 0 to search titles one by one.")
+    parser.add_argument("--cache_dir", default=config.cache_dir, help="Directory where the responses of the web services are cached.")
+    parser.add_argument("--no_cache", action="store_true", help="Flag to disable the cache of web service responses.")
+    parser.add_argument("--refresh_input", action="store_true", help="Flag to parse the report again instead of loading its saved snapshot.")
+    parser.add_argument("--incremental", action="store_true", help="Flag to search only new or modified submissions and reuse the results of previous scans.")
+    parser.add_argument("--resume", action="store_true", help="Flag to resume an interrupted scan from its checkpoint <RESULTS>/<dest>-checkpoint.jsonl.")
+    parser.add_argument("--shard", type=parse_shard, help="Scan only the shard i/N of the submissions, partitioned by manuscript number; combine the shards with src.merge.")
+    parser.add_argument("--state", help="Path to the database with the results of previous scans used in incremental mode; default: <RESULTS>/<dest>-state.sqlite.")
     args = parser.parse_args()
     debug = args.debug
     include_citations = config.include_citations and not args.no_citations
@@ -260,18 +590,38 @@ if __name__ == "__main__":
     report_path = args.report
     dest_basename = args.dest
     use_pubmed = args.use_pubmed
+    if args.shard:
+        dest_basename = f"{dest_basename}-shard-{args.shard[0]}-of-{args.shard[1]}"  # state and checkpoint are also kept per shard
+    cache_dir = args.cache_dir if not args.no_cache else None
+    if cache_dir:
+        Service.cache = ResponseCache(cache_dir)
+        logger.info(f"Responses of web services cached in {cache_dir}.")
     if report_path:
-        ejp_report = EJPReport(report_path)
+        ejp_report = EJPReport(report_path, refresh=args.refresh_input)
         logger.info(f"Analysis of {len(ejp_report)} submissions with settings: include_citations: {include_citations}, preprint_inclusion: {config.preprint_inclusion}.")
         logger.info(f"Results will be saved in {dest_basename}.")
         engine = PubMedEngine if use_pubmed else EuropePMCEngine
+        if args.local_index:
+            engine = partial(LocalEngine, index_path=args.local_index)
+            logger.info(f"Searching the local index {args.local_index}.")
+        state = None
+        if args.incremental:
+            state = ScanState(args.state or Path(RESULTS) / f"{dest_basename}-state.sqlite")
+        checkpoint = Checkpoint(Path(RESULTS) / f"{dest_basename}-checkpoint.jsonl", resume=args.resume)
         scanner = Scanner(
             ejp_report,
             dest_basename,
             engine,
             ScopusService,
             config.preprint_inclusion,
-            include_citations
+            include_citations,
+            workers=args.workers,
+            match_processes=args.match_processes,
+            title_batch_size=args.title_batch_size,
+            state=state,
+            checkpoint=checkpoint,
+            shard=args.shard,
+            cache_dir=cache_dir
         )
         scanner.run()
     else:
@@ -1,13 +1,29 @@
-from typing import List, Union
+import copy
+from typing import List, Set, Union, Tuple, Iterator
 from datetime import datetime
 
+import numpy as np
+
 from .models import PubMedArticle, EuropePMCArticle
-from .net import EuropePMCService, PubMedService
+from .net import EuropePMCService, PubMedService, LazyService
 from .utils import normalize
 from .config import PreprintInclusion, config
 from . import logger
 
 
+def word_overlaps(words: Set[str], candidate_words: List[Set[str]]) -> np.ndarray:
+    """Computes the overlap (Jaccard index) of a set of words with each of the candidate sets of words.
+
+    Args:
+        words (Set[str]): the reference words, usually the normalized words of a submitted title.
+        candidate_words (List[Set[str]]): the sets of words to compare with.
+
+    Returns:
+        (np.ndarray): the overlap with each candidate set, from 0.0 to 1.0.
+    """
+    return np.array([len(words & w) / len(words | w) if words | w else 0.0 for w in candidate_words], dtype=np.float32)
+
+
 class SearchEngine:
     """Abstract class for search eninge used to search published articles and preprints"""
 
@@ -37,7 +53,43 @@ class SearchEngine:
             article_list = self._search(query)
         return article_list
 
-    def search_by_title_query_builder(self, title: str, min_pub_date: str, max_pub_date: str) -> str:
+    def iter_search_by_author(self, author_list: List[List[str]], min_pub_date: str = '1970-01-01', max_pub_date: str = '3000-01-01') -> Iterator[List[Union[PubMedArticle, EuropePMCArticle]]]:
+        """Search using the expanded author list, yielding the results page by page so that the caller can stop
+        as soon as a good candidate is found. By default, the results of search_by_author() are the only page.
+
+        Args:
+            author_list (List[List[str]]): the expanded list of authors with for each name alternatives.
+            min_pub_date (int): the earliest publication date to consider in the search.
+            max_pub_date (int): the latest publication date to consider in the search.
+
+        Returns:
+            (Iterator[List[Union[PubMedArticle, EuropePMCArticle]]]): the pages of articles retrieved.
+        """
+        article_list = self.search_by_author(author_list, min_pub_date, max_pub_date)
+        if article_list:
+            yield article_list
+
+    def batch_search_by_author(
+        self,
+        author_lists: List[List[List[str]]],
+        min_pub_dates: List[str],
+        max_pub_date: str = '3000-01-01'
+    ) -> List[List[Union[PubMedArticle, EuropePMCArticle]]]:
+        """Searches the authors of several submissions at once, for engines whose requests are cheaper in bulk.
+        By default, nothing is retrieved in bulk and each submission gets None: its authors have to be searched
+        on their own with iter_search_by_author().
+
+        Args:
+            author_lists (List[List[List[str]]]): the expanded list of authors of each submission.
+            min_pub_dates (List[str]): the earliest publication date to consider for each submission.
+            max_pub_date (str): the latest publication date to consider in the search.
+
+        Returns:
+            (List[List[Union[PubMedArticle, EuropePMCArticle]]]): for each submission, the list of articles retrieved or None.
+        """
+        return [None for _ in author_lists]
+
+    def search_by_title_query_builder(self, title: str, min_pub_date: str, max_pub_date: str, phrase: bool = False) -> str:
         raise NotImplementedError
 
     def search_by_title(self, title: str, min_pub_date: str = '1970-01-01', max_pub_date: str = '3000-01-01') -> List[Union[PubMedArticle, EuropePMCArticle]]:
@@ -58,6 +110,59 @@ class SearchEngine:
             article_list = self._search(query)
         return article_list
 
+    def batch_search_by_title(
+        self,
+        titles: List[str],
+        min_pub_dates: List[str],
+        max_pub_date: str = '3000-01-01',
+        limit: int = 5,
+        overlap_threshold: float = 0.85
+    ) -> List[List[Union[PubMedArticle, EuropePMCArticle]]]:
+        """Searches the titles of several submissions with a single query ORing the title phrase queries of each submission.
+        The articles retrieved are demultiplexed by word overlap: each title gets the limit articles sharing the largest
+        fraction of their words with it (Jaccard index), among those above config.batch_min_overlap. The titles are only
+        compared with word vectors when candidates are matched. When the search engine could not return all the results
+        of the query, a title without any article overlapping enough might have missed its match and gets None instead:
+        it has to be searched on its own with search_by_title().
+
+        Args:
+            titles (List[str]): the titles of the submissions.
+            min_pub_dates (List[str]): the earliest publication date to consider for each submission.
+            max_pub_date (str): the latest publication date to consider in the search.
+            limit (int): the maximum number of articles per title, as in search_by_title().
+            overlap_threshold (float): the word overlap with a retrieved title deemed sufficient for a title to have found its match.
+
+        Returns:
+            (List[List[Union[PubMedArticle, EuropePMCArticle]]]): for each title, the list of articles retrieved or None.
+        """
+        queries = [
+            f"({self.search_by_title_query_builder(title, min_pub_date, max_pub_date, phrase=True)})"
+            for title, min_pub_date in zip(titles, min_pub_dates) if title
+        ]
+        if not queries:
+            return [[] for _ in titles]
+        query = self._preprint_inclusion_decoration(f"({' OR '.join(queries)})")
+        articles, complete = self._batch_search(query)
+        logger.debug(f"batch of {len(queries)} titles: {len(articles)} articles retrieved{'' if complete else ' (incomplete)'}.")
+        retrieved_words = [set(normalize(a.title).split()) for a in articles]
+        article_lists = []
+        for title in titles:
+            article_list = []
+            if title and articles:
+                scores = word_overlaps(set(normalize(title).split()), retrieved_words)
+                best = np.argsort(-scores, kind='stable')[:limit]
+                article_list = [copy.copy(articles[i]) for i in best if scores[i] > config.batch_min_overlap]  # copies since matching sets scores on articles
+                if not complete and scores[best[0]] < overlap_threshold:
+                    article_list = None
+            elif title and not complete:
+                article_list = None
+            article_lists.append(article_list)
+        return article_lists
+
+    def _batch_search(self, query: str) -> Tuple[List[Union[PubMedArticle, EuropePMCArticle]], bool]:
+        """Retrieves the results of a batch query and whether all of them could be retrieved."""
+        raise NotImplementedError
+
     def _preprint_inclusion_decoration(self, query: str):
         raise NotImplementedError
 
@@ -66,14 +171,65 @@ class SearchEngine:
         articles = self.search_service.search(query)
         return articles
 
+    def complete(self, article: Union[PubMedArticle, EuropePMCArticle]) -> Union[PubMedArticle, EuropePMCArticle]:
+        """Completes the metadata of a matching article retrieved with partial records; articles are complete by default.
+
+        Args:
+            article (Union[PubMedArticle, EuropePMCArticle]): the matching article.
+
+        Returns:
+            (Union[PubMedArticle, EuropePMCArticle]): the article with complete metadata.
+        """
+        return article
+
 
 class EuropePMCEngine(SearchEngine):
     """The EuropePMC search engine used to search published articles and preprints.
+    With a two-phase search, candidates are retrieved as lite records, with ids, title and authors only,
+    and the core record, with journal, abstract and publication types, is fetched for the matching article only (see complete()).
 
     Args:
         preprint_inclusion (PreprintInclusion): level of inclusion of preprints.
+        two_phase (bool): whether to screen candidates with lite records.
     """
-    search_service = EuropePMCService()
+    search_service = LazyService(EuropePMCService)
+
+    def __init__(self, preprint_inclusion: PreprintInclusion = PreprintInclusion.NO_PREPRINT, two_phase: bool = config.two_phase_search):
+        super().__init__(preprint_inclusion=preprint_inclusion)
+        self.result_type = 'lite' if two_phase else 'core'
+
+    def _search(self, query: str) -> List[EuropePMCArticle]:
+        logger.debug(f"query: '{query}'")
+        articles = self.search_service.search(query, result_type=self.result_type)
+        return articles
+
+    def iter_search_by_author(self, author_list: List[List[str]], min_pub_date: str = '1970-01-01', max_pub_date: str = '3000-01-01') -> Iterator[List[EuropePMCArticle]]:
+        # the first page is as small as with search_by_author(); deeper pages, needed for prolific authors, are larger
+        if author_list:
+            query = self.search_by_author_query_builder(author_list, min_pub_date, max_pub_date)
+            query = self._preprint_inclusion_decoration(query)
+            logger.debug(f"query: '{query}'")
+            page_sizes = [5] + [config.author_page_size] * (config.author_max_pages - 1)
+            for page, _ in self.search_service.iter_pages(query, page_sizes, result_type=self.result_type):
+                if page:
+                    yield page
+
+    def _batch_search(self, query: str) -> Tuple[List[EuropePMCArticle], bool]:
+        logger.debug(f"batch query: '{query}'")
+        return self.search_service.search_pages(query, page_size=config.batch_page_size, max_pages=config.batch_max_pages, result_type=self.result_type)
+
+    def complete(self, article: EuropePMCArticle) -> EuropePMCArticle:
+        if article is None or article.result_type == 'core':
+            return article
+        core = self.search_service.fetch(article.source, article.epmc_id)
+        if core is None:
+            logger.warning(f"core record of {article.source}:{article.epmc_id} not found, keeping the lite record.")
+            return article
+        # the outcome of the matching was recorded on the lite record
+        core.strategy = article.strategy
+        core.author_overlap_score = article.author_overlap_score
+        core.title_similarity_score = article.title_similarity_score
+        return core
 
     def search_by_author_query_builder(self, author_list: List[List[str]], min_pub_date: str, max_pub_date: str) -> str:
         # consider alternatives of same name and use OR construct
@@ -85,9 +241,11 @@ class EuropePMCEngine(SearchEngine):
         query = f"{and_names} AND FIRST_PDATE:[{min_pub_date} TO {max_pub_date}]"
         return query
 
-    def search_by_title_query_builder(self, title, min_pub_date, max_pub_date) -> str:
+    def search_by_title_query_builder(self, title, min_pub_date, max_pub_date, phrase: bool = False) -> str:
         # total recall on positives is best with unquoted title, do_not_remove='+', do=['ctrl', 'punctuation', 'html_tags', 'html_unescape']
+        # titles ORed in a batch are quoted, since their words would otherwise match almost any article
         title = normalize(title, do_not_remove='+', do=['ctrl', 'punctuation', 'html_tags', 'html_unescape'])
+        title = f'"{title}"' if phrase else title
         query = f'TITLE:{title} AND FIRST_PDATE:[{min_pub_date} TO {max_pub_date}]'
         return query
 
@@ -101,11 +259,13 @@ class EuropePMCEngine(SearchEngine):
 
 class PubMedEngine(SearchEngine):
     """The PubMed search engine used to search published articles and preprints.
+    In batches, the PMIDs found by the queries of many submissions are fetched together (see PubMedService.search_many()),
+    which halves the number of requests compared to searching the submissions one by one.
 
     Args:
         preprint_inclusion (PreprintInclusion): level of inclusion of preprints.
     """
-    search_service = PubMedService()
+    search_service = LazyService(PubMedService)
 
     def date_convert(self, yyyy_mm_dd: str) -> str:
         YYYY_MM_DD = datetime.strptime(yyyy_mm_dd, '%Y-%m-%d').strftime('%Y/%m/%d')
@@ -123,14 +283,37 @@ class PubMedEngine(SearchEngine):
         query = f"{and_names} AND {min_pub_date}:{max_pub_date}[PDAT]"
         return query
 
-    def search_by_title_query_builder(self, title, min_pub_date, max_pub_date) -> str:
+    def search_by_title_query_builder(self, title, min_pub_date, max_pub_date, phrase: bool = False) -> str:
         # total recall on positives is best with unquoted title, do_not_remove='+', do=['ctrl', 'punctuation', 'html_tags', 'html_unescape']
+        # titles ORed in a batch are quoted, since their words would otherwise match almost any article
         min_pub_date = self.date_convert(min_pub_date)
         max_pub_date = self.date_convert(max_pub_date)
         title = normalize(title, do_not_remove='+', do=['ctrl', 'punctuation', 'html_tags', 'html_unescape'])
+        title = f'"{title}"' if phrase else title
         query = f'{title}[TI] AND {min_pub_date}:{max_pub_date}[PDAT]'
         return query
 
+    def batch_search_by_author(
+        self,
+        author_lists: List[List[List[str]]],
+        min_pub_dates: List[str],
+        max_pub_date: str = '3000-01-01'
+    ) -> List[List[PubMedArticle]]:
+        queries = [
+            self._preprint_inclusion_decoration(self.search_by_author_query_builder(author_list, min_pub_date, max_pub_date)) if author_list else None
+            for author_list, min_pub_date in zip(author_lists, min_pub_dates)
+        ]
+        article_lists = iter(self.search_service.search_many([q for q in queries if q is not None]))
+        return [next(article_lists) if q is not None else [] for q in queries]
+
+    def _batch_search(self, query: str) -> Tuple[List[PubMedArticle], bool]:
+        logger.debug(f"batch query: '{query}'")
+        pmids, count = self.search_service.esearch(query, config.batch_page_size * config.batch_max_pages)
+        if count is None:
+            return [], False
+        articles = self.search_service.efetch(pmids)
+        return [articles[pmid] for pmid in pmids if pmid in articles], count <= len(pmids)
+
     def _preprint_inclusion_decoration(self, query: str):
         if self.preprint_inclusion == PreprintInclusion.NO_PREPRINT:
             query += ' NOT preprint[PT]'
@@ -0,0 +1,99 @@
+import json
+import sqlite3
+import hashlib
+from time import time
+from pathlib import Path
+from typing import List, Tuple
+
+from .models import Submission, Result
+from . import logger
+
+"""Persistent state of successive scans of the same journal, used for incremental scans."""
+
+
+class ScanState:
+    """Keeps the outcome of the search of every manuscript scanned so far in a SQLite database.
+    Each manuscript is keyed by its manuscript number and recorded with a fingerprint of its title, authors and decision,
+    the serialized Result, whether a match was found and when it was last searched.
+
+    Args:
+        path (str): the path to the database file.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manuscripts ("
+            "manuscript_nm TEXT PRIMARY KEY, fingerprint TEXT, found INTEGER, searched REAL, result TEXT)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def fingerprint(submission: Submission) -> str:
+        """Hashes the features of a submission that change the outcome of a search.
+
+        Args:
+            submission (Submission): the submission.
+
+        Returns:
+            (str): the hex digest of the title, the authors and the decision.
+        """
+        features = [submission.title, sorted(submission.author_list), submission.journal_decision]
+        return hashlib.sha1(json.dumps(features).encode('utf-8')).hexdigest()
+
+    def plan(self, submissions: List[Submission], retry_after: float) -> Tuple[List[Submission], List[Tuple[Result, bool]]]:
+        """Splits submissions into those that need to be searched and those whose previous outcome can be reused.
+        A submission is searched if it is new, if its title, authors or decision changed,
+        or if it was not found and was last searched more than retry_after days ago.
+
+        Args:
+            submissions (List[Submission]): the submissions of the current report.
+            retry_after (float): the number of days after which manuscripts that were not found are searched again.
+
+        Returns:
+            (List[Submission]): the submissions to search.
+            (List[Tuple[Result, bool]]): the previous results to reuse and whether they were a successful match.
+        """
+        to_search = []
+        reused = []
+        now = time()
+        for submission in submissions:
+            row = self._conn.execute(
+                "SELECT fingerprint, found, searched, result FROM manuscripts WHERE manuscript_nm = ?",
+                (submission.manuscript_nm,)
+            ).fetchone()
+            if row is None:
+                to_search.append(submission)
+                continue
+            fingerprint, found, searched, result = row
+            expired = not found and (now - searched) > retry_after * 24 * 3600
+            if fingerprint != self.fingerprint(submission) or expired:
+                to_search.append(submission)
+            else:
+                previous = Result.from_dict(json.loads(result))
+                previous.submission = submission  # editorial fields other than those in the fingerprint may have been updated
+                reused.append((previous, bool(found)))
+        logger.info(f"incremental scan: {len(to_search)} submissions to search, {len(reused)} reused from {self.path}.")
+        return to_search, reused
+
+    def update(self, found: List[Result], not_found: List[Result]):
+        """Records the outcome of the search of submissions.
+
+        Args:
+            found (List[Result]): the results of successful matches.
+            not_found (List[Result]): the results of unsuccessful searches.
+        """
+        now = time()
+        rows = [
+            (r.submission.manuscript_nm, self.fingerprint(r.submission), int(success), now, json.dumps(r.to_dict(), default=str))
+            for results, success in [(found, True), (not_found, False)]
+            for r in results
+        ]
+        self._conn.executemany("INSERT OR REPLACE INTO manuscripts VALUES (?, ?, ?, ?, ?)", rows)
+        self._conn.commit()
+        logger.info(f"recorded {len(rows)} search outcomes in {self.path}.")
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM manuscripts").fetchone()[0]
@@ -1,8 +1,11 @@
 import string
 import re
+import sys
 import html
 import unicodedata
-from typing import List, Set
+from typing import List, Set, Dict, Tuple, FrozenSet, Iterable
+from threading import Lock
+from functools import lru_cache
 from dateutil import parser
 
 from bs4 import BeautifulSoup
@@ -10,6 +13,14 @@ from bs4 import BeautifulSoup
 from .config import config
 
 
+# inline tags commonly found in titles that can be stripped without parsing; anything else goes through BeautifulSoup
+SIMPLE_TAG = re.compile(r"</?(?:i|b|u|em|strong|sup|sub|sc|span|small|p)>", re.IGNORECASE)
+# the html parser rewrites whitespace control characters and collapses text made only of spaces,
+# strings including them are always parsed
+ASCII_CONTROL = re.compile(r"[\x00-\x1f]")
+RUNS_OF_SPACES = re.compile(r" +")
+
+
 def normalize(
     s: str,
     do_not_remove: str = '',
@@ -19,21 +30,22 @@ def normalize(
     ]
 ) -> str:
     """Normalizes a string, setting to remove control characters, set to lower case, removing special characters, punctuations and html tags.
+    Results are cached since the same titles and names are normalized many times during a scan.
 
     Args:
         s (str): the string to normalize.
         do_not_remove (List[str]): a list of single characters that should NOT be removed when punctuation is removed. Useful to keep hyphens or apostrophies
         do (List[str]): the list of cleanup steps to do from 'ctrl', 'strip', 'lower', 'html_unescape', 'html_tags', 'punctuation', 'unicode'
     """
-    def remove_control_characters(s: str, excluded: List[str] = ["Cc", "Cf"]) -> str:
-        # https://stackoverflow.com/questions/4324790/removing-control-characters-from-a-string-in-python
-        clean = "".join([ch for ch in s if unicodedata.category(ch) not in excluded])
-        return clean
+    return _normalize(s, do_not_remove, tuple(do))
 
+
+@lru_cache(maxsize=100_000)
+def _normalize(s: str, do_not_remove: str, do: Tuple[str]) -> str:
     # https://towardsdatascience.com/nlp-building-text-cleanup-and-preprocessing-pipeline-eba4095245a0
     # remove control characters
     if 'ctrl' in do:
-        s = remove_control_characters(s)
+        s = s.translate(_control_characters())
     # strip white space
     if 'strip' in do:
         s = s.strip()
@@ -45,20 +57,54 @@ def normalize(
         s = html.unescape(s)
     # remove html tags, <i> or <sup> are not rare in titles
     if 'html_tags' in do:
-        s = BeautifulSoup(s, 'html.parser').get_text()
+        s = _remove_html_tags(s)
     # remove punctuation
     if 'punctuation' in do:
-        punctuation = string.punctuation
-        for c in do_not_remove:
-            punctuation = punctuation.replace(c, ' ')
-        s = re.sub(f"[{punctuation}]", " ", s)
-        s = re.sub(r" +", " ", s)  # remove runs of spaces if any
+        table = _punctuation_table(do_not_remove)
+        if table is not None:
+            s = s.translate(table)
+        else:
+            s = re.sub(_punctuation_pattern(do_not_remove), " ", s)
+        s = RUNS_OF_SPACES.sub(" ", s)  # remove runs of spaces if any
     # remove accents, non breaking spaces, en-dash, em-dash, minus, special characters,
     if 'unicode' in do:
         s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('utf-8', 'ignore')
     return s
 
 
+@lru_cache(maxsize=1)
+def _control_characters(excluded: Tuple[str] = ("Cc", "Cf")) -> Dict[int, None]:
+    # translation table deleting all the control and format characters
+    # https://stackoverflow.com/questions/4324790/removing-control-characters-from-a-string-in-python
+    return {cp: None for cp in range(sys.maxunicode + 1) if unicodedata.category(chr(cp)) in excluded}
+
+
+def _remove_html_tags(s: str) -> str:
+    if '&' not in s and ASCII_CONTROL.search(s) is None:
+        texts = SIMPLE_TAG.split(s)
+        if s.count('<') == len(texts) - 1 and not any([len(t) > 1 and not t.strip(' ') for t in texts]):
+            return ''.join(texts)
+    return BeautifulSoup(s, 'html.parser').get_text()
+
+
+def _punctuation_pattern(do_not_remove: str) -> str:
+    punctuation = string.punctuation
+    for c in do_not_remove:
+        punctuation = punctuation.replace(c, ' ')
+    return f"[{punctuation}]"
+
+
+@lru_cache(maxsize=None)
+def _punctuation_table(do_not_remove: str) -> Dict[int, str]:
+    # translation table replacing with a space every character matched by the punctuation pattern.
+    # Only ASCII characters can be matched by the pattern, unless a backslash is kept
+    # which breaks the character class, in which case the regex is used.
+    if '\\' in do_not_remove:
+        return None
+    pattern = re.compile(_punctuation_pattern(do_not_remove))
+    return {cp: ' ' for cp in range(128) if pattern.fullmatch(chr(cp))}
+
+
 def last_name(name: str) -> str:
     """Extracts the last name from a <first names last name> string. Includes particles such as von, del, saint, mac, ...
 
@@ -131,6 +177,50 @@ def flat_unique_set(x: List[List[str]]) -> Set[str]:
     return set(flattened)
 
 
+class NameVocabulary:
+    """A vocabulary interning normalized author names into integer ids so that author lists can be compared
+    with cheap integer set intersections. Ids are only meaningful within the process that assigned them.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self._lock = Lock()
+
+    def intern(self, names: Iterable[str]) -> FrozenSet[int]:
+        """Maps names to their ids, assigning new ids to names never seen before.
+
+        Args:
+            names (Iterable[str]): the names.
+
+        Returns:
+            (FrozenSet[int]): the set of ids.
+        """
+        names = list(names)
+        if any([name not in self.ids for name in names]):
+            with self._lock:
+                for name in names:
+                    self.ids.setdefault(name, len(self.ids))
+        return frozenset([self.ids[name] for name in names])
+
+    def __len__(self):
+        return len(self.ids)
+
+
+author_vocabulary = NameVocabulary()
+
+
+def author_ids(expanded_author_list: List[List[str]]) -> FrozenSet[int]:
+    """Interns all the alternatives of an expanded author list into the global author vocabulary.
+
+    Args:
+        expanded_author_list (List[List[str]]): the list of alternatives for each author (see process_authors).
+
+    Returns:
+        (FrozenSet[int]): the set of unique name ids, equivalent to flat_unique_set() with integers.
+    """
+    return author_vocabulary.intern(flat_unique_set(expanded_author_list))
+
+
 def normalize_date(date: str, dayfirst=config.dayfirst) -> str:
     """Normalizes dates to ISO yyyy-mm-dd format"""
     d = parser.parse(date, dayfirst=dayfirst)
@@ -0,0 +1,102 @@
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.aionet import AsyncEuropePMCService, AsyncPubMedService, AsyncBioRxivService, AsyncScopusService
+
+EUROPEPMC = b"""<?xml version='1.0' encoding='UTF-8'?>
+<responseWrapper><hitCount>1</hitCount><nextCursorMark>AoE</nextCursorMark><resultList>
+<result><id>1</id><source>MED</source><pmid>1</pmid><doi>10.1/a</doi><title>First title</title>
+<authorString>Lemberger T.</authorString><pubType>research-article; journal article</pubType>
+<firstPublicationDate>2020-01-02</firstPublicationDate></result>
+</resultList></responseWrapper>"""
+
+
+class TestAsyncServices(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.calls = []
+        app = web.Application()
+        app.router.add_post('/europepmc', self.europepmc)
+        app.router.add_post('/scopus', self.scopus)
+        app.router.add_post('/esearch', self.esearch)
+        app.router.add_post('/efetch', self.efetch)
+        app.router.add_get('/details/{server}/{doi:.*}', self.biorxiv)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def europepmc(self, request):
+        form = await request.post()
+        self.calls.append(form['query'])
+        if len(self.calls) == 1:
+            return web.Response(status=502)  # transient failure, not retried for a POST
+        if len(self.calls) == 2:
+            return web.Response(status=429, headers={'Retry-After': '0'})  # throttled, sent again
+        return web.Response(body=EUROPEPMC, content_type='application/xml')
+
+    async def biorxiv(self, request):
+        self.calls.append(request.match_info['doi'])
+        if len(self.calls) == 1:
+            return web.Response(status=502)  # transient failure, retried for a GET
+        if len(self.calls) == 2:
+            return web.Response(status=429, headers={'Retry-After': '0'})
+        return web.json_response({'messages': [{'status': 'ok'}], 'collection': [{'published': '10.1/journal'}]})
+
+    async def scopus(self, request):
+        form = await request.post()
+        self.calls.append(form['query'])
+        entries = [{'pubmed-id': pmid, 'citedby-count': '3'} for pmid in ['1', '2'] if f"PMID({pmid})" in form['query']]
+        return web.json_response({'search-results': {'opensearch:totalResults': str(len(entries)), 'entry': entries}})
+
+    async def esearch(self, request):
+        form = await request.post()
+        self.calls.append(form['term'])
+        return web.Response(body=b"<eSearchResult><Count>2</Count><IdList><Id>2</Id><Id>1</Id></IdList></eSearchResult>", content_type='application/xml')
+
+    async def efetch(self, request):
+        form = await request.post()
+        self.calls.append(form['id'])
+        records = ''.join(
+            f"<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article><ArticleTitle>title {pmid}</ArticleTitle></Article></MedlineCitation></PubmedArticle>"
+            for pmid in form['id'].split(',')
+        )
+        return web.Response(body=f"<PubmedArticleSet>{records}</PubmedArticleSet>".encode(), content_type='application/xml')
+
+    def service(self, cls, path):
+        class Service(cls):
+            REST_URL = str(self.server.make_url(path))
+            BACKOFF_FACTOR = 0
+            rate_limiter = None
+        return Service()
+
+    async def test_retries(self):
+        async with self.service(AsyncBioRxivService, '/details') as service:
+            published_doi = await service.preprint_publication_status('10.1101/x')
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(published_doi, '10.1/journal')
+
+    async def test_post_not_retried(self):
+        async with self.service(AsyncEuropePMCService, '/europepmc') as service:
+            self.assertEqual(await service.search('lemberger'), [])
+            self.assertEqual(len(self.calls), 1)
+            articles = await service.search('lemberger')
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual([a.title for a in articles], ['First title'])
+
+    async def test_concurrent_batches(self):
+        async with self.service(AsyncScopusService, '/scopus') as service:
+            counts = await service.citedby_counts(['1', '2', '3'], batch_size=1)
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(counts, {'1': 3, '2': 3})
+
+    async def test_pubmed_search(self):
+        service = self.service(AsyncPubMedService, '/')
+        service.REST_URL_ESEARCH, service.REST_URL_EFETCH = str(self.server.make_url('/esearch')), str(self.server.make_url('/efetch'))
+        async with service:
+            articles = await service.search('lemberger[AU]')
+        self.assertEqual(self.calls, ['lemberger[AU]', '1,2'])  # both sent as forms
+        self.assertEqual([a.pmid for a in articles], ['2', '1'])
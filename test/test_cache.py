@@ -0,0 +1,93 @@
+import unittest
+from itertools import count
+from unittest.mock import patch
+from tempfile import TemporaryDirectory
+
+import requests
+
+from src.cache import ResponseCache
+from src.net import Service
+
+
+def response(content: bytes, status_code: int = 200, url: str = 'https://example.org/search') -> requests.Response:
+    r = requests.Response()
+    r.status_code = status_code
+    r.url = url
+    r.headers['Content-Type'] = 'text/xml; charset=utf-8'
+    r._content = content
+    return r
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.clock = count(1000)
+        self.time = patch('src.cache.time', side_effect=lambda: next(self.clock))
+        self.time.start()
+
+    def tearDown(self):
+        self.time.stop()
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        cache = ResponseCache(self.tmp.name)
+        key = ResponseCache.key('GET', 'https://example.org/search', {'query': 'x'})
+        self.assertIsNone(cache.get(key, ttl=3600))
+        cache.set(key, 'Service', response(b'<result/>'))
+        cached = ResponseCache(self.tmp.name).get(key, ttl=3600)  # reopened from disk
+        self.assertEqual((cached.status_code, cached.content, cached.url), (200, b'<result/>', 'https://example.org/search'))
+        self.assertEqual(cached.headers['content-type'], 'text/xml; charset=utf-8')
+        self.assertEqual(cached.encoding, 'utf-8')
+
+    def test_ttl(self):
+        cache = ResponseCache(self.tmp.name)
+        cache.set('key', 'Service', response(b'old'))
+        self.assertIsNotNone(cache.get('key', ttl=100))
+        self.clock = count(2000)
+        self.assertIsNone(cache.get('key', ttl=100))
+        self.assertIsNotNone(cache.get('key', ttl=10000))
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(self.tmp.name, max_size=30)
+        for key in 'abc':
+            cache.set(key, 'Service', response(b'0123456789'))
+        cache.get('a', ttl=3600)  # b is now the least recently used
+        cache.set('d', 'Service', response(b'0123456789'))
+        self.assertLessEqual(cache.size, 27)
+        self.assertEqual([k for k in 'abcd' if cache.get(k, ttl=3600) is not None], ['a', 'd'])
+
+    def test_key(self):
+        key = ResponseCache.key('get', 'https://example.org/search', {'query': 'x', 'apiKey': 'secret'})
+        self.assertEqual(key, ResponseCache.key('GET', 'https://example.org/search', {'query': 'x', 'apiKey': 'other'}))
+        self.assertEqual(key, ResponseCache.key('GET', 'https://example.org/search', {'query': 'x'}))
+        self.assertNotEqual(key, ResponseCache.key('GET', 'https://example.org/search', {'query': 'y'}))
+        self.assertNotEqual(key, ResponseCache.key('POST', 'https://example.org/search', {'query': 'x'}))
+
+
+class TestServiceCache(unittest.TestCase):
+
+    class Session:
+
+        def __init__(self, responses):
+            self.responses = list(responses)
+            self.requests = 0
+
+        def request(self, method, url, **kwargs):
+            self.requests += 1
+            return self.responses.pop(0)
+
+    def test_only_successful_responses(self):
+        with TemporaryDirectory() as tmp:
+            service = Service()
+            service.cache = ResponseCache(tmp)
+            service.retry_request = self.Session([response(b'error', 503), response(b'ok'), response(b'not used')])
+            self.assertEqual(service._request('GET', 'https://example.org/search', params={'q': 'x'}).status_code, 503)
+            self.assertEqual(service._request('GET', 'https://example.org/search', params={'q': 'x'}).content, b'ok')
+            self.assertEqual(service._request('GET', 'https://example.org/search', params={'q': 'x'}).content, b'ok')
+            self.assertEqual(service.retry_request.requests, 2)  # the error was not cached, the success was
+            self.assertEqual(service.cache.hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from tempfile import TemporaryDirectory
+
+from src.models import Submission, EuropePMCArticle, Result
+from src.checkpoint import Checkpoint
+from src.scan import Scanner, shard_of
+from src.merge import find_shards, merge_shards
+from src.search import EuropePMCEngine
+from src.net import ScopusService
+from src.config import PreprintInclusion
+from src.utils import process_authors, author_ids
+
+from test_match import VectorsModelTestCase
+
+
+def paper(cls, title, name, **kwargs):
+    authors = process_authors([name])
+    return cls(title=title, author_list=[name], expanded_author_list=authors, author_ids=author_ids(authors), **kwargs)
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def test_resume_after_interruption(self):
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'checkpoint.jsonl'
+            checkpoint = Checkpoint(path)
+            submission = Submission(title='A title', author_list=['Doe'], expanded_author_list=[['doe']], manuscript_nm='EMBOJ-1')
+            article = EuropePMCArticle(title='A title', author_list=['Doe'], expanded_author_list=[['doe']], doi='10.1/x')
+            checkpoint.write(Result(submission, article), True)
+            checkpoint.write(Result(Submission(title='Other', manuscript_nm='EMBOJ-2')), False)
+            checkpoint._file.write('{"result": {"submiss')  # interrupted write
+            checkpoint.close()
+            resumed = Checkpoint(path, resume=True)
+            self.assertEqual(len(resumed), 2)
+            result, found = resumed.completed['EMBOJ-1']
+            self.assertTrue(found)
+            self.assertEqual(result.article.doi, '10.1/x')
+            self.assertFalse(resumed.completed['EMBOJ-2'][1])
+            resumed.write(Result(Submission(title='Third', manuscript_nm='EMBOJ-3')), False)
+            resumed.close()
+            resumed = Checkpoint(path, resume=True)
+            self.assertEqual(len(resumed), 3)
+            resumed.close(remove=True)
+            self.assertFalse(path.exists())
+
+
+class TestBatchedCheckpoint(VectorsModelTestCase):
+
+    class Engine(EuropePMCEngine):
+
+        def __init__(self, preprint_inclusion=None):
+            super().__init__(two_phase=False)
+
+        def batch_search_by_author(self, author_lists, min_pub_dates, max_pub_date='3000-01-01'):
+            return [[paper(EuropePMCArticle, 'Kinases regulate mitosis', 'Doe')] for _ in author_lists]
+
+        def batch_search_by_title(self, titles, min_pub_dates, max_pub_date='3000-01-01'):
+            if titles == ['ribosome structure']:
+                raise KeyboardInterrupt  # the scan is interrupted while searching the second batch of titles
+            return [[paper(EuropePMCArticle, title, 'Roe')] for title in titles]
+
+    def test_saved_as_found(self):
+        submissions = [
+            paper(Submission, 'Kinases regulate mitosis', 'Doe', manuscript_nm='EMBOJ-1'),  # matched by author
+            paper(Submission, 'mitotic control', 'Roe', manuscript_nm='EMBOJ-2'),  # matched by title in the first batch
+            paper(Submission, 'ribosome structure', 'Roe', manuscript_nm='EMBOJ-3'),
+        ]
+        with TemporaryDirectory() as tmp:
+            scanner = Scanner(None, 'test', self.Engine, ScopusService, None, False, title_batch_size=1, checkpoint=Checkpoint(Path(tmp) / 'checkpoint.jsonl'))
+            with self.assertRaises(KeyboardInterrupt):
+                scanner.retrieve(submissions)
+            scanner.checkpoint.close()
+            completed = Checkpoint.read(scanner.checkpoint.path)
+        self.assertEqual({nm: found for nm, (_, found) in completed.items()}, {'EMBOJ-1': True, 'EMBOJ-2': True})
+        self.assertEqual(completed['EMBOJ-2'][0].article.strategy, 'search_by_title_match_by_author')
+
+
+class TestShards(unittest.TestCase):
+
+    def test_partition(self):
+        manuscripts = [f"EMBOJ-2021-{i:05d}" for i in range(1000)]
+        shards = [shard_of(nm, 4) for nm in manuscripts]
+        self.assertEqual(shards, [shard_of(nm, 4) for nm in manuscripts])
+        self.assertEqual(set(shards), {1, 2, 3, 4})
+        self.assertTrue(all(200 < shards.count(i) < 300 for i in range(1, 5)))
+
+    def test_find_shards(self):
+        with TemporaryDirectory() as tmp:
+            for name in ['scan-shard-2-of-3.jsonl', 'scan-shard-1-of-3.jsonl', 'scan-shard-1-of-3-checkpoint.jsonl', 'other-shard-3-of-3.jsonl']:
+                (Path(tmp) / name).touch()
+            with self.assertRaises(ValueError):
+                find_shards('scan', tmp)
+            paths = find_shards('scan', tmp, partial=True)
+            self.assertEqual([p.name for p in paths], ['scan-shard-1-of-3.jsonl', 'scan-shard-2-of-3.jsonl'])
+
+    def test_merge_in_report_order(self):
+
+        class Report:
+            articles = [Submission(title=f'Title {i}', manuscript_nm=f'EMBOJ-{i}') for i in range(1, 5)]
+
+        with TemporaryDirectory() as tmp, patch('src.scan.RESULTS', tmp):
+            for index, (found, not_found) in enumerate([([3], [1]), ([4, 2], [])], 1):
+                scanner = Scanner(Report(), f'scan-shard-{index}-of-2', EuropePMCEngine, ScopusService, PreprintInclusion.WITH_PREPRINT, False, shard=(index, 2))
+                scanner.save_shard(
+                    [Result(Report.articles[i - 1], EuropePMCArticle(title=f'Title {i}')) for i in found],
+                    [Result(Report.articles[i - 1]) for i in not_found]
+                )
+            found, not_found, settings = merge_shards(find_shards('scan', tmp))
+        self.assertEqual([r.submission.manuscript_nm for r in found], ['EMBOJ-2', 'EMBOJ-3', 'EMBOJ-4'])
+        self.assertEqual([r.submission.manuscript_nm for r in not_found], ['EMBOJ-1'])
+        self.assertEqual(settings, {'preprint_inclusion': 'with_preprint', 'include_citations': False})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import re
+import shutil
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from tempfile import TemporaryDirectory
+
+import pandas as pd
+
+from src.ejp import EJPReport
+from src.models import Submission
+from src.decision import decision_matching_regex
+from src.descriptions import ejp_query_tool_matchpub_report
+
+
+# the header of the decision column of the test report is 'decision'
+HEADER_SIGNATURE = [r"decision" if h == r"journal_decision" else h for h in ejp_query_tool_matchpub_report['header_signature']]
+
+
+class ReportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'test-data.xls'
+        shutil.copy(Path(__file__).parent.parent / 'data' / 'test-data.xls', self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def report(self, **kwargs):
+        return EJPReport(self.path, header_signature=HEADER_SIGNATURE, **kwargs)
+
+
+class TestNormalize(ReportTestCase):
+
+    def test_same_as_rows(self):
+        report = self.report(refresh=True)
+        rows = report._select(pd.read_excel(self.path, header=None))
+        expected = [Submission(row=row) for _, row in rows.iterrows()]
+        self.assertEqual(len(report.articles), len(expected))
+        for article, submission in zip(report.articles, expected):
+            # the order of the authors was not preserved row by row
+            self.assertEqual(sorted(article.author_list), sorted(submission.author_list))
+            self.assertEqual(sorted(article.expanded_author_list), sorted(submission.expanded_author_list))
+            article.author_list, article.expanded_author_list = submission.author_list, submission.expanded_author_list
+            # numeric columns are parsed as numbers, whereas rows kept the cells as found in the report
+            for name in ['min_time_to_secure_rev', 'avg_time_to_secure_rev', 'referee_number']:
+                self.assertEqual(getattr(article, name), pd.to_numeric(getattr(submission, name)))
+                setattr(submission, name, getattr(article, name))
+            self.assertEqual(article, submission)
+
+
+class TestSnapshot(ReportTestCase):
+
+    def test_round_trip(self):
+        parsed = self.report()
+        self.assertTrue(parsed.snapshot_path.exists())
+        self.assertEqual(len(parsed), 4)
+        with patch.object(EJPReport, '_read_excel', side_effect=AssertionError("snapshot not used")):
+            loaded = self.report()
+        self.assertEqual(loaded.articles, parsed.articles)
+        self.assertEqual(dict(loaded.metadata), dict(parsed.metadata))
+        self.assertEqual(loaded.actual_header, [str(h) for h in parsed.actual_header])
+        self.assertEqual(list(loaded.data.columns), list(parsed.data.columns))
+
+    def test_invalidated(self):
+        parsed = self.report()
+        with patch.dict(decision_matching_regex, {'accepted': re.compile(r"accepted", re.IGNORECASE)}):
+            self.assertNotEqual(self.report().snapshot_path, parsed.snapshot_path)  # decision.py edited
+        with patch('src.ejp.NORMALIZATION_VERSION', -1):
+            self.assertNotEqual(self.report().snapshot_path, parsed.snapshot_path)
+
+    def test_missing_metadata(self):
+        parsed = self.report()
+        parsed.snapshot_path.with_suffix('.json').unlink()
+        with patch.object(EJPReport, '_read_excel', wraps=lambda filepath: None) as read_excel:
+            with patch.object(EJPReport, '_save_snapshot'):
+                self.report()
+        read_excel.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
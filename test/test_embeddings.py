@@ -0,0 +1,75 @@
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from src import embeddings
+from src.embeddings import TitleEmbeddingStore
+from src.match import embed_title
+from src.config import config
+
+from test_match import VectorsModelTestCase
+
+
+class TestTitleEmbeddingStore(VectorsModelTestCase):
+
+    titles = ['Kinases regulate mitosis', 'ribosome structure', 'KINASES regulate mitosis']
+
+    def setUp(self):
+        self.tmp_report = TemporaryDirectory()
+        self.report_path = Path(self.tmp_report.name) / 'report.xls'
+
+    def tearDown(self):
+        self.tmp_report.cleanup()
+
+    def test_round_trip(self):
+        store = TitleEmbeddingStore.for_report(self.report_path, self.titles)
+        self.assertEqual(store.path, Path(self.tmp_report.name) / 'report-title-vectors.json')
+        self.assertEqual(len(store.keys), 2)  # the first and last titles are the same once normalized
+        loaded = TitleEmbeddingStore.load(store.path)
+        self.assertIsInstance(loaded.matrix, np.memmap)
+        self.assertEqual(loaded.keys, store.keys)
+        self.assertEqual(loaded.tokens, store.tokens)
+        self.assertTrue(np.array_equal(loaded.matrix, store.matrix))
+        for title in self.titles:
+            tokens, vector = loaded.lookup(title)
+            expected_tokens, expected_vector = embed_title.__wrapped__(title)
+            self.assertEqual(tokens, expected_tokens)
+            self.assertTrue(np.allclose(vector, expected_vector))
+        self.assertIsNone(loaded.lookup('unknown title'))
+
+    def test_reuse(self):
+        TitleEmbeddingStore.for_report(self.report_path, self.titles[:2])
+        with patch.object(embeddings, 'embed_titles', wraps=embeddings.embed_titles) as embed_titles:
+            store = TitleEmbeddingStore.for_report(self.report_path, self.titles)
+            embed_titles.assert_not_called()
+            store = TitleEmbeddingStore.for_report(self.report_path, self.titles + ['mitotic control by kinase'])
+            embed_titles.assert_called_once_with(['mitotic control by kinase'])
+        self.assertEqual(len(TitleEmbeddingStore.load(store.path).keys), 3)
+
+    def test_other_model(self):
+        store = TitleEmbeddingStore.for_report(self.report_path, self.titles)
+        with patch.object(config, 'spacy_model', 'another_model'):
+            self.assertIsNone(TitleEmbeddingStore.load(store.path))
+
+    def test_interrupted_save(self):
+        store = TitleEmbeddingStore.for_report(self.report_path, self.titles)
+        with patch('src.embeddings.json.dump', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                TitleEmbeddingStore.for_report(self.report_path, self.titles + ['mitotic control by kinase'])
+        loaded = TitleEmbeddingStore.load(store.path)  # the new matrix was saved, but not indexed
+        self.assertEqual(loaded.keys, store.keys)
+        self.assertEqual(loaded.matrix_path, store.matrix_path)
+        store = TitleEmbeddingStore.for_report(self.report_path, self.titles + ['mitotic control by kinase'])
+        self.assertEqual(len(TitleEmbeddingStore.load(store.path).keys), 3)
+        self.assertFalse(loaded.matrix_path.exists())  # replaced
+
+    def test_inconsistent(self):
+        store = TitleEmbeddingStore.for_report(self.report_path, self.titles)
+        np.save(store.matrix_path, np.asarray(store.matrix)[:1])
+        self.assertIsNone(TitleEmbeddingStore.load(store.path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+import unittest
+import multiprocessing
+from threading import Thread
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from src import match
+from src.match import (
+    get_nlp, title_similarities, vector_similarities, embed_title, max_title_similarity, use_title_store, tier_counts,
+    MATCHERS, init_matcher, match_in_process
+)
+from src.models import EuropePMCArticle
+from src.utils import normalize, process_authors, author_ids
+from src.config import config
+
+
+# a few words with vectors: kinase, regulate and mitosis are close to their variants
+VECTORS = {
+    'kinase': [1, 0, 0, 0], 'kinases': [0.95, 0.05, 0, 0],
+    'regulate': [0, 1, 0, 0], 'control': [0.05, 0.95, 0, 0],
+    'mitosis': [0, 0, 1, 0], 'mitotic': [0, 0.05, 0.95, 0],
+    'ribosome': [0, 0, 0, 1], 'structure': [0.3, 0, 0.1, 0.8],
+}
+
+
+def save_vectors_model(path: str) -> str:
+    """Saves a blank English pipeline with the word vectors of VECTORS, as small stand-in for the spaCy model."""
+    import spacy
+    nlp = spacy.blank('en')
+    for word, vector in VECTORS.items():
+        nlp.vocab.set_vector(word, np.array(vector, dtype=np.float32))
+    nlp.to_disk(path)
+    return path
+
+
+class VectorsModelTestCase(unittest.TestCase):
+    """Runs the tests with the small model of VECTORS instead of the configured spaCy model."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = TemporaryDirectory()
+        cls.spacy_model = config.spacy_model
+        config.spacy_model = save_vectors_model(cls.tmp.name)
+        match._nlp = None
+        embed_title.cache_clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        config.spacy_model = cls.spacy_model
+        match._nlp = None
+        embed_title.cache_clear()
+        cls.tmp.cleanup()
+
+    def doc_similarity(self, s1, s2):
+        nlp = get_nlp()
+        return nlp(normalize(s1)).similarity(nlp(normalize(s2)))
+
+
+class TestGetNlp(VectorsModelTestCase):
+
+    def test_loaded_once(self):
+        match._nlp = None
+        loaded = []
+        threads = [Thread(target=lambda: loaded.append(get_nlp())) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len({id(nlp) for nlp in loaded}), 1)
+        self.assertIs(get_nlp(), loaded[0])
+        self.assertEqual(get_nlp().vocab.vectors_length, 4)
+
+
+class TestVectorSimilarities(VectorsModelTestCase):
+
+    title = 'Kinases regulate mitosis'
+    candidates = ['mitotic control by kinase', 'ribosome structure', 'Kinases regulate mitosis.', 'unknown words only']
+
+    def test_same_as_doc_similarity(self):
+        scores = vector_similarities(self.title, self.candidates)
+        for candidate, score in zip(self.candidates[:2], scores):
+            self.assertAlmostEqual(float(score), self.doc_similarity(self.title, candidate), places=5)
+        self.assertEqual(scores[2], 1.0)  # identical normalized titles
+        self.assertEqual(scores[3], 0.0)  # no vector
+
+    def test_embed_title(self):
+        tokens, vector = embed_title(self.title)
+        self.assertIs(embed_title(self.title)[1], vector)  # cached
+        self.assertFalse(vector.flags.writeable)
+        self.assertTrue(np.allclose(vector, get_nlp()(normalize(self.title)).vector))
+
+    def test_title_store(self):
+
+        class Store:
+
+            def lookup(self, title):
+                return (1, 2), np.ones(4, dtype=np.float32)
+
+        use_title_store(Store())
+        try:
+            self.assertEqual(embed_title(self.title)[0], (1, 2))
+        finally:
+            use_title_store(None)
+        self.assertNotEqual(embed_title(self.title)[0], (1, 2))
+
+
+class TestTitleSimilarities(VectorsModelTestCase):
+
+    title = 'Kinases regulate mitosis'
+
+    def setUp(self):
+        tier_counts.clear()
+
+    def test_paraphrase(self):
+        # no word in common: compared with vectors, as any candidate when there is no hit
+        candidates = ['mitotic control by kinase', 'ribosome structure']
+        scores = title_similarities(self.title, candidates)
+        self.assertTrue(np.allclose(scores, vector_similarities(self.title, candidates)))
+        self.assertGreater(scores[0], 0.85)
+        self.assertEqual(tier_counts, {'vector': 2})
+
+    def test_exact(self):
+        candidates = ['mitotic control by kinase', 'Kinases regulate mitosis.']
+        scores = title_similarities(self.title, candidates)
+        self.assertEqual(scores[1], vector_similarities(self.title, candidates)[1])
+        self.assertTrue(np.isnan(scores[0]))
+        self.assertEqual(tier_counts, {'exact': 1, 'skipped': 1})
+
+    def test_lexical_hit(self):
+        candidates = ['ribosome structure', 'mitosis regulate kinases']
+        scores = title_similarities(self.title, candidates)
+        self.assertAlmostEqual(float(scores[1]), float(vector_similarities(self.title, candidates)[1]), places=5)
+        self.assertTrue(np.isnan(scores[0]))
+        self.assertEqual(tier_counts, {'lexical_hit': 1, 'skipped': 1})
+
+    def test_lexical_hit_disabled(self):
+        candidates = ['ribosome structure', 'mitosis regulate kinases']
+        threshold, config.lexical_hit_threshold = config.lexical_hit_threshold, 1.1
+        try:
+            scores = title_similarities(self.title, candidates)
+        finally:
+            config.lexical_hit_threshold = threshold
+        self.assertTrue(np.allclose(scores, vector_similarities(self.title, candidates)))
+        self.assertEqual(tier_counts, {'vector': 2})
+
+    def test_best_match(self):
+        authors = process_authors(['Doe'])
+        candidates = [
+            EuropePMCArticle(title=t, author_list=['Doe'], expanded_author_list=authors, author_ids=author_ids(authors))
+            for t in ['ribosome structure', 'Kinases regulate mitosis.', 'mitotic control by kinase']
+        ]
+        best, score = max_title_similarity(candidates, self.title)
+        self.assertIs(best, candidates[1])
+        self.assertEqual(score, 1.0)
+        best, score = max_title_similarity(candidates[::2], self.title)
+        self.assertIs(best, candidates[2])
+        self.assertAlmostEqual(score, self.doc_similarity(self.title, candidates[2].title), places=5)
+
+
+class TestMatchInProcess(VectorsModelTestCase):
+
+    def test_same_as_in_process(self):
+        authors = process_authors(['Doe', 'Roe'])
+        submitting_ids = author_ids(authors)
+        candidates = []
+        for title, names in [
+            ('ribosome structure', ['Doe', 'Roe']),
+            ('mitosis regulate kinases', ['Doe', 'Roe']),
+            ('mitotic control by kinase', ['Doe', 'Roe']),
+            ('Kinases regulate mitosis.', ['Poe']),
+        ]:
+            expanded = process_authors(names)
+            candidates.append(EuropePMCArticle(title=title, author_list=names, expanded_author_list=expanded, author_ids=author_ids(expanded)))
+        queries = [
+            (strategy, candidates[i:], authors, title, submitting_ids)
+            for strategy in MATCHERS
+            for i in range(2)
+            for title in ['Kinases regulate mitosis', 'ribosome structures']
+        ]
+        expected = []
+        threshold, config.lexical_hit_threshold = config.lexical_hit_threshold, 1.1  # overridden at run time, to be applied by the processes
+        try:
+            for query in queries:
+                tier_counts.clear()
+                match, success = MATCHERS[query[0]](*query[1:-1], submitting_ids=query[-1])
+                expected.append((match.title, success, match.title_similarity_score, match.author_overlap_score, dict(tier_counts)))
+            with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('spawn'), initializer=init_matcher, initargs=(config,)) as pool:
+                outcomes = list(pool.map(match_in_process, *zip(*queries)))
+        finally:
+            config.lexical_hit_threshold = threshold
+        for (match, success, counts), expected_outcome in zip(outcomes, expected):
+            self.assertEqual((match.title, success, match.title_similarity_score, match.author_overlap_score, dict(counts)), expected_outcome)
+        self.assertIn(True, [success for _, success, _ in outcomes])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import gzip
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from lxml.etree import fromstring
+
+from src.offline import LocalIndex, LocalEngine, publication_date
+from src.utils import process_authors
+from src.config import PreprintInclusion
+
+
+def pubmed_article(pmid, date, title, authors, pub_type='Journal Article'):
+    year, month, day = date.split('-')
+    author_list = ''.join(f"<Author><LastName>{a}</LastName></Author>" for a in authors)
+    return f"""<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID>
+<DateRevised><Year>2023</Year><Month>06</Month><Day>30</Day></DateRevised>
+<Article><Journal><Title>The EMBO Journal</Title><ISOAbbreviation>EMBO J</ISOAbbreviation>
+<JournalIssue><PubDate><Year>{year}</Year><Month>Dec</Month></PubDate></JournalIssue></Journal>
+<ArticleTitle>{title}</ArticleTitle><AuthorList>{author_list}</AuthorList>
+<PublicationTypeList><PublicationType>{pub_type}</PublicationType></PublicationTypeList>
+<ArticleDate DateType="Electronic"><Year>{year}</Year><Month>{month}</Month><Day>{day}</Day></ArticleDate></Article></MedlineCitation></PubmedArticle>"""
+
+
+UNDATED = """<PubmedArticle><MedlineCitation><PMID>5</PMID>
+<Article><ArticleTitle>Mitochondrial fission in flies</ArticleTitle><AuthorList><Author><LastName>Lemberger</LastName></Author></AuthorList></Article>
+</MedlineCitation></PubmedArticle>"""
+
+
+BASELINE = f"""<?xml version="1.0" ?>
+<PubmedArticleSet>
+{pubmed_article('1', '2020-03-01', 'Mitochondrial fission in yeast', ['Lemberger', 'Garcia-Lopez'])}
+{pubmed_article('2', '2020-02-01', 'Mitochondrial fusion in worms', ['Lemberger', 'Smith'])}
+{pubmed_article('3', '2020-04-01', 'Mitochondrial fission in yeast', ['Lemberger', 'Garcia'], pub_type='Preprint')}
+{pubmed_article('4', '2018-01-01', 'Ribosome biogenesis', ['Garcia'])}
+{UNDATED}
+</PubmedArticleSet>"""
+
+
+UPDATE = """<?xml version="1.0" ?>
+<PubmedArticleSet>
+<DeleteCitation><PMID Version="1">2</PMID></DeleteCitation>
+</PubmedArticleSet>"""
+
+
+class TestLocalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        baseline = Path(self.tmp.name) / 'pubmed24n0001.xml.gz'
+        with gzip.open(baseline, 'wt') as f:
+            f.write(BASELINE)
+        self.index_path = Path(self.tmp.name) / 'index.sqlite'
+        self.index = LocalIndex(self.index_path)
+        self.assertEqual(self.index.add_file(baseline, min_pub_date='2019-01-01'), 3)
+        self.assertEqual(self.index.add_file(baseline, min_pub_date='2019-01-01'), 3)  # update files may repeat records
+        self.assertEqual(len(self.index), 3)
+
+    def tearDown(self):
+        self.index._conn.close()
+        self.tmp.cleanup()
+
+    def test_search_by_author(self):
+        engine = LocalEngine(PreprintInclusion.NO_PREPRINT, index_path=self.index_path)
+        found = engine.search_by_author(process_authors(['Lemberger', 'Garcia']), min_pub_date='2020-01-01')
+        self.assertEqual([a.pmid for a in found], ['1'])  # composed name matched, preprint excluded
+        found = engine.search_by_author(process_authors(['Lemberger']), min_pub_date='2020-01-01')
+        self.assertEqual([a.pmid for a in found], ['2', '1'])
+        self.assertEqual(found[0].pub_date, '2020-02-01')  # publication date, not revision date
+        engine = LocalEngine(PreprintInclusion.ONLY_PREPRINT, index_path=self.index_path)
+        found = engine.search_by_author(process_authors(['Lemberger', 'Garcia']), min_pub_date='2020-01-01')
+        self.assertEqual([a.pmid for a in found], ['3'])
+
+    def test_search_by_title(self):
+        engine = LocalEngine(PreprintInclusion.WITH_PREPRINT, index_path=self.index_path)
+        found = engine.search_by_title('Mitochondrial fission in budding yeast', min_pub_date='2020-01-01')
+        self.assertEqual([a.pmid for a in found], ['1', '3', '2'])
+        self.assertEqual(found[0].title, 'Mitochondrial fission in yeast')
+        self.assertEqual(engine.search_by_title('Mitochondrial fission in yeast', min_pub_date='2020-05-01'), [])
+
+    def test_index_without_dates(self):
+        # an index built when the title words were kept without the publication dates
+        self.index._conn.executescript(
+            "CREATE TABLE old_tokens (token TEXT, pmid TEXT, PRIMARY KEY (token, pmid)) WITHOUT ROWID;"
+            "INSERT INTO old_tokens SELECT token, pmid FROM title_tokens;"
+            "DROP TABLE title_tokens;"
+            "ALTER TABLE old_tokens RENAME TO title_tokens;"
+        )
+        self.index._conn.close()
+        self.index = LocalIndex(self.index_path)
+        self.assertIn('pub_date', self.index._columns('title_tokens'))
+        self.assertEqual(self.index._columns('title_tokens_without_dates'), [])
+        self.test_search_by_title()
+
+    def test_delete_citation(self):
+        update = Path(self.tmp.name) / 'pubmed24n0002.xml'
+        update.write_text(UPDATE)
+        self.assertEqual(self.index.add_file(update), 0)
+        self.assertEqual(len(self.index), 2)
+        engine = LocalEngine(PreprintInclusion.WITH_PREPRINT, index_path=self.index_path)
+        found = engine.search_by_author(process_authors(['Lemberger']), min_pub_date='2020-01-01')
+        self.assertEqual([a.pmid for a in found], ['1', '3'])
+
+
+class TestPublicationDate(unittest.TestCase):
+
+    def test_dates(self):
+        record = fromstring(pubmed_article('1', '2020-03-01', 'title', ['Doe']))
+        self.assertEqual(publication_date(record), '2020-03-01')  # electronic publication before the issue
+        record.find('MedlineCitation/Article').remove(record.find('MedlineCitation/Article/ArticleDate'))
+        self.assertEqual(publication_date(record), '2020-12-01')
+        medline_date = fromstring("<PubmedArticle><MedlineCitation><Article><Journal><JournalIssue><PubDate><MedlineDate>1998 Dec-1999 Jan</MedlineDate></PubDate></JournalIssue></Journal></Article></MedlineCitation></PubmedArticle>")
+        self.assertEqual(publication_date(medline_date), '1998-12-01')
+        history = fromstring('<PubmedArticle><MedlineCitation/><PubmedData><History><PubMedPubDate PubStatus="pubmed"><Year>2021</Year><Month>5</Month><Day>2</Day></PubMedPubDate></History></PubmedData></PubmedArticle>')
+        self.assertEqual(publication_date(history), '2021-05-02')
+        self.assertIsNone(publication_date(fromstring(UNDATED)))
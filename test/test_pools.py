@@ -0,0 +1,52 @@
+import unittest
+from threading import Thread
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from src.net import ConnectionPools, Service, LazyService, requests_retry_session
+from src.search import EuropePMCEngine
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+class TestConnectionPools(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_shared_keep_alive(self):
+        pools = ConnectionPools(pool_maxsize=4, connect_timeout=5, read_timeout=5)
+        services = [Service(), Service()]
+        for service in services:
+            service.retry_request = requests_retry_session(pools=pools)
+        for _ in range(3):
+            for service in services:
+                self.assertEqual(service._request('GET', self.url, use_cache=False).status_code, 200)
+        adapter = services[0].retry_request.get_adapter(self.url)
+        self.assertIs(adapter, services[1].retry_request.get_adapter(self.url))
+        self.assertEqual(adapter.timeout, (5, 5))
+        stats = pools.stats()["http://127.0.0.1"]
+        self.assertEqual(stats['requests'], 6)
+        self.assertEqual(stats['connections'], 1)  # sequential requests of both services reuse the same connection
+        self.assertIn('6 requests over 1 connections', str(pools))
+
+    def test_lazy_search_service(self):
+        self.assertIsInstance(EuropePMCEngine.__dict__['search_service'], LazyService)
+        engine = EuropePMCEngine()
+        self.assertIs(engine.search_service, EuropePMCEngine().search_service)
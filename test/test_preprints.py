@@ -0,0 +1,147 @@
+import unittest
+from datetime import date
+from unittest.mock import patch
+from tempfile import TemporaryDirectory
+
+import requests
+
+from src.models import EuropePMCArticle, Result
+from src.net import ScopusService
+from src.search import EuropePMCEngine
+from src.scan import Scanner
+from src.preprints import PreprintIndex
+from src.ratelimit import RateLimitExhausted
+
+
+class StubBioRxivService:
+
+    def __init__(self, fail_after=None):
+        self.requests = []
+        self.fail_after = fail_after
+
+    def published_preprints(self, server, start, end):
+        self.requests.append((server, start, end))
+        if server == 'biorxiv':
+            yield '10.1101/2020.01.01.000001', '10.15252/embj.2020000001'
+            for i in range(2, self.fail_after or 0):
+                yield f'10.1101/2020.01.01.{i:06d}', f'10.15252/embj.2020{i:06d}'
+            if self.fail_after:
+                raise ConnectionError("listing interrupted")
+
+
+class Today(date):
+
+    day = date(2021, 1, 4)
+
+    @classmethod
+    def today(cls):
+        return cls.day
+
+
+class TestPreprintIndex(unittest.TestCase):
+
+    def test_bulk_lookup(self):
+        with TemporaryDirectory() as tmp:
+            service = StubBioRxivService()
+            index = PreprintIndex(tmp, service)
+            index.update('2020-01-01', '2020-12-31')
+            self.assertEqual(index.published_doi('10.1101/2020.01.01.000001'), '10.15252/embj.2020000001')
+            self.assertIsNone(index.published_doi('10.1101/2020.01.01.000002'))
+            self.assertEqual(len(service.requests), 2)  # one listing per server
+            index = PreprintIndex(tmp, service)  # reopened from disk
+            index.update('2020-03-01', '2020-12-31')
+            self.assertEqual(len(service.requests), 2)  # covered by the previous download
+            index.update('2019-01-01', '2020-12-31')
+            self.assertEqual(len(service.requests), 4)
+            self.assertEqual(len(index), 1)
+
+    def test_refresh(self):
+        service = StubBioRxivService()
+        index = PreprintIndex(None, service)
+        index.update('2020-01-01', '2020-12-31')
+        index.TTL = 0
+        index.update('2020-01-01', '2020-12-31')
+        self.assertEqual(len(service.requests), 4)
+
+    def test_tail_update(self):
+        service = StubBioRxivService()
+        index = PreprintIndex(None, service)
+        with patch('src.preprints.date', Today):
+            index.update('2020-01-01')
+            Today.day = date(2021, 1, 6)
+            index.update('2020-01-01')
+            index.update('2020-06-01')
+        # the next day, only the days since the last download are listed
+        self.assertEqual(service.requests[2:], [('biorxiv', '2021-01-04', '2021-01-06'), ('medrxiv', '2021-01-04', '2021-01-06')])
+        index.update('2020-01-01', '2020-12-31')
+        self.assertEqual(len(service.requests), 4)  # covered by the previous downloads
+
+    def test_interrupted_download(self):
+        service = StubBioRxivService(fail_after=150)
+        index = PreprintIndex(None, service)
+        with self.assertRaises(ConnectionError):
+            index.update('2020-01-01', '2020-12-31')
+        self.assertEqual(index.published_doi('10.1101/2020.01.01.000001'), '10.15252/embj.2020000001')  # first page kept
+        index.service = StubBioRxivService()
+        index.update('2020-01-01', '2020-12-31')
+        self.assertEqual(len(index.service.requests), 2)  # the window was not recorded and is downloaded again
+
+
+class FailingBioRxivService:
+
+    def __init__(self, error=requests.HTTPError("problem with biorxiv api (503)")):
+        self.lookups = []
+        self.error = error
+
+    def published_preprints(self, server, start, end):
+        raise self.error
+        yield
+
+    def preprint_publication_status(self, doi):
+        self.lookups.append(doi)
+        return '10.15252/embj.2020000001'
+
+
+class TestPreprintStatus(unittest.TestCase):
+
+    def preprints(self):
+        return [Result(article=EuropePMCArticle(doi='10.1101/2020.01.01.000001', is_preprint=True, pub_date='2020-01-01'))]
+
+    def test_fallback(self):
+        with TemporaryDirectory() as tmp:
+            scanner = Scanner(None, 'test', EuropePMCEngine, ScopusService, None, False, cache_dir=tmp)
+            scanner.biorxiv_service = FailingBioRxivService()
+            results = self.preprints()
+            scanner.update_preprint_status(results)
+        self.assertEqual(results[0].article.preprint_published_doi, '10.15252/embj.2020000001')
+        self.assertEqual(scanner.biorxiv_service.lookups, ['10.1101/2020.01.01.000001'])
+
+    def test_rate_limit_exhausted(self):
+        with TemporaryDirectory() as tmp:
+            scanner = Scanner(None, 'test', EuropePMCEngine, ScopusService, None, False, cache_dir=tmp)
+            scanner.biorxiv_service = FailingBioRxivService(RateLimitExhausted("quota exhausted"))
+            results = self.preprints()
+            scanner.update_preprint_status(results)
+        self.assertEqual(results[0].article.preprint_published_doi, '10.15252/embj.2020000001')
+
+    def test_lookups_exhausted(self):
+
+        def exhausted(doi):
+            raise RateLimitExhausted("quota exhausted")
+
+        scanner = Scanner(None, 'test', EuropePMCEngine, ScopusService, None, False)
+        scanner.biorxiv_service = FailingBioRxivService()
+        scanner.biorxiv_service.preprint_publication_status = exhausted
+        results = self.preprints()
+        scanner.update_preprint_status(results)  # the scan goes on without publication status
+        self.assertIsNone(results[0].article.preprint_published_doi)
+
+    def test_without_cache(self):
+        scanner = Scanner(None, 'test', EuropePMCEngine, ScopusService, None, False)
+        scanner.biorxiv_service = FailingBioRxivService()
+        scanner.update_preprint_status(self.preprints())
+        self.assertEqual(len(scanner.biorxiv_service.lookups), 1)  # no index without a cache directory
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,14 @@
 import unittest
+import string
+import re
+import html
+import unicodedata
+from pathlib import Path
 
-from src.utils import normalize, last_name
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from src.utils import normalize, last_name, process_authors, author_ids, flat_unique_set
 
 
 class TestNormalize(unittest.TestCase):
@@ -37,6 +45,68 @@ class TestNormalize(unittest.TestCase):
         self.assertNotEqual(x, z)
 
 
+def reference_normalize(
+    s: str,
+    do_not_remove: str = '',
+    do=['ctrl', 'strip', 'lower', 'html_unescape', 'html_tags', 'punctuation', 'unicode']
+) -> str:
+    # the original implementation of normalize(), kept to check that the optimized version gives identical results
+    if 'ctrl' in do:
+        s = "".join([ch for ch in s if unicodedata.category(ch) not in ["Cc", "Cf"]])
+    if 'strip' in do:
+        s = s.strip()
+    if 'lower' in do:
+        s = s.lower()
+    if 'html_unescape' in do:
+        s = html.unescape(s)
+    if 'html_tags' in do:
+        s = BeautifulSoup(s, 'html.parser').get_text()
+    if 'punctuation' in do:
+        punctuation = string.punctuation
+        for c in do_not_remove:
+            punctuation = punctuation.replace(c, ' ')
+        s = re.sub(f"[{punctuation}]", " ", s)
+        s = re.sub(r" +", " ", s)
+    if 'unicode' in do:
+        s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('utf-8', 'ignore')
+    return s
+
+
+class TestNormalizeDifferential(unittest.TestCase):
+
+    titles = [
+        "The parasite <i>Plasmodium</i> in Ca<sup>2+</sup> was",
+        "Structure of the SARS‐CoV‐2 spike glycoprotein: a <b>cryo-EM</b> study",
+        "p &lt; 0.05 and <sub>n</sub> &amp; m &#8211; revisited",
+        "Mitochondrial fission\u200b regulates\xa0β-cell function <br/> in vivo",
+        "A <span class='x'>styled</span> title <!-- comment --> with\ttabs\r\nand lines",
+        "Rôle of Álvarez-Fernández's kinase (PKC-δ) [in] {vitro} 'assays'",
+        "<P>Upper case tags</P> and unclosed <i>italics",
+        "1 < 2 > 0 : inequalities ; 'quotes' \"double\" `back` ~tilde~ |pipe| \\ slash",
+        "",
+        "   ",
+    ]
+
+    def real_titles(self):
+        path = Path(__file__).parent.parent / 'data' / 'test-data.xls'
+        sheet = pd.read_excel(path, header=None)
+        return [x for x in sheet[4].to_list() + sheet[5].to_list() + sheet[6].to_list() if isinstance(x, str)]
+
+    def test_identical(self):
+        settings = [
+            ('', ['ctrl', 'strip', 'lower', 'html_unescape', 'html_tags', 'punctuation', 'unicode']),
+            ('+', ['ctrl', 'punctuation', 'html_tags', 'html_unescape']),
+            ("-'", ['ctrl', 'strip', 'lower', 'html_unescape', 'html_tags', 'punctuation', 'unicode']),
+            (',.', ['punctuation']),
+            ('\\', ['punctuation']),
+            ('', ['html_tags']),
+            ('', ['ctrl']),
+        ]
+        for title in self.titles + self.real_titles():
+            for do_not_remove, do in settings:
+                self.assertEqual(normalize(title, do_not_remove, do), reference_normalize(title, do_not_remove, do), f"{title!r} {do_not_remove!r} {do}")
+
+
 class TestLastName(unittest.TestCase):
 
     def test_last_name(self):
@@ -57,5 +127,17 @@ class TestLastName(unittest.TestCase):
             self.assertEqual(res, expect.lower())
 
 
+class TestAuthorIds(unittest.TestCase):
+
+    def test_overlap(self):
+        a = process_authors(["Villanueva-Meyer", "Roguet", "Nielsen"])
+        b = process_authors(["Meyer", "Nielsen", "Smith"])
+        ids_a = author_ids(a)
+        ids_b = author_ids(b)
+        self.assertEqual(len(ids_a), len(flat_unique_set(a)))
+        self.assertEqual(len(ids_a & ids_b), len(flat_unique_set(a) & flat_unique_set(b)))
+        self.assertEqual(author_ids(a), ids_a)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from time import time, monotonic
+
+from src.ratelimit import TokenBucket, RateLimitExhausted
+from src.models import EuropePMCArticle, Submission, Result
+from src.search import EuropePMCEngine
+from src.net import ScopusService
+from src.scan import Scanner
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=50, capacity=5)
+        delays = [bucket._reserve() for _ in range(10)]
+        self.assertTrue(all([d == 0 for d in delays[:5]]))
+        self.assertAlmostEqual(delays[-1], 5 / 50, places=2)
+
+    def test_retry_after(self):
+        bucket = TokenBucket(rate=50)
+        bucket.update(429, {'Retry-After': '2'})
+        self.assertGreater(bucket._reserve(), 1.9)
+
+    def test_remaining_exhausted(self):
+        bucket = TokenBucket(rate=50)
+        bucket.update(200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(time()) + 3)})
+        self.assertGreater(bucket.paused_until - monotonic(), 1.5)
+
+    def test_no_feedback(self):
+        bucket = TokenBucket(rate=50)
+        bucket.update(200, {'X-RateLimit-Remaining': '1000'})
+        self.assertEqual(bucket._reserve(), 0)
+
+    def test_long_pause_fails(self):
+        bucket = TokenBucket(rate=50, max_pause=60)
+        bucket.update(200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(time()) + 3 * 24 * 3600)})  # weekly quota
+        self.assertEqual(bucket.paused_until, 0.0)  # not waited for
+        with self.assertRaises(RateLimitExhausted):
+            bucket.acquire()
+        bucket.update(429, {'Retry-After': '30'})
+        self.assertRaises(RateLimitExhausted, bucket._reserve)
+
+
+class TestQuotaExhausted(unittest.TestCase):
+
+    class Scopus(ScopusService):
+        rate_limiter = TokenBucket(9)
+
+        def _request(self, method, url, use_cache=True, **kwargs):
+            self.rate_limiter.pause(7 * 24 * 3600)
+            self.rate_limiter.acquire()
+
+    def test_citations_disabled(self):
+        scanner = Scanner(None, 'test', EuropePMCEngine, self.Scopus, None, True)
+        results = [Result(Submission(title='A title'), EuropePMCArticle(title='A title', pmid='1'))]
+        scanner.add_citations(results)
+        self.assertFalse(scanner.include_citations)
+        self.assertIsNone(results[0].article.citations)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+
+import requests
+
+from src.models import EuropePMCArticle, Submission
+from src.search import EuropePMCEngine, PubMedEngine
+from src.net import EuropePMCService, PubMedService
+from src.match import tier_counts
+from src.scan import Scanner
+
+
+class BatchService:
+
+    def __init__(self, articles, complete=True):
+        self.articles = articles
+        self.complete = complete
+        self.queries = []
+
+    def search_pages(self, query, page_size, max_pages, result_type):
+        self.queries.append(query)
+        return self.articles, self.complete
+
+
+def article(title, doi):
+    return EuropePMCArticle(title=title, author_list=['Doe'], expanded_author_list=[['doe']], doi=doi)
+
+
+class TestBatchSearchByTitle(unittest.TestCase):
+
+    titles = ['the spindle assembly checkpoint', 'a map of yeast kinases', 'unpublished study']
+    retrieved = [article('A map of yeast kinases', '1'), article('The spindle assembly checkpoint', '2'), article('Cryogenic ribosome structures', '3')]
+
+    def test_single_query_demultiplexed(self):
+        engine = EuropePMCEngine(two_phase=False)
+        engine.search_service = BatchService(self.retrieved)
+        candidates = engine.batch_search_by_title(self.titles, ['2020-01-01'] * 3, limit=1)
+        self.assertEqual(len(engine.search_service.queries), 1)
+        self.assertEqual(engine.search_service.queries[0].count('TITLE:"'), 3)  # phrase queries
+        self.assertEqual([[a.doi for a in c] for c in candidates[:2]], [['2'], ['1']])
+        self.assertIsNot(candidates[0][0], self.retrieved[1])  # matching sets scores on its own copy
+
+    def test_incomplete_batch(self):
+        engine = EuropePMCEngine(two_phase=False)
+        engine.search_service = BatchService(self.retrieved, complete=False)
+        candidates = engine.batch_search_by_title(self.titles, ['2020-01-01'] * 3, limit=1)
+        self.assertEqual([a.doi for a in candidates[0]], ['2'])
+        self.assertIsNone(candidates[2])  # no similar title in an incomplete batch: to be searched on its own
+
+    def test_no_matching(self):
+        engine = EuropePMCEngine(two_phase=False)
+        engine.search_service = BatchService(self.retrieved)
+        tier_counts.clear()
+        candidates = engine.batch_search_by_title(['spindle assembly checkpoint signalling'], ['2020-01-01'])
+        self.assertEqual([a.doi for a in candidates[0]], ['2'])  # the other titles share no word
+        self.assertEqual(tier_counts, {})  # demultiplexing does not compare vectors nor count as matching
+
+
+class TestTwoPhase(unittest.TestCase):
+
+    class Engine(EuropePMCEngine):
+
+        def __init__(self, preprint_inclusion=None):
+            super().__init__(two_phase=True)
+            self.completed = []
+
+        def complete(self, article):
+            self.completed.append(article)
+            return article
+
+    def test_complete_successful_match_only(self):
+        scanner = Scanner(None, 'test', self.Engine, EuropePMCService, None, False)
+        matched, unmatched = article('A title', '1'), article('Another title', '2')
+        scanner.save(Submission(title='A title'), matched, True)
+        result, success = scanner.save(Submission(title='Unpublished'), unmatched, False)
+        self.assertEqual(scanner.search_engine.completed, [matched])  # no core record fetched for a failed match
+        self.assertIs(result.article, unmatched)
+
+
+class TestCursorPaging(unittest.TestCase):
+
+    class Service(EuropePMCService):
+
+        def __init__(self, hit_count):
+            super().__init__()
+            self.hit_count = hit_count
+            self.requests = []
+
+        def _search_page(self, query, page_size, result_type, cursor_mark=None):
+            self.requests.append((page_size, cursor_mark))
+            start = int(cursor_mark) if cursor_mark != '*' else 0
+            page = [article(f'title {i}', str(i)) for i in range(start, min(start + page_size, self.hit_count))]
+            return page, self.hit_count, str(start + len(page))
+
+    def test_stop_early(self):
+        service = self.Service(hit_count=1000)
+        pages = service.iter_pages('AUTH:"Doe"', [5, 100, 100])
+        first, last = next(pages)
+        self.assertEqual((len(first), last), (5, False))
+        self.assertEqual(service.requests, [(5, '*')])
+
+    def test_all_pages(self):
+        service = self.Service(hit_count=50)
+        pages = list(service.iter_pages('AUTH:"Doe"', [5, 100, 100]))
+        self.assertEqual([(len(page), last) for page, last in pages], [(5, False), (45, True)])
+        self.assertEqual(service.requests, [(5, '*'), (100, '5')])
+        self.assertEqual(service.search_pages('AUTH:"Doe"', page_size=20, max_pages=2)[1], False)
+
+
+class TestPubMedBatches(unittest.TestCase):
+
+    class Service(PubMedService):
+
+        hits = {'lemberger[AU]': ['2', '1'], 'liechti[AU]': ['2']}
+
+        def __init__(self):
+            super().__init__()
+            self.requests = []
+
+        def _request(self, method, url, use_cache=True, **kwargs):
+            self.requests.append((url, kwargs['data']))
+            response = requests.Response()
+            response.status_code = 200
+            if url == self.REST_URL_ESEARCH:
+                pmids = next(p for q, p in self.hits.items() if q in kwargs['data']['term'])
+                ids = ''.join(f"<Id>{pmid}</Id>" for pmid in pmids)
+                response._content = f"<eSearchResult><Count>{len(pmids)}</Count><IdList>{ids}</IdList></eSearchResult>".encode()
+            else:
+                records = ''.join(
+                    f"<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><ArticleDate><Year>2020</Year><Month>01</Month><Day>01</Day></ArticleDate>"
+                    f"<Article><ArticleTitle>title {pmid}</ArticleTitle></Article></MedlineCitation></PubmedArticle>"
+                    for pmid in kwargs['data']['id'].split(',')
+                )
+                response._content = f"<PubmedArticleSet>{records}</PubmedArticleSet>".encode()
+            return response
+
+    def test_fetched_together(self):
+        engine = PubMedEngine()
+        engine.search_service = self.Service()
+        article_lists = engine.batch_search_by_author([[['lemberger']], [], [['liechti']]], ['2020-01-01'] * 3)
+        self.assertEqual([[a.pmid for a in articles] for articles in article_lists], [['2', '1'], [], ['2']])
+        self.assertIsNot(article_lists[0][0], article_lists[2][0])  # matching sets scores on its own copy
+        efetch = [data['id'] for url, data in engine.search_service.requests if url == PubMedService.REST_URL_EFETCH]
+        self.assertEqual(efetch, ['1,2'])  # a single request for the union of the PMIDs
+
+    def test_search(self):
+        service = self.Service()
+        self.assertEqual([a.pmid for a in service.search('lemberger[AU]')], ['2', '1'])  # in the order of relevance
+        self.assertEqual([url for url, _ in service.requests], [PubMedService.REST_URL_ESEARCH, PubMedService.REST_URL_EFETCH])
+
+    def test_fetch_size(self):
+        service = self.Service()
+        articles = service.efetch(['3', '1', '2', '1'], fetch_size=2)
+        self.assertEqual(sorted(articles), ['1', '2', '3'])
+        self.assertEqual([data['id'] for _, data in service.requests], ['1,2', '3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
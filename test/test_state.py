@@ -0,0 +1,41 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from src.models import Submission, EuropePMCArticle, Result
+from src.state import ScanState
+
+
+class TestScanState(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.state = ScanState(Path(self.tmp.name) / 'state.sqlite')
+        self.submissions = [
+            Submission(title='A first title', author_list=['Doe'], expanded_author_list=[['doe']], manuscript_nm='EMBOJ-1', journal_decision='accept'),
+            Submission(title='A second title', author_list=['Roe'], expanded_author_list=[['roe']], manuscript_nm='EMBOJ-2', journal_decision='reject'),
+        ]
+        article = EuropePMCArticle(title='A first title', author_list=['Doe'], expanded_author_list=[['doe']], doi='10.1/x')
+        self.state.update([Result(self.submissions[0], article)], [Result(self.submissions[1])])
+
+    def tearDown(self):
+        self.state._conn.close()
+        self.tmp.cleanup()
+
+    def test_reuse_unchanged(self):
+        to_search, reused = self.state.plan(self.submissions, retry_after=30)
+        self.assertEqual(to_search, [])
+        self.assertEqual([(r.submission.manuscript_nm, found) for r, found in reused], [('EMBOJ-1', True), ('EMBOJ-2', False)])
+        self.assertEqual(reused[0][0].article.doi, '10.1/x')
+        self.assertTrue(reused[0][0].article.author_ids)
+
+    def test_search_new_changed_and_expired(self):
+        changed = Submission(title='A revised title', author_list=['Doe'], expanded_author_list=[['doe']], manuscript_nm='EMBOJ-1', journal_decision='accept')
+        new = Submission(title='Another title', author_list=['Poe'], expanded_author_list=[['poe']], manuscript_nm='EMBOJ-3')
+        to_search, reused = self.state.plan([changed, self.submissions[1], new], retry_after=0)
+        self.assertEqual([s.manuscript_nm for s in to_search], ['EMBOJ-1', 'EMBOJ-2', 'EMBOJ-3'])
+        self.assertEqual(reused, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from lxml.etree import fromstring
+
+from src.net import iter_records
+from src.models import EuropePMCArticle, PubMedArticle
+from src.search import EuropePMCEngine
+
+EUROPEPMC_CORE = b"""<?xml version='1.0' encoding='UTF-8'?>
+<responseWrapper><version>6.5</version><hitCount>2</hitCount>
+<request><queryString>AUTH:"Lemberger"</queryString><resultType>core</resultType></request>
+<resultList>
+<result><id>1</id><source>MED</source><pmid>111</pmid><doi>10.1/a</doi><title>First title</title>
+<authorList><author><fullName>Lemberger T</fullName><lastName>Lemberger</lastName></author><author><collectiveName>A Consortium</collectiveName></author></authorList>
+<journalInfo><journal><title>Molecular Systems Biology</title><medlineAbbreviation>Mol Syst Biol</medlineAbbreviation></journal></journalInfo>
+<pubTypeList><pubType>research-article</pubType><pubType>Journal Article</pubType></pubTypeList>
+<abstractText>An abstract.</abstractText><firstPublicationDate>2020-01-02</firstPublicationDate></result>
+<result><id>PPR2</id><source>PPR</source><doi>10.1101/b</doi><title>Second title</title>
+<authorList><author><lastName>van der Berg</lastName></author></authorList><publisher>bioRxiv</publisher>
+<pubTypeList><pubType>Preprint</pubType></pubTypeList><firstPublicationDate>2019-05-06</firstPublicationDate></result>
+</resultList></responseWrapper>"""
+
+EUROPEPMC_LITE = b"""<?xml version='1.0' encoding='UTF-8'?>
+<responseWrapper><resultList>
+<result><id>1</id><source>MED</source><pmid>111</pmid><doi>10.1/a</doi><title>First title</title>
+<authorString>Lemberger T, van der Berg AB, A Consortium.</authorString><journalTitle>Mol Syst Biol</journalTitle>
+<pubType>research-article; journal article</pubType><firstPublicationDate>2020-01-02</firstPublicationDate></result>
+</resultList></responseWrapper>"""
+
+PUBMED = b"""<?xml version="1.0" ?>
+<PubmedArticleSet>
+<PubmedArticle><MedlineCitation><PMID>111</PMID><DateRevised><Year>2020</Year><Month>01</Month><Day>02</Day></DateRevised>
+<Article><Journal><Title>Molecular Systems Biology</Title><ISOAbbreviation>Mol Syst Biol</ISOAbbreviation></Journal>
+<ArticleTitle>First title</ArticleTitle><ELocationID EIdType="doi">10.1/a</ELocationID>
+<AuthorList><Author><LastName>Lemberger</LastName></Author></AuthorList>
+<PublicationTypeList><PublicationType>Journal Article</PublicationType></PublicationTypeList></Article></MedlineCitation></PubmedArticle>
+</PubmedArticleSet>"""
+
+
+class TestStreamingParsing(unittest.TestCase):
+
+    def test_europepmc_core(self):
+        streamed = [EuropePMCArticle(xml=x) for x in iter_records(EUROPEPMC_CORE, 'result', 'resultList')]
+        parsed = [EuropePMCArticle(xml=x) for x in fromstring(EUROPEPMC_CORE).xpath('.//result')]
+        self.assertEqual(streamed, parsed)
+        self.assertEqual(len(streamed), 2)
+        self.assertEqual(streamed[0].author_list, ['Lemberger'])
+        self.assertTrue(streamed[1].is_preprint)
+
+    def test_europepmc_lite(self):
+        lite = [EuropePMCArticle(xml=x) for x in iter_records(EUROPEPMC_LITE, 'result', 'resultList')]
+        self.assertEqual(lite[0].author_list, ['Lemberger', 'van der Berg', 'A Consortium'])
+        self.assertEqual(lite[0].pub_type, ['research-article', 'journal article'])
+        self.assertEqual(lite[0].journal_abbr, 'Mol Syst Biol')
+        self.assertEqual((lite[0].pmid, lite[0].doi, lite[0].title), ('111', '10.1/a', 'First title'))
+
+    def test_pubmed(self):
+        streamed = [PubMedArticle(xml=x) for x in iter_records(PUBMED, 'PubmedArticle', 'PubmedArticleSet')]
+        self.assertEqual(len(streamed), 1)
+        self.assertEqual((streamed[0].pmid, streamed[0].doi, streamed[0].author_list), ('111', '10.1/a', ['Lemberger']))
+
+
+class TestTwoPhaseSearch(unittest.TestCase):
+
+    class Service:
+        def __init__(self):
+            self.fetched = []
+
+        def fetch(self, source, epmc_id):
+            self.fetched.append((source, epmc_id))
+            return [EuropePMCArticle(xml=x) for x in iter_records(EUROPEPMC_CORE, 'result', 'resultList')][0]
+
+    def test_complete_lite_match(self):
+        engine = EuropePMCEngine(two_phase=True)
+        engine.search_service = self.Service()
+        lite = [EuropePMCArticle(xml=x, result_type='lite') for x in iter_records(EUROPEPMC_LITE, 'result', 'resultList')][0]
+        lite.strategy, lite.title_similarity_score, lite.author_overlap_score = 'search_by_author_match_by_title', 1.0, 0.5
+        core = engine.complete(lite)
+        self.assertEqual(engine.search_service.fetched, [('MED', '1')])
+        self.assertEqual((core.journal_name, core.abstract), ('Molecular Systems Biology', 'An abstract.'))
+        self.assertEqual((core.strategy, core.title_similarity_score, core.author_overlap_score), ('search_by_author_match_by_title', 1.0, 0.5))
+        self.assertIs(engine.complete(core), core)
+
+
+if __name__ == '__main__':
+    unittest.main()